@@ -25,8 +25,13 @@ INSTALLED_APPS = [
 
 
 MIDDLEWARE = [
+    'home.middleware.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
+    'home.middleware.SessionRefreshMiddleware',
+    'home.middleware.ReplicaMiddleware',
+    'home.middleware.CurrentUserMiddleware',
+    'home.middleware.ProfilerMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
@@ -46,6 +51,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'home.context_processors.session_user',
             ],
         },
     },
@@ -65,6 +71,20 @@ DATABASES = {
     }
 }
 
+# Optional read replica (home/replicas.py): add it to DATABASES, e.g.
+#   DATABASES['replica'] = {**DATABASES['default'], 'HOST': 'replica.db.internal'}
+# and set DATABASE_REPLICA = 'replica'. GET requests to @reads_from_replica
+# views then read from it, except for REPLICA_STICKY_SECONDS after the same
+# client wrote anything (set it above the replica's usual lag). To try it
+# locally, point both aliases at two SQLite files and copy the first over the
+# second whenever the "replica" should catch up.
+DATABASE_REPLICA = None
+REPLICA_STICKY_SECONDS = 15
+DATABASE_ROUTERS = ['home.replicas.ReplicaRouter']
+
+# Rows read per query by the streaming accounting exports (home/exports.py)
+EXPORT_CHUNK_SIZE = 2000
+
 
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
@@ -79,6 +99,18 @@ USE_I18N = True
 USE_TZ = True
 
 STATIC_URL = 'static/'
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+
+# Resized/WebP copies of the images in home/static/home, written by
+# `manage.py build_images` (home/images.py) and collected like any other
+# static file. collectstatic then gives every file a content-hashed name,
+# which the static view serves with far-future cache headers.
+IMAGE_VARIANTS_DIR = BASE_DIR / 'build' / 'images'
+STATICFILES_DIRS = [IMAGE_VARIANTS_DIR] if IMAGE_VARIANTS_DIR.is_dir() else []
+STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {"BACKEND": "home.storage.HashedStaticStorage"},
+}
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -99,8 +131,65 @@ DEFAULT_FROM_EMAIL = EMAIL_HOST_USER
 
 
 SESSION_COOKIE_AGE = 7200  
-SESSION_SAVE_EVERY_REQUEST = True
 SESSION_EXPIRE_AT_BROWSER_CLOSE = False
 
-
-
+# Sessions hold only user_id, role and pending_booking_id, and are written when
+# they change or, for an active user, once every SESSION_REFRESH_AFTER seconds
+# to slide the expiry (home.middleware.SessionRefreshMiddleware). Any backend
+# works: "django.contrib.sessions.backends.cache" or
+# "django.contrib.sessions.backends.signed_cookies" avoid the database entirely.
+SESSION_ENGINE = "django.contrib.sessions.backends.db"
+SESSION_SAVE_EVERY_REQUEST = False
+SESSION_REFRESH_AFTER = SESSION_COOKIE_AGE // 4
+
+# Seconds to cache the logged-in User behind request.current_user (0 = load it
+# from the database once per request)
+CURRENT_USER_CACHE_TIMEOUT = 0
+
+# Version of the cached informational pages (home/page_cache.py). Leave as None
+# to use a digest of home/templates and the collected static manifest, or set
+# it per deploy (e.g. the git SHA)
+PAGE_CACHE_VERSION = None
+
+
+# Seconds between in-process reservation expiry sweeps (0 = off; use the
+# `expire_reservations` management command from cron instead)
+RESERVATION_SWEEP_INTERVAL = 0
+
+# Days of dated trips kept materialized ahead of today (home/trips.py); run
+# the `materialize_trips` management command daily to roll the window forward
+TRIP_WINDOW_DAYS = 30
+# Searches (and bookings) reach at most this many days ahead; later dates are
+# never materialized
+TRIP_SEARCH_HORIZON_DAYS = 180
+# Zone of the buses' departure times; "today" for trips and bookings is the
+# date there, whatever TIME_ZONE is
+SERVICE_TIME_ZONE = "Asia/Karachi"
+
+# Request metrics (home/metrics.py), scraped from /metrics/ by an admin session
+# or with "Authorization: Bearer <METRICS_TOKEN>". Under gunicorn set
+# METRICS_DIR to a directory shared by the workers (and emptied on restart) so
+# the endpoint reports the sum over all of them
+METRICS_DIR = None
+METRICS_FLUSH_INTERVAL = 5
+METRICS_TOKEN = None
+
+# /ready/ answers 503 when a database takes longer than this to run SELECT 1
+READINESS_DB_LATENCY_MS = 250
+
+# Admin request profiles (?_profile=1 or X-Profile: 1, see home/profiling.py)
+# are written here; only the newest PROFILE_KEEP are kept
+PROFILE_DIR = BASE_DIR / "build" / "profiles"
+PROFILE_KEEP = 50
+
+# Live seat-map events (home/seat_events.py). Streams are only served, and
+# only used by the seat picker, when running under ASGI (core/asgi.py, e.g.
+# uvicorn or gunicorn -k uvicorn.workers.UvicornWorker); under WSGI the picker
+# polls. Each open bus/date channel also re-reads its seats this often, to
+# catch bookings made in other worker processes (0 = only on changes seen in
+# this process). Streams send a keep-alive comment every HEARTBEAT seconds
+# and close after MAX seconds.
+SEAT_EVENTS_ENABLED = True
+SEAT_EVENTS_POLL_SECONDS = 5
+SEAT_EVENTS_HEARTBEAT_SECONDS = 15
+SEAT_EVENTS_MAX_SECONDS = 300
@@ -15,7 +15,8 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin
-from django.urls import path, include
+from django.conf import settings
+from django.urls import path, include, re_path
 from home import views as home_views
 
 urlpatterns = [
@@ -75,6 +76,7 @@ urlpatterns = [
 
 
     path("admin_management/", home_views.admin_management, name="admin_management"),
+    path("admin_management/<slug:section>/", home_views.admin_section, name="admin_section"),
     path("add_customer/", home_views.add_customer, name="add_customer"),
     path("edit_customer/<int:customer_id>/", home_views.edit_customer, name="edit_customer"),
     path("delete_customer/<int:customer_id>/", home_views.delete_customer, name="delete_customer"),
@@ -87,12 +89,27 @@ urlpatterns = [
     path("edit-profile/", home_views.edit_profile, name="edit_profile"),
     path("update-admin-profile/", home_views.update_admin_profile, name="update_admin_profile"),
     path("payments/", home_views.payment_list, name="payment_list"),
+    path("exports/<slug:name>/", home_views.admin_export, name="admin_export"),
     path("payments/<int:booking_id>/", home_views.payment_view, name="payment"),
     path("payment/<int:booking_id>/", home_views.payment_view, name="add_payment"),
     path("create-payment/<int:booking_id>/", home_views.create_payment_view, name="create_payment"),
+    path("api/buses/<int:bus_id>/seats/", home_views.seat_availability, name="seat_availability"),
+    path("api/buses/<int:bus_id>/seats/events/", home_views.seat_events, name="seat_events"),
+    path("metrics/", home_views.metrics_view, name="metrics"),
+    path("ready/", home_views.readiness_view, name="readiness"),
+    path("profiles/", home_views.profile_list, name="profile_list"),
+    path("profiles/<str:name>/", home_views.profile_detail, name="profile_detail"),
 
 
 ]
 
 
 # Admin booking steps
+
+
+# runserver serves static files itself in DEBUG; otherwise (e.g. gunicorn) the
+# collected files are served here, with long cache headers for hashed names
+if not settings.DEBUG:
+    urlpatterns += [
+        re_path(r"^%s(?P<path>.*)$" % settings.STATIC_URL.lstrip("/"), home_views.static_asset),
+    ]
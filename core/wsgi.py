@@ -14,3 +14,9 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
 
 application = get_wsgi_application()
+
+# Optional in-process sweeper that expires unpaid reservations (see home.seats)
+from django.conf import settings  # noqa: E402
+from home.seats import start_expiry_sweeper  # noqa: E402
+
+start_expiry_sweeper(settings.RESERVATION_SWEEP_INTERVAL)
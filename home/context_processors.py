@@ -0,0 +1,10 @@
+# home/context_processors.py
+def session_user(request):
+    """``session_user``: the logged-in User, loaded only if a template uses it.
+
+    Profile fields used to be copied into the session at login (and went stale
+    on every profile edit); the session now only holds user_id and role. This
+    is the same lazy object as request.current_user (home/middleware.py), so a
+    view and its template share one query.
+    """
+    return {"session_user": getattr(request, "current_user", None)}
@@ -0,0 +1,35 @@
+# home/decorators.py
+"""Role checks for views, read from the session without touching the database.
+
+Views that need the User object itself use ``request.current_user`` (see
+home/middleware.py), which is loaded at most once per request.
+"""
+from functools import wraps
+
+from django.contrib import messages
+from django.http import HttpResponseForbidden
+from django.shortcuts import redirect
+
+
+def role_required(*roles, message="Please login first to continue."):
+    """Only let through sessions logged in with one of ``roles``.
+
+    Others are sent to the login page with ``message``; background (XHR)
+    requests get a 403 instead of a redirect.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.session.get("user_id") and request.session.get("role") in roles:
+                return view(request, *args, **kwargs)
+            if request.headers.get("X-Requested-With") == "XMLHttpRequest":
+                return HttpResponseForbidden(message)
+            messages.warning(request, message)
+            return redirect("login")
+        return wrapper
+    return decorator
+
+
+login_required = role_required("customer", "admin")
+customer_required = role_required("customer", message="Please login as a customer to continue.")
+admin_required = role_required("admin", message="Access denied. Admin privileges required.")
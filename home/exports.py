@@ -0,0 +1,196 @@
+# home/exports.py
+"""Streaming CSV / JSON Lines exports of bookings, payments and refunds (see views.admin_export).
+
+Rows are read in batches of EXPORT_CHUNK_SIZE by primary key
+(``WHERE id > last ORDER BY id LIMIT n``) and written out as each batch
+arrives, so a multi-million-row export starts downloading at once and holds
+one batch in memory. Plain ``iterator()`` would not be enough on MySQL: the
+driver buffers the whole result set client side. Values are read with
+``values_list()``, without building model instances.
+
+Under ASGI the view streams ``astream()`` instead of ``stream()``: Django
+would collect a sync iterator into a list before sending the first byte, so
+the async version fetches each batch through sync_to_async.
+
+Filters (all optional): ``start`` / ``end`` (inclusive dates in
+SERVICE_TIME_ZONE, matched against each export's date field), ``route``
+(route id) and ``status``. Datetimes are written in SERVICE_TIME_ZONE too.
+"""
+import csv
+import json
+from datetime import date, datetime, time, timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils import timezone
+
+from .models import Booking, Payment, RefundRequest
+from .trips import service_zone
+
+FORMATS = {"csv": "text/csv", "jsonl": "application/x-ndjson"}
+
+
+class ExportError(ValueError):
+    """A filter value that cannot be applied; the message is shown to the admin."""
+
+
+# name -> model, date field, route field, status values (None = free text), (header, field) columns.
+# Card numbers and other payment details are left out on purpose.
+EXPORTS = {
+    "bookings": (Booking, "created_at", "route_id", [value for value, _ in Booking.STATUS_CHOICES], [
+        ("id", "id"),
+        ("booking_number", "booking_number"),
+        ("status", "status"),
+        ("travel_date", "booking_date"),
+        ("route_id", "route_id"),
+        ("origin", "route__origin"),
+        ("destination", "route__destination"),
+        ("bus_number", "bus__bus_number"),
+        ("seats", "seat_number"),
+        ("seat_price", "bus__price"),
+        ("customer_email", "user__email"),
+        ("reserved_until", "reserved_until"),
+        ("created_at", "created_at"),
+    ]),
+    "payments": (Payment, "created_at", "booking__route_id", [value for value, _ in Payment.STATUS_CHOICES], [
+        ("id", "id"),
+        ("booking_id", "booking_id"),
+        ("booking_number", "booking__booking_number"),
+        ("route_id", "booking__route_id"),
+        ("customer_email", "user__email"),
+        ("amount", "amount"),
+        ("method", "method"),
+        ("status", "status"),
+        ("paid_at", "paid_at"),
+        ("created_at", "created_at"),
+    ]),
+    "refunds": (RefundRequest, "submitted_at", "booking__route_id", None, [
+        ("id", "id"),
+        ("booking_id", "booking_id"),
+        ("booking_number", "booking__booking_number"),
+        ("route_id", "booking__route_id"),
+        ("customer_email", "user__email"),
+        ("refund_as", "refund_as"),
+        ("booking_amount", "booking_amount"),
+        ("status", "status"),
+        ("transaction_date", "transaction_date"),
+        ("submitted_at", "submitted_at"),
+    ]),
+}
+
+
+def _parse_date(value, name):
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise ExportError(f"{name} must be a date like 2030-01-31.") from None
+
+
+def _day_start(day):
+    start = datetime.combine(day, time.min)
+    return timezone.make_aware(start, service_zone()) if settings.USE_TZ else start
+
+
+def filtered(name, params):
+    """The queryset (unordered) of the export ``name`` (a key of EXPORTS) with the request's filters applied.
+
+    Raises ExportError for an invalid filter value.
+    """
+    model, date_field, route_field, statuses, _ = EXPORTS[name]
+    queryset = model.objects.all()
+
+    # Ranges on the raw datetime column (not __date) so its index can be used
+    if params.get("start"):
+        queryset = queryset.filter(**{f"{date_field}__gte": _day_start(_parse_date(params["start"], "start"))})
+    if params.get("end"):
+        end = _parse_date(params["end"], "end") + timedelta(days=1)
+        queryset = queryset.filter(**{f"{date_field}__lt": _day_start(end)})
+    if params.get("route"):
+        # isdigit() would also let through digits int() rejects, such as "²"
+        if not (params["route"].isascii() and params["route"].isdecimal()):
+            raise ExportError("route must be a route id.")
+        queryset = queryset.filter(**{route_field: int(params["route"])})
+    if params.get("status"):
+        if statuses is not None and params["status"] not in statuses:
+            raise ExportError(f"status must be one of: {', '.join(statuses)}.")
+        queryset = queryset.filter(status=params["status"])
+    return queryset
+
+
+def _batch(name, queryset, last, chunk_size):
+    """Value tuples of the export's columns for up to ``chunk_size`` rows after primary key ``last``."""
+    fields = [field for _, field in EXPORTS[name][4]]
+    batch = queryset if last is None else queryset.filter(pk__gt=last)
+    return list(batch.order_by("pk").values_list(*fields)[:chunk_size])
+
+
+def batches(name, queryset, chunk_size=None):
+    """Yield lists of value tuples of the export's columns in primary-key order."""
+    chunk_size = chunk_size or getattr(settings, "EXPORT_CHUNK_SIZE", 2000)
+    last = None
+    while True:
+        batch = _batch(name, queryset, last, chunk_size)
+        yield batch
+        if len(batch) < chunk_size:
+            return
+        last = batch[-1][0]  # "id" is always the first column
+
+
+async def abatches(name, queryset, chunk_size=None):
+    """batches() for async code: each query runs in a worker thread."""
+    chunk_size = chunk_size or getattr(settings, "EXPORT_CHUNK_SIZE", 2000)
+    last = None
+    while True:
+        batch = await sync_to_async(_batch)(name, queryset, last, chunk_size)
+        yield batch
+        if len(batch) < chunk_size:
+            return
+        last = batch[-1][0]
+
+
+def rows(name, queryset, chunk_size=None):
+    """Yield value tuples of the export's columns in primary-key order, one batch at a time."""
+    for batch in batches(name, queryset, chunk_size):
+        yield from batch
+
+
+class _Echo:
+    """A file-like object whose write() returns the line, for csv.writer."""
+
+    def write(self, value):
+        return value
+
+
+def _format(value):
+    if isinstance(value, datetime):
+        return timezone.localtime(value, service_zone()).isoformat() if timezone.is_aware(value) else value.isoformat()
+    if isinstance(value, (date, time)):
+        return value.isoformat()
+    return value
+
+
+def _encoder(name, fmt):
+    """The export's header lines and a function that encodes one row as a line."""
+    headers = [header for header, _ in EXPORTS[name][4]]
+    if fmt == "csv":
+        writer = csv.writer(_Echo())
+        return [writer.writerow(headers)], lambda row: writer.writerow([_format(value) for value in row])
+    return [], lambda row: json.dumps(dict(zip(headers, map(_format, row))), default=str) + "\n"
+
+
+def stream(name, queryset, fmt="csv"):
+    """Encoded lines of the export: a CSV header and rows, or one JSON object per row."""
+    header, encode = _encoder(name, fmt)
+    yield from header
+    for row in rows(name, queryset):
+        yield encode(row)
+
+
+async def astream(name, queryset, fmt="csv"):
+    """stream() as an async iterator, for ASGI; yields one chunk per batch of rows."""
+    header, encode = _encoder(name, fmt)
+    for line in header:
+        yield line
+    async for batch in abatches(name, queryset):
+        if batch:
+            yield "".join(map(encode, batch))
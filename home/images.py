@@ -0,0 +1,92 @@
+# home/images.py
+"""Responsive image variants for the photos under home/static/home.
+
+`manage.py build_images` writes resized JPEG/PNG and WebP copies of every
+image into IMAGE_VARIANTS_DIR, together with a manifest.json describing them.
+That directory is on STATICFILES_DIRS, so collectstatic picks the variants up
+and gives them content-hashed names like any other static file. The
+{% responsive_img %} tag (home/templatetags/responsive_images.py) reads the
+manifest to emit srcset; images without variants fall back to a plain <img>.
+"""
+import json
+from functools import lru_cache
+from pathlib import Path
+
+from django.conf import settings
+
+SOURCE_DIR = Path(__file__).resolve().parent / "static"
+SOURCE_PREFIX = "home"
+VARIANT_PREFIX = "home/variants"
+VARIANT_WIDTHS = (480, 960, 1440)
+IMAGE_EXTENSIONS = {".jpg": "JPEG", ".jpeg": "JPEG", ".png": "PNG"}
+JPEG_QUALITY = 80
+WEBP_QUALITY = 78
+
+
+def variants_dir():
+    return Path(settings.IMAGE_VARIANTS_DIR)
+
+
+def manifest_path():
+    return variants_dir() / VARIANT_PREFIX / "manifest.json"
+
+
+def _save(image, path, fmt):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if fmt == "JPEG":
+        image.convert("RGB").save(path, "JPEG", quality=JPEG_QUALITY, optimize=True, progressive=True)
+    elif fmt == "WEBP":
+        image.save(path, "WEBP", quality=WEBP_QUALITY, method=6)
+    else:
+        image.save(path, fmt, optimize=True)
+
+
+def build_variants(widths=VARIANT_WIDTHS, force=False, source_dir=SOURCE_DIR):
+    """Write every missing variant and the manifest; returns (images, files written)."""
+    from PIL import Image, ImageOps  # build-time only
+
+    manifest = {}
+    written = 0
+    for source in sorted((Path(source_dir) / SOURCE_PREFIX).iterdir()):
+        fmt = IMAGE_EXTENSIONS.get(source.suffix.lower())
+        if fmt is None:
+            continue
+
+        name = f"{SOURCE_PREFIX}/{source.name}"
+        with Image.open(source) as original:
+            original = ImageOps.exif_transpose(original)
+            # Never upscale; small images get a single variant at their own width
+            sizes = sorted({min(width, original.width) for width in widths})
+            entry = {"width": original.width, "jpg" if fmt == "JPEG" else "png": [], "webp": []}
+
+            for width in sizes:
+                height = round(original.height * width / original.width)
+                resized = None
+                for kind, variant_fmt, ext in (
+                    ("jpg" if fmt == "JPEG" else "png", fmt, source.suffix.lower()),
+                    ("webp", "WEBP", ".webp"),
+                ):
+                    variant = f"{VARIANT_PREFIX}/{source.stem}-{width}{ext}"
+                    path = variants_dir() / variant
+                    if force or not path.exists() or path.stat().st_mtime < source.stat().st_mtime:
+                        if resized is None:
+                            resized = original if width == original.width else original.resize(
+                                (width, height), Image.LANCZOS
+                            )
+                        _save(resized, path, variant_fmt)
+                        written += 1
+                    entry[kind].append([width, variant])
+        manifest[name] = entry
+
+    manifest_path().parent.mkdir(parents=True, exist_ok=True)
+    manifest_path().write_text(json.dumps(manifest, indent=1, sort_keys=True))
+    load_manifest.cache_clear()
+    return len(manifest), written
+
+
+@lru_cache(maxsize=None)
+def load_manifest():
+    try:
+        return json.loads(manifest_path().read_text())
+    except (OSError, ValueError):
+        return {}
@@ -0,0 +1,269 @@
+# home/loadtest.py
+"""Scripted load test of the customer booking flow (`manage.py loadtest`).
+
+Each virtual customer logs in once and then repeatedly walks the flow over
+real HTTP, keeping its own cookies and CSRF token like a browser would:
+
+    search       GET  /booking/?origin=..&destination=..&booking_date=..
+    seat_select  GET  /booking/confirm/<bus>/?booking_date=..
+    reserve      POST /booking/confirm/<bus>/   -> 302 to the payment page
+    pay          POST /payments/<booking>/      -> 302 to the success page
+    success      GET  /booking/success/<booking>/
+
+Customers are spread over a small set of "hot" departures so they compete for
+the same seats. Losing that race (reserve redirects back to the search page)
+is counted as a conflict, not an error. After the run the active bookings on
+those departures are checked for seats that were sold twice.
+
+By default the command serves the app from a thread in the same process, with
+the locmem email backend so no mail leaves the machine; `--url` targets a
+server that is already running instead.
+"""
+import random
+import re
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from datetime import timedelta
+from http.cookiejar import CookieJar
+
+from django.conf import settings
+from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler, get_internal_wsgi_application
+from django.test.utils import override_settings
+
+from .models import Booking, Bus, User, split_seats
+from .synthetic import SEAT_LABELS
+from .trips import service_today
+
+STEPS = ("search", "seat_select", "reserve", "pay", "success")
+PERCENTILES = (50, 95, 99)
+TIMEOUT = 30
+PAYMENT_URL = re.compile(r"/payments/(\d+)/")
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    """Hand 3xx responses back to the caller; the flow checks where they point."""
+
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class Results:
+    """Latencies and outcomes per step, shared by all virtual customers."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = Counter()
+        self.conflicts = 0
+        self.flows = 0
+        self.error_samples = []
+        self.elapsed = 0.0
+
+    def record(self, step, seconds, ok, detail=""):
+        with self.lock:
+            self.latencies[step].append(seconds * 1000)
+        if not ok:
+            self.fail(step, detail)
+
+    def fail(self, step, detail):
+        with self.lock:
+            self.errors[step] += 1
+            if len(self.error_samples) < 10:
+                self.error_samples.append(f"{step}: {detail}")
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of ``values`` (None when empty)."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, -(-pct * len(ordered) // 100))
+    return ordered[rank - 1]
+
+
+class VirtualCustomer:
+    """One browser session: a cookie jar and the CSRF cookie it was given."""
+
+    def __init__(self, base_url, results):
+        self.base_url = base_url.rstrip("/")
+        self.results = results
+        self.cookies = CookieJar()
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(self.cookies), _NoRedirect)
+
+    def _csrf_token(self):
+        for cookie in self.cookies:
+            if cookie.name == settings.CSRF_COOKIE_NAME:
+                return cookie.value
+        return ""
+
+    def request(self, path, data=None):
+        """Returns (status, Location header, body) without following redirects."""
+        body = None
+        headers = {}
+        if data is not None:
+            body = urllib.parse.urlencode({**data, "csrfmiddlewaretoken": self._csrf_token()}).encode()
+            headers["Referer"] = self.base_url + path
+        req = urllib.request.Request(self.base_url + path, data=body, headers=headers)
+        try:
+            with self.opener.open(req, timeout=TIMEOUT) as response:
+                return response.status, response.headers.get("Location", ""), response.read()
+        except urllib.error.HTTPError as response:
+            return response.code, response.headers.get("Location", ""), response.read()
+
+    def step(self, name, path, data=None):
+        started = time.perf_counter()
+        try:
+            status, location, _ = self.request(path, data)
+        except OSError as exc:
+            self.results.record(name, time.perf_counter() - started, False, repr(exc))
+            return None, ""
+        self.results.record(name, time.perf_counter() - started, status < 500, f"HTTP {status}")
+        return status, location
+
+    def login(self, email, password):
+        self.request("/login/")  # sets the CSRF cookie
+        status, location, _ = self.request("/login/", {"email": email, "password": password})
+        return status == 302 and "/login/" not in location
+
+    def book(self, target, seats):
+        """Walk one flow; returns 'paid', 'conflict' or 'error'."""
+        bus_id, origin, destination, day = target
+        query = urllib.parse.urlencode({"origin": origin, "destination": destination, "booking_date": day})
+        if self.step("search", f"/booking/?{query}")[0] != 200:
+            return "error"
+        confirm = f"/booking/confirm/{bus_id}/?booking_date={day}"
+        if self.step("seat_select", confirm)[0] != 200:
+            return "error"
+
+        status, location = self.step("reserve", confirm, {"booking_date": day, "selected_seats": ",".join(seats)})
+        match = PAYMENT_URL.search(location)
+        if status == 302 and match:
+            booking_id = match.group(1)
+        elif status == 302 and "/booking/" in location:
+            return "conflict"
+        else:
+            return self._unexpected("reserve", status, location)
+
+        status, location = self.step("pay", f"/payments/{booking_id}/", {"action_type": "pay", "method": "cash"})
+        if status != 302 or f"/booking/success/{booking_id}/" not in location:
+            return self._unexpected("pay", status, location)
+        if self.step("success", f"/booking/success/{booking_id}/")[0] != 200:
+            return "error"
+        return "paid"
+
+    def _unexpected(self, step, status, location):
+        # A 2xx/3xx that left the flow (e.g. bounced to login) is still a failure;
+        # 5xx and connection errors were already counted by step()
+        if status is not None and status < 500:
+            self.results.fail(step, f"HTTP {status} -> {location or 'no redirect'}")
+        return "error"
+
+
+def hot_targets(buses, days, seed=1):
+    """Departures to compete for: ``buses`` buses on each of ``days`` days from tomorrow.
+
+    Returns ``(targets, capacities)``: (bus id, origin, destination, date)
+    tuples and the capacity of each chosen bus.
+    """
+    rng = random.Random(seed)
+    ids = list(Bus.objects.order_by("id").values_list("id", flat=True))
+    chosen = Bus.objects.select_related("route").filter(id__in=rng.sample(ids, min(buses, len(ids))))
+    start = service_today() + timedelta(days=1)
+    return [
+        (bus.id, bus.route.origin, bus.route.destination, (start + timedelta(days=offset)).isoformat())
+        for bus in chosen.order_by("id")
+        for offset in range(days)
+    ], {bus.id: bus.capacity for bus in chosen}
+
+
+def double_bookings(targets):
+    """Seats held by more than one active booking on the given departures."""
+    bus_ids = {bus_id for bus_id, *_ in targets}
+    dates = {day for *_, day in targets}
+    holders = Counter()
+    rows = Booking.objects.filter(
+        bus_id__in=bus_ids, booking_date__in=dates, status__in=Booking.ACTIVE_STATUSES
+    ).values_list("bus_id", "booking_date", "seat_number")
+    for bus_id, booking_date, seat_number in rows.iterator():
+        for seat in split_seats(seat_number):
+            holders[bus_id, booking_date, seat] += 1
+    return sum(count - 1 for count in holders.values() if count > 1)
+
+
+def run(base_url, customers, targets, capacities, concurrency=10, iterations=5, max_seats=2, seed=1):
+    """Run ``concurrency`` virtual customers for ``iterations`` flows each."""
+    results = Results()
+
+    def worker(index):
+        rng = random.Random(seed * 100_003 + index)
+        email, password = customers[index % len(customers)]
+        customer = VirtualCustomer(base_url, results)
+        if not customer.login(email, password):
+            results.fail("login", email)
+            return
+        for _ in range(iterations):
+            target = rng.choice(targets)
+            labels = SEAT_LABELS[:capacities[target[0]]]
+            outcome = customer.book(target, rng.sample(labels, rng.randint(1, max_seats)))
+            with results.lock:
+                results.flows += outcome == "paid"
+                results.conflicts += outcome == "conflict"
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(index,)) for index in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    results.elapsed = time.perf_counter() - started
+    return results
+
+
+def report(results, double_booked):
+    """Text table of per-step latency percentiles and error rates."""
+    lines = [f"{'step':<12} {'requests':>8} {'errors':>7} {'err %':>6} " + " ".join(f"{f'p{p} ms':>9}" for p in PERCENTILES)]
+    for step in STEPS:
+        latencies = results.latencies.get(step, [])
+        errors = results.errors[step]
+        rate = 100 * errors / len(latencies) if latencies else 0.0
+        cells = " ".join(
+            f"{percentile(latencies, p):>9.1f}" if latencies else f"{'-':>9}" for p in PERCENTILES
+        )
+        lines.append(f"{step:<12} {len(latencies):>8} {errors:>7} {rate:>6.1f} {cells}")
+    lines.append(
+        f"paid flows: {results.flows}  seat conflicts: {results.conflicts}  login failures: {results.errors['login']}  "
+        f"double-booked seats: {double_booked}  "
+        f"throughput: {results.flows / results.elapsed if results.elapsed else 0:.1f} flows/s over {results.elapsed:.1f}s"
+    )
+    lines.extend(f"  {sample}" for sample in results.error_samples)
+    return "\n".join(lines)
+
+
+class _QuietHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+@contextmanager
+def local_server():
+    """Serve the project from a background thread; yields its base URL."""
+    with override_settings(EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend"):
+        server = ThreadedWSGIServer(("127.0.0.1", 0), _QuietHandler, allow_reuse_address=False)
+        server.set_app(get_internal_wsgi_application())
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            yield f"http://127.0.0.1:{server.server_address[1]}"
+        finally:
+            server.shutdown()
+            server.server_close()
+
+
+def customer_logins(count):
+    """(email, password) of the first ``count`` customers (passwords are stored as entered)."""
+    return list(User.objects.filter(role="customer").order_by("id").values_list("email", "password")[:count])
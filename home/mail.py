@@ -0,0 +1,111 @@
+# home/mail.py
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.utils import timezone
+from django.utils.html import strip_tags
+
+from .models import OutboxEmail
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 6
+RETRY_BASE_SECONDS = 60  # 1, 2, 4, 8, 16 minutes between attempts
+LEASE_SECONDS = 600  # longer than one batch can take to send
+
+
+def queue_email(to, subject, html_body):
+    """Store an email in the outbox; the `send_outbox` worker delivers it later."""
+    return OutboxEmail.objects.create(to=to, subject=subject, html_body=html_body)
+
+
+def _message(email, connection):
+    message = EmailMultiAlternatives(
+        subject=email.subject,
+        body=strip_tags(email.html_body),
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        to=[email.to],
+        connection=connection,
+    )
+    message.attach_alternative(email.html_body, "text/html")
+    return message
+
+
+def claim_batch(batch_size=50, now=None):
+    """Lease up to ``batch_size`` due emails to this worker and return them.
+
+    The claim is a short transaction: the rows are locked only while their
+    next_attempt_at is pushed LEASE_SECONDS ahead, which hides them from other
+    workers while this one sends. If the worker dies mid-batch, the unsent
+    emails become due again when the lease runs out.
+    """
+    now = now or timezone.now()
+    with transaction.atomic():
+        batch = list(
+            OutboxEmail.objects.select_for_update(skip_locked=True)
+            .filter(status="pending", next_attempt_at__lte=now)
+            .order_by("next_attempt_at")[:batch_size]
+        )
+        if batch:
+            OutboxEmail.objects.filter(pk__in=[email.pk for email in batch]).update(
+                next_attempt_at=now + timedelta(seconds=LEASE_SECONDS)
+            )
+    return batch
+
+
+def send_pending(batch_size=50, now=None):
+    """Send one batch of due outbox emails over a single SMTP connection.
+
+    The batch is claimed first (see claim_batch), so no transaction or row
+    lock is held during SMTP I/O. Failed emails are retried with exponential
+    backoff and moved to 'dead' after MAX_ATTEMPTS. Returns ``(sent, failed)``
+    for the batch.
+    """
+    now = now or timezone.now()
+    sent = failed = 0
+
+    batch = claim_batch(batch_size, now)
+    if not batch:
+        return sent, failed
+
+    connection = get_connection()
+    try:
+        connection.open()
+    except Exception as e:
+        # Server unreachable: every email in the batch counts as an attempt
+        for email in batch:
+            _record_failure(email, e, now)
+        return sent, len(batch)
+
+    try:
+        for email in batch:
+            try:
+                _message(email, connection).send()
+            except Exception as e:
+                _record_failure(email, e, now)
+                failed += 1
+            else:
+                email.status = "sent"
+                email.sent_at = now
+                email.attempts += 1
+                email.last_error = ""
+                email.save(update_fields=["status", "sent_at", "attempts", "last_error", "updated_at"])
+                sent += 1
+    finally:
+        connection.close()
+
+    return sent, failed
+
+
+def _record_failure(email, error, now):
+    email.attempts += 1
+    email.last_error = str(error)[:1000]
+    if email.attempts >= MAX_ATTEMPTS:
+        email.status = "dead"
+        logger.error("Giving up on outbox email %s to %s: %s", email.id, email.to, error)
+    else:
+        email.next_attempt_at = now + timedelta(seconds=RETRY_BASE_SECONDS * 2 ** (email.attempts - 1))
+    email.save(update_fields=["status", "attempts", "last_error", "next_attempt_at", "updated_at"])
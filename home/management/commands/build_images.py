@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from home.images import VARIANT_WIDTHS, build_variants, variants_dir
+
+
+class Command(BaseCommand):
+    help = "Generate resized and WebP variants of the images in home/static/home (run before collectstatic)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--widths", type=int, nargs="+", default=list(VARIANT_WIDTHS),
+            help="Variant widths in pixels.",
+        )
+        parser.add_argument("--force", action="store_true", help="Rebuild variants that are already up to date.")
+
+    def handle(self, *args, **options):
+        images, written = build_variants(widths=options["widths"], force=options["force"])
+        self.stdout.write(f"{images} image(s), {written} variant file(s) written to {variants_dir()}.")
@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from home.seats import expire_reservations
+
+
+class Command(BaseCommand):
+    help = "Expire overdue seat reservations and release their seats."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500, help="Bookings expired per UPDATE.")
+        parser.add_argument(
+            "--every", type=int, default=0, metavar="SECONDS",
+            help="Keep running and sweep every SECONDS instead of once.",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            expired = expire_reservations(batch_size=options["batch_size"])
+            self.stdout.write(f"Expired {expired} reservation(s).")
+            if not options["every"]:
+                break
+            time.sleep(options["every"])
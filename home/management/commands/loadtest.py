@@ -0,0 +1,44 @@
+from contextlib import nullcontext
+
+from django.core.management.base import BaseCommand, CommandError
+
+from home.loadtest import customer_logins, double_bookings, hot_targets, local_server, report, run
+
+
+class Command(BaseCommand):
+    help = (
+        "Simulate concurrent customers searching, reserving, paying and viewing the success page; "
+        "reports p50/p95/p99 latency and error rate per step plus any double-booked seats. "
+        "Run generate_dataset first."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--url", default=None, help="Base URL of a running server (default: serve in-process).")
+        parser.add_argument("--concurrency", type=int, default=10, help="Virtual customers running at once.")
+        parser.add_argument("--iterations", type=int, default=5, help="Booking flows per virtual customer.")
+        parser.add_argument("--customers", type=int, default=100, help="Distinct customer accounts to log in as.")
+        parser.add_argument("--buses", type=int, default=5, help="Hot buses the customers compete for.")
+        parser.add_argument("--days", type=int, default=2, help="Departure dates per hot bus, from tomorrow.")
+        parser.add_argument("--max-seats", type=int, default=2, help="Most seats one flow tries to book.")
+        parser.add_argument("--seed", type=int, default=1, help="Seed for bus, seat and customer choices.")
+
+    def handle(self, *args, **options):
+        customers = customer_logins(options["customers"])
+        targets, capacities = hot_targets(options["buses"], options["days"], seed=options["seed"])
+        if not customers or not targets:
+            raise CommandError("No customers or buses to book; run `manage.py generate_dataset` first.")
+
+        with local_server() if options["url"] is None else nullcontext(options["url"]) as base_url:
+            self.stdout.write(
+                f"{options['concurrency']} customers x {options['iterations']} flows against {base_url} "
+                f"({len(targets)} hot departures)"
+            )
+            results = run(
+                base_url, customers, targets, capacities,
+                concurrency=options["concurrency"], iterations=options["iterations"],
+                max_seats=options["max_seats"], seed=options["seed"],
+            )
+        double_booked = double_bookings(targets)
+        self.stdout.write(report(results, double_booked))
+        if double_booked:
+            raise CommandError(f"{double_booked} seats were sold more than once.")
@@ -0,0 +1,26 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from home.trips import extend_trips, prune_trips, service_today, window_days
+
+
+class Command(BaseCommand):
+    help = "Extend the rolling window of dated trips and prune trips that are long past."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days", type=int, default=None,
+            help="Days ahead of today to materialize (default: settings.TRIP_WINDOW_DAYS).",
+        )
+        parser.add_argument(
+            "--keep-days", type=int, default=7,
+            help="Keep trips this many days into the past; older ones are deleted.",
+        )
+        parser.add_argument("--batch-size", type=int, default=1000, help="Trips inserted per INSERT.")
+
+    def handle(self, *args, **options):
+        today = service_today()
+        days = window_days() if options["days"] is None else options["days"]
+        extend_trips(today, days, batch_size=options["batch_size"])
+        pruned = prune_trips(today - timedelta(days=options["keep_days"]))
+        self.stdout.write(f"Trips materialized through {today + timedelta(days=days - 1)}; pruned {pruned}.")
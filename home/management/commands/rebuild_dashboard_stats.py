@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from home.stats import rebuild_all
+
+
+class Command(BaseCommand):
+    help = "Recompute the dashboard summary tables from scratch (repairs counter drift)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000, help="Rows per bulk insert.")
+
+    def handle(self, *args, **options):
+        counters = rebuild_all(batch_size=options["batch_size"])
+        for key in sorted(counters):
+            self.stdout.write(f"{key}: {counters[key]}")
+        self.stdout.write(self.style.SUCCESS("Dashboard stats rebuilt."))
@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from home.mail import send_pending
+
+
+class Command(BaseCommand):
+    help = "Send queued outbox emails in batches over one SMTP connection."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=50, help="Emails sent per SMTP connection.")
+        parser.add_argument(
+            "--every", type=int, default=0, metavar="SECONDS",
+            help="Keep running and poll the outbox every SECONDS instead of draining it once.",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            total_sent = total_failed = 0
+            # Drain everything that is due, one batch (and connection) at a time
+            while True:
+                sent, failed = send_pending(batch_size=options["batch_size"])
+                total_sent += sent
+                total_failed += failed
+                if not sent:
+                    break
+            self.stdout.write(f"Sent {total_sent} email(s), {total_failed} failed.")
+            if not options["every"]:
+                break
+            time.sleep(options["every"])
@@ -0,0 +1,267 @@
+# home/metrics.py
+"""Request metrics in Prometheus text format (see RequestMetricsMiddleware).
+
+Each process keeps its counters and histograms in memory. With METRICS_DIR
+set (needed under gunicorn, where every worker is a separate process), a
+worker also writes a snapshot of them to METRICS_DIR/worker-<pid>.json, and
+the /metrics/ endpoint sums the snapshots of all workers. Snapshots are
+written after a request at most every METRICS_FLUSH_INTERVAL seconds, by a
+background thread every interval while there are unwritten changes (so an
+idle worker still publishes its last requests), and when the worker exits.
+Another worker's numbers can therefore lag by up to METRICS_FLUSH_INTERVAL
+seconds, and a worker that is killed (e.g. by gunicorn's timeout) loses what
+it recorded since its last snapshot. Counters only grow, so snapshots left
+behind by restarted workers still add up correctly; empty the directory when
+the whole server is restarted.
+"""
+import atexit
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from contextvars import ContextVar
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+# name -> (type, help, histogram buckets)
+METRICS = {
+    "http_requests_total": ("counter", "Requests by view, method and status code.", None),
+    "http_request_duration_seconds": (
+        "histogram", "Time spent handling the request.",
+        (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+    ),
+    "http_request_db_queries": (
+        "histogram", "SQL queries run per request.", (0, 1, 2, 5, 10, 20, 50, 100),
+    ),
+    "http_request_db_seconds_total": ("counter", "Time spent in SQL queries.", None),
+    "http_response_size_bytes": (
+        "histogram", "Size of non-streaming response bodies.",
+        (256, 1024, 4096, 16384, 65536, 262144, 1048576),
+    ),
+}
+
+
+class Registry:
+    """Counters and histograms keyed by (metric name, sorted label pairs)."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = defaultdict(float)
+        self.histograms = {}  # key -> [count per bucket..., +Inf count, sum]
+        self.flushed_at = 0.0
+        self.changed = False  # recorded anything since the last snapshot
+        self.flusher_pid = None  # process the background flusher runs in
+
+    def inc(self, name, labels, value=1):
+        with self.lock:
+            self.counters[name, labels] += value
+            self.changed = True
+
+    def observe(self, name, labels, value):
+        buckets = METRICS[name][2]
+        with self.lock:
+            series = self.histograms.get((name, labels))
+            if series is None:
+                series = self.histograms[name, labels] = [0] * (len(buckets) + 1) + [0.0]
+            index = next((i for i, bound in enumerate(buckets) if value <= bound), len(buckets))
+            series[index] += 1
+            series[-1] += value
+            self.changed = True
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                "counters": [[name, labels, value] for (name, labels), value in self.counters.items()],
+                "histograms": [[name, labels, series[:]] for (name, labels), series in self.histograms.items()],
+            }
+
+    def merge(self, snapshot):
+        with self.lock:
+            for name, labels, value in snapshot["counters"]:
+                self.counters[name, _labels(labels)] += value
+            for name, labels, series in snapshot["histograms"]:
+                key = (name, _labels(labels))
+                current = self.histograms.setdefault(key, [0] * len(series))
+                for index, value in enumerate(series):
+                    current[index] += value
+
+    def flush(self, force=False):
+        """Write this worker's snapshot to METRICS_DIR (no-op when unset)."""
+        directory = getattr(settings, "METRICS_DIR", None)
+        if not directory:
+            return
+        self.start_flusher()
+        now = time.monotonic()
+        if not force and now - self.flushed_at < getattr(settings, "METRICS_FLUSH_INTERVAL", 5):
+            return
+        self.flushed_at = now
+        with self.lock:
+            self.changed = False
+        path = Path(directory) / f"worker-{os.getpid()}.json"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temp = path.with_suffix(f".{threading.get_ident()}.tmp")
+        temp.write_text(json.dumps(self.snapshot()))
+        os.replace(temp, path)
+
+    def start_flusher(self):
+        """Flush every METRICS_FLUSH_INTERVAL seconds while there are changes, and at exit.
+
+        Started on the first flush in each process, so it runs in the worker
+        (threads do not survive the fork from a preloading gunicorn master).
+        """
+        pid = os.getpid()
+        if self.flusher_pid == pid:
+            return
+        self.flusher_pid = pid
+        interval = getattr(settings, "METRICS_FLUSH_INTERVAL", 5)
+
+        def flush_forever():
+            while True:
+                time.sleep(interval)
+                if self.changed:
+                    self.flush(force=True)
+
+        threading.Thread(target=flush_forever, name="metrics-flush", daemon=True).start()
+        atexit.register(self.flush_at_exit, pid)
+
+    def flush_at_exit(self, pid):
+        if os.getpid() == pid and self.changed:
+            self.flush(force=True)
+
+
+# QueryTimers active in the current context. sync_to_async copies the context
+# into its worker thread, so queries are attributed to the right request
+# wherever the ORM runs (under ASGI that is not the event-loop thread).
+_active_timers = ContextVar("query_timers", default=())
+
+
+def _dispatch(execute, sql, params, many, context):
+    timers = _active_timers.get()
+    if not timers:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - started
+        for timer in timers:
+            timer.record(context["connection"].alias, sql, params, elapsed)
+
+
+@receiver(connection_created)
+def install_query_dispatch(sender, connection, **kwargs):
+    """Give every database connection, in any thread, the timing wrapper (once)."""
+    if _dispatch not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_dispatch)
+
+
+class QueryTimer:
+    """Count and time the SQL run inside a ``with`` block, in any thread it reaches.
+
+    Queries are counted on whichever thread runs them, as long as it inherits
+    this context (sync_to_async does). With ``log=True`` each query is also
+    kept in ``queries`` as {"alias", "sql", "params", "ms"}.
+    """
+
+    def __init__(self, log=False):
+        self.count = 0
+        self.seconds = 0.0
+        self.queries = [] if log else None
+        self._lock = threading.Lock()
+        self._token = None
+
+    def record(self, alias, sql, params, elapsed):
+        with self._lock:
+            self.count += 1
+            self.seconds += elapsed
+            if self.queries is not None:
+                self.queries.append({
+                    "alias": alias, "sql": sql, "params": repr(params)[:500], "ms": round(elapsed * 1000, 3),
+                })
+
+    def __enter__(self):
+        # Connections this thread opened before the signal receiver existed
+        for connection in connections.all(initialized_only=True):
+            install_query_dispatch(None, connection)
+        self._token = _active_timers.set(_active_timers.get() + (self,))
+        return self
+
+    def __exit__(self, *exc_info):
+        _active_timers.reset(self._token)
+
+
+def _labels(pairs):
+    return tuple(tuple(pair) for pair in pairs)
+
+
+registry = Registry()
+
+
+def collect():
+    """This process's metrics, or the sum over every worker's snapshot."""
+    directory = getattr(settings, "METRICS_DIR", None)
+    if not directory:
+        return registry
+    registry.flush(force=True)
+    total = Registry()
+    for path in sorted(Path(directory).glob("worker-*.json")):
+        try:
+            total.merge(json.loads(path.read_text()))
+        except (OSError, ValueError):
+            continue  # a worker is replacing its file
+    return total
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in pairs) + "}"
+
+
+def render(source=None):
+    """Prometheus text exposition (format 0.0.4) of ``source`` (default: collect())."""
+    source = source or collect()
+    lines = []
+    for name, (kind, help_text, buckets) in METRICS.items():
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+        if kind == "counter":
+            for (metric, labels), value in sorted(source.counters.items()):
+                if metric == name:
+                    lines.append(f"{name}{_format_labels(labels)} {value:g}")
+            continue
+        for (metric, labels), series in sorted(source.histograms.items()):
+            if metric != name:
+                continue
+            cumulative = 0
+            for bound, count in zip(list(buckets) + ["+Inf"], series[:-1]):
+                cumulative += count
+                lines.append(f"{name}_bucket{_format_labels(labels, [('le', bound)])} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {series[-1]:g}")
+            lines.append(f"{name}_count{_format_labels(labels)} {cumulative}")
+    return "\n".join(lines) + "\n"
+
+
+def check_databases():
+    """Run SELECT 1 on every configured database; returns {alias: (ok, milliseconds)}."""
+    results = {}
+    for alias in settings.DATABASES:
+        started = time.perf_counter()
+        try:
+            with connections[alias].cursor() as cursor:
+                cursor.execute("SELECT 1")
+                cursor.fetchone()
+            ok = True
+        except Exception:
+            ok = False
+        results[alias] = (ok, (time.perf_counter() - started) * 1000)
+    return results
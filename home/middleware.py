@@ -0,0 +1,219 @@
+# home/middleware.py
+import time
+
+from asgiref.sync import async_to_sync, iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.functional import SimpleLazyObject
+
+from . import profiling, replicas
+from .metrics import QueryTimer, registry
+from .models import User
+
+KNOWN_METHODS = {"GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"}
+
+
+class SyncAndAsyncMiddleware:
+    """Base for middleware that can run in a sync (WSGI) or async (ASGI) chain.
+
+    Django only keeps a request async end to end (e.g. for async views under
+    core/asgi.py) when every middleware is async-capable. Subclasses implement
+    ``handle(request)`` for the sync chain and ``__acall__(request)`` for the
+    async one, where database work such as loading the session has to go
+    through sync_to_async.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.handle(request)
+
+
+class SessionRefreshMiddleware(SyncAndAsyncMiddleware):
+    """Keep sessions alive without writing them on every request.
+
+    With SESSION_SAVE_EVERY_REQUEST off, Django only saves a session when its
+    data changes, so an active user's session would expire SESSION_COOKIE_AGE
+    after login. This stamps the session (which marks it modified, so it is
+    saved and its cookie re-sent) once SESSION_REFRESH_AFTER seconds have
+    passed since the last save. Works with any session backend. Must come
+    after SessionMiddleware in MIDDLEWARE.
+    """
+
+    STAMP_KEY = "_saved_at"
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        self.refresh_after = getattr(settings, "SESSION_REFRESH_AFTER", settings.SESSION_COOKIE_AGE // 4)
+
+    def handle(self, request):
+        response = self.get_response(request)
+        self.stamp(request)
+        return response
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        await sync_to_async(self.stamp)(request)
+        return response
+
+    def stamp(self, request):
+        session = getattr(request, "session", None)
+        # Empty sessions (anonymous visitors, just logged out) are never created
+        if session is None or session.is_empty():
+            return
+
+        now = int(time.time())
+        if session.modified or now - session.get(self.STAMP_KEY, 0) >= self.refresh_after:
+            session[self.STAMP_KEY] = now
+
+
+def current_user_cache_key(user_id):
+    return f"home:user:{user_id}"
+
+
+def load_current_user(request):
+    """The User for the session's user_id, or None if logged out or deleted.
+
+    With CURRENT_USER_CACHE_TIMEOUT > 0 the row is kept in the cache for that
+    many seconds; home/signals.py drops it whenever the user is saved or deleted.
+    """
+    user_id = request.session.get("user_id")
+    if not user_id:
+        return None
+
+    timeout = getattr(settings, "CURRENT_USER_CACHE_TIMEOUT", 0)
+    if timeout:
+        user = cache.get(current_user_cache_key(user_id))
+        if user is not None:
+            return user
+
+    with replicas.primary():
+        user = User.objects.filter(pk=user_id).first()
+    if timeout and user is not None:
+        cache.set(current_user_cache_key(user_id), user, timeout)
+    return user
+
+
+class CurrentUserMiddleware(SyncAndAsyncMiddleware):
+    """Set ``request.current_user``, loaded on first use and at most once per request.
+
+    Must come after SessionMiddleware in MIDDLEWARE. Async views must not touch
+    it from the event loop (it may query the database).
+    """
+
+    def handle(self, request):
+        request.current_user = SimpleLazyObject(lambda: load_current_user(request))
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        request.current_user = SimpleLazyObject(lambda: load_current_user(request))
+        return await self.get_response(request)
+
+
+class RequestMetricsMiddleware(SyncAndAsyncMiddleware):
+    """Record latency, SQL query count and time, response size and status per view.
+
+    Labels are the URL name (not the path) so the number of series stays
+    bounded; requests that match no URL are recorded as "<unresolved>". SQL is
+    timed with a connection execute_wrapper, which costs two clock reads per
+    query. The numbers are served by the /metrics/ view (home/metrics.py).
+    Put it first in MIDDLEWARE so the time spent in other middleware counts.
+    """
+
+    def handle(self, request):
+        started = time.perf_counter()
+        with QueryTimer() as queries:
+            response = self.get_response(request)
+        self.record(request, response, time.perf_counter() - started, queries)
+        return response
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        with QueryTimer() as queries:
+            response = await self.get_response(request)
+        self.record(request, response, time.perf_counter() - started, queries)
+        return response
+
+    def record(self, request, response, elapsed, queries):
+        match = request.resolver_match
+        view = (match.view_name if match else None) or "<unresolved>"
+        method = request.method if request.method in KNOWN_METHODS else "other"
+        labels = (("view", view),)
+        registry.inc("http_requests_total", labels + (("method", method), ("status", str(response.status_code))))
+        registry.observe("http_request_duration_seconds", labels, elapsed)
+        registry.observe("http_request_db_queries", labels, queries.count)
+        registry.inc("http_request_db_seconds_total", labels, queries.seconds)
+        if not response.streaming:
+            registry.observe("http_response_size_bytes", labels, len(response.content))
+        registry.flush()
+
+
+class ProfilerMiddleware(SyncAndAsyncMiddleware):
+    """Profile single requests for admins who ask for it (home/profiling.py).
+
+    When neither ``?_profile=1`` nor ``X-Profile: 1`` is present the request
+    passes straight through; the session is only read once a flag is seen.
+    Profiled responses carry the saved profile's name in ``X-Profile-Id``.
+    Must come after SessionMiddleware in MIDDLEWARE.
+    """
+
+    def handle(self, request):
+        if not (profiling.flagged(request) and profiling.is_admin(request)):
+            return self.get_response(request)
+        with profiling.Recorder() as recorder:
+            response = self.get_response(request)
+        return self.finish(request, response, recorder)
+
+    async def __acall__(self, request):
+        if not (profiling.flagged(request) and await sync_to_async(profiling.is_admin)(request)):
+            return await self.get_response(request)
+        # cProfile only sees the thread it runs in, so drive the rest of the
+        # chain from a worker thread: sync views and ORM calls below are then
+        # run on that same thread by asgiref and show up in the profile
+        return await sync_to_async(self.profile_from_thread)(request)
+
+    def profile_from_thread(self, request):
+        with profiling.Recorder() as recorder:
+            response = async_to_sync(self.get_response)(request)
+        return self.finish(request, response, recorder)
+
+    def finish(self, request, response, recorder):
+        response[profiling.HEADER + "-Id"] = recorder.save(request, response) or "busy"
+        return response
+
+
+class ReplicaMiddleware(SyncAndAsyncMiddleware):
+    """Route reads to DATABASE_REPLICA with read-your-writes stickiness (home/replicas.py).
+
+    A response to a request that wrote anything pins the client to the primary
+    for REPLICA_STICKY_SECONDS. Without DATABASE_REPLICA the request passes
+    straight through. Must come after SessionMiddleware in MIDDLEWARE, so the
+    session saves made on the way out do not count as writes.
+    """
+
+    def handle(self, request):
+        if not replicas.replica_alias():
+            return self.get_response(request)
+        with replicas.routing(request) as state:
+            response = self.get_response(request)
+        return self.finish(response, state)
+
+    async def __acall__(self, request):
+        if not replicas.replica_alias():
+            return await self.get_response(request)
+        with replicas.routing(request) as state:
+            response = await self.get_response(request)
+        return self.finish(response, state)
+
+    def finish(self, response, state):
+        if state["wrote"]:
+            replicas.pin(response)
+        return response
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0002_sync_models'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SeatAllocation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('booking_date', models.DateField()),
+                ('seat_label', models.CharField(max_length=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('booking', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='seats', to='home.booking')),
+                ('bus', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='seat_allocations', to='home.bus')),
+            ],
+            options={
+                'db_table': 'seat_allocation',
+                'constraints': [models.UniqueConstraint(fields=('bus', 'booking_date', 'seat_label'), name='uniq_seat_per_bus_date')],
+            },
+        ),
+    ]
@@ -0,0 +1,45 @@
+from django.db import migrations
+
+
+def split_seat_numbers(apps, schema_editor):
+    """Copy the comma separated Booking.seat_number values into SeatAllocation rows."""
+    Booking = apps.get_model("home", "Booking")
+    SeatAllocation = apps.get_model("home", "SeatAllocation")
+
+    taken = set()
+    batch = []
+    bookings = (
+        Booking.objects.filter(status__in=("reserved", "confirmed"))
+        .order_by("id")
+        .values_list("id", "bus_id", "booking_date", "seat_number")
+    )
+    for booking_id, bus_id, booking_date, seat_number in bookings.iterator():
+        for seat in (seat_number or "").split(","):
+            seat = seat.strip()
+            key = (bus_id, booking_date, seat)
+            # Older data can contain double bookings; the earliest booking keeps the seat.
+            if not seat or key in taken:
+                continue
+            taken.add(key)
+            batch.append(SeatAllocation(
+                booking_id=booking_id, bus_id=bus_id, booking_date=booking_date, seat_label=seat
+            ))
+        if len(batch) >= 1000:
+            SeatAllocation.objects.bulk_create(batch)
+            batch = []
+    SeatAllocation.objects.bulk_create(batch)
+
+
+def clear_seat_allocations(apps, schema_editor):
+    apps.get_model("home", "SeatAllocation").objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("home", "0003_seatallocation"),
+    ]
+
+    operations = [
+        migrations.RunPython(split_seat_numbers, clear_seat_allocations),
+    ]
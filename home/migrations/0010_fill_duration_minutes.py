@@ -0,0 +1,52 @@
+from datetime import datetime, timedelta
+
+from django.db import migrations
+
+
+def parse_duration_minutes(value):
+    # Frozen copy of home.models.parse_duration_minutes
+    value = str(value or "").strip().lower()
+    if not value:
+        return None
+    try:
+        if "h" in value:
+            parts = value.replace("h", " ").split()
+            hours, minutes = int(parts[0]), int(parts[1]) if len(parts) > 1 else 0
+        elif ":" in value:
+            hours, minutes, *_ = map(int, value.split(":"))
+        else:
+            hours, minutes = int(value), 0
+    except (ValueError, IndexError):
+        return None
+    return hours * 60 + minutes
+
+
+def fill_durations(apps, schema_editor):
+    Route = apps.get_model("home", "Route")
+    Bus = apps.get_model("home", "Bus")
+
+    minutes_by_route = {}
+    routes = list(Route.objects.all())
+    for route in routes:
+        route.duration_minutes = parse_duration_minutes(route.duration)
+        minutes_by_route[route.id] = route.duration_minutes
+    Route.objects.bulk_update(routes, ["duration_minutes"], batch_size=500)
+
+    buses = list(Bus.objects.only("id", "route_id", "departure_time"))
+    for bus in buses:
+        minutes = minutes_by_route.get(bus.route_id)
+        if minutes is not None and bus.departure_time is not None:
+            departure = datetime.combine(datetime.today(), bus.departure_time)
+            bus.arrival_time = (departure + timedelta(minutes=minutes)).time()
+    Bus.objects.bulk_update(buses, ["arrival_time"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("home", "0009_route_duration_minutes_bus_arrival_time"),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_durations, migrations.RunPython.noop),
+    ]
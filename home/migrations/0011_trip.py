@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:43
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0010_fill_duration_minutes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Trip',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('trip_date', models.DateField()),
+                ('departure_time', models.TimeField()),
+                ('bus', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trips', to='home.bus')),
+                ('route', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trips', to='home.route')),
+            ],
+            options={
+                'db_table': 'trips',
+                'indexes': [models.Index(fields=['route', 'trip_date', 'departure_time'], name='trip_route_date_dep_idx')],
+                'constraints': [models.UniqueConstraint(fields=('bus', 'trip_date'), name='uniq_trip_per_bus_date')],
+            },
+        ),
+    ]
@@ -0,0 +1,36 @@
+from datetime import timedelta
+from zoneinfo import ZoneInfo
+
+from django.conf import settings
+from django.db import migrations
+from django.utils import timezone
+
+
+def service_today():
+    # Frozen copy of home.trips.service_today
+    return timezone.localtime(timezone.now(), timezone=ZoneInfo("Asia/Karachi")).date()
+
+
+def materialize_window(apps, schema_editor):
+    Bus = apps.get_model("home", "Bus")
+    Trip = apps.get_model("home", "Trip")
+
+    today = service_today()
+    dates = [today + timedelta(days=offset) for offset in range(getattr(settings, "TRIP_WINDOW_DAYS", 30))]
+    trips = [
+        Trip(bus_id=bus_id, route_id=route_id, trip_date=day, departure_time=departure_time)
+        for bus_id, route_id, departure_time in Bus.objects.values_list("id", "route_id", "departure_time")
+        for day in dates
+    ]
+    Trip.objects.bulk_create(trips, batch_size=1000, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("home", "0011_trip"),
+    ]
+
+    operations = [
+        migrations.RunPython(materialize_window, migrations.RunPython.noop),
+    ]
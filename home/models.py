@@ -1,5 +1,5 @@
 # core/home/models.py
-from django.db import models
+from django.db import models, transaction
 from django.conf import settings
 from datetime import timedelta
 from django.utils import timezone
@@ -42,10 +42,40 @@ class User(models.Model):
         return f"{self.name} ({self.role})"
 
 
+def parse_duration_minutes(value):
+    """Minutes in a duration string such as "05:30", "05:30:00", "5h 30" or "5".
+
+    Returns None for an empty or unreadable value.
+    """
+    value = str(value or "").strip().lower()
+    if not value:
+        return None
+    try:
+        if "h" in value:
+            parts = value.replace("h", " ").split()
+            hours, minutes = int(parts[0]), int(parts[1]) if len(parts) > 1 else 0
+        elif ":" in value:
+            hours, minutes, *_ = map(int, value.split(":"))
+        else:
+            hours, minutes = int(value), 0
+    except (ValueError, IndexError):
+        return None
+    return hours * 60 + minutes
+
+
+def add_minutes(departure_time, minutes):
+    """Clock time ``minutes`` after ``departure_time`` (wraps past midnight)."""
+    if departure_time is None or minutes is None:
+        return None
+    departure_dt = datetime.combine(datetime.today(), departure_time)
+    return (departure_dt + timedelta(minutes=minutes)).time()
+
+
 class Route(models.Model):
     origin = models.CharField(max_length=100)
     destination = models.CharField(max_length=100)
-    duration = models.CharField(max_length=5, null=True, blank=True)  # e.g. "02:00"
+    duration = models.CharField(max_length=5, null=True, blank=True)  # e.g. "02:00", as entered
+    duration_minutes = models.PositiveIntegerField(null=True, blank=True, editable=False)  # parsed from duration
     distance = models.FloatField(null=True, blank=True)
 
     # Standard audit fields
@@ -60,6 +90,17 @@ class Route(models.Model):
     def __str__(self):
         return f"{self.origin} → {self.destination}"
 
+    def save(self, *args, **kwargs):
+        # Parse the duration once here instead of on every arrival_time read
+        self.duration_minutes = parse_duration_minutes(self.duration)
+        super().save(*args, **kwargs)
+
+        # Keep the stored arrival time of this route's buses in step
+        buses = list(self.bus_set.only("id", "departure_time", "arrival_time"))
+        for bus in buses:
+            bus.arrival_time = add_minutes(bus.departure_time, self.duration_minutes)
+        Bus.objects.bulk_update(buses, ["arrival_time"])
+
 
 class Bus(models.Model):
     bus_number = models.CharField(max_length=20)
@@ -70,6 +111,8 @@ class Bus(models.Model):
         choices=[("Express", "Express"), ("Cargo", "Cargo"), ("Metro", "Metro")]
     )
     departure_time = models.TimeField()
+    # departure_time + route duration, kept up to date by Bus.save / Route.save
+    arrival_time = models.TimeField(null=True, blank=True, editable=False)
     price = models.DecimalField(max_digits=10, decimal_places=2)
 
     # Standard audit fields
@@ -84,37 +127,34 @@ class Bus(models.Model):
     def __str__(self):
         return f"{self.bus_type} ({self.route.origin} → {self.route.destination})"
 
-    @property
-    def arrival_time(self):
-        """Calculate arrival time by adding route.duration to departure_time."""
-        if not self.route.duration:
-            return None
-
-        duration_value = str(self.route.duration).strip()
-
-        # If it's already a timedelta
-        if isinstance(self.route.duration, timedelta):
-            duration = self.route.duration
+    def save(self, *args, **kwargs):
+        if Bus.route.is_cached(self):
+            duration_minutes = self.route.duration_minutes
+        else:
+            duration_minutes = Route.objects.filter(pk=self.route_id).values_list("duration_minutes", flat=True).first()
+        self.arrival_time = add_minutes(self.departure_time, duration_minutes)
+        super().save(*args, **kwargs)
 
-        # If it's like "HH:MM:SS"
-        elif ":" in duration_value and "h" not in duration_value:
-            hours, minutes, *_ = map(int, duration_value.split(":"))
-            duration = timedelta(hours=hours, minutes=minutes)
 
-        # If it's like "5h 30"
-        elif "h" in duration_value:
-            parts = duration_value.lower().replace("h", "").split()
-            hours = int(parts[0])
-            minutes = int(parts[1]) if len(parts) > 1 else 0
-            duration = timedelta(hours=hours, minutes=minutes)
+class Trip(models.Model):
+    """One dated departure of a bus, materialized for a rolling window (home/trips.py)."""
+    bus = models.ForeignKey(Bus, on_delete=models.CASCADE, related_name="trips")
+    route = models.ForeignKey(Route, on_delete=models.CASCADE, related_name="trips")
+    trip_date = models.DateField()
+    departure_time = models.TimeField()
 
-        else:
-            # fallback: treat it as hours only (e.g. "5")
-            duration = timedelta(hours=int(duration_value))
+    class Meta:
+        db_table = "trips"
+        constraints = [
+            models.UniqueConstraint(fields=["bus", "trip_date"], name="uniq_trip_per_bus_date"),
+        ]
+        indexes = [
+            # Search: departures on a route for a date, after a time of day
+            models.Index(fields=["route", "trip_date", "departure_time"], name="trip_route_date_dep_idx"),
+        ]
 
-        departure_dt = datetime.combine(datetime.today(), self.departure_time)
-        arrival_dt = departure_dt + duration
-        return arrival_dt.time()
+    def __str__(self):
+        return f"Bus {self.bus_id} on {self.trip_date} at {self.departure_time}"
 
 
 class ComplaintSuggestion(models.Model):
@@ -140,12 +180,21 @@ class ComplaintSuggestion(models.Model):
     
     class Meta:
         db_table = "complaint_suggestion"
+        indexes = [
+            # Keyset pagination (home/pagination.py)
+            models.Index(fields=["created_at", "id"], name="complaint_created_id_idx"),
+        ]
     
     def __str__(self):
         return f"{self.suggestion_type.title()} - {self.title}"
 
 
 
+def split_seats(seat_number):
+    """Turn a stored seat string like "1A, 1B" into a list of seat labels."""
+    return [seat.strip() for seat in (seat_number or "").split(",") if seat.strip()]
+
+
 class Booking(models.Model):
     STATUS_CHOICES = [
         ("reserved", "Reserved"),
@@ -154,6 +203,9 @@ class Booking(models.Model):
         ("cancelled", "Cancelled"),
     ]
 
+    # Bookings in these states hold their seats in SeatAllocation
+    ACTIVE_STATUSES = ("reserved", "confirmed")
+
     user = models.ForeignKey("User", on_delete=models.CASCADE)
     route = models.ForeignKey("Route", on_delete=models.CASCADE)
     bus = models.ForeignKey("Bus", on_delete=models.CASCADE)
@@ -173,6 +225,15 @@ class Booking(models.Model):
 
     class Meta:
         db_table = "booking"
+        indexes = [
+            # Used by the reservation expiry sweep (seats.expire_reservations)
+            models.Index(fields=["status", "reserved_until"], name="booking_status_reserved_idx"),
+            # Keyset pagination (home/pagination.py)
+            models.Index(fields=["created_at", "id"], name="booking_created_id_idx"),
+            # A departure's bookings, and a customer's upcoming/past tickets by date
+            models.Index(fields=["bus", "booking_date"], name="booking_bus_date_idx"),
+            models.Index(fields=["user", "booking_date"], name="booking_user_date_idx"),
+        ]
 
     def save(self, *args, **kwargs):
         if not self.booking_number:
@@ -182,7 +243,28 @@ class Booking(models.Model):
         if self.status == "reserved" and not self.reserved_until:
             self.reserved_until = timezone.now() + timedelta(minutes=30)
 
-        super().save(*args, **kwargs)
+        # Booking row and its seat rows are written together, so a seat that is
+        # already taken (IntegrityError) rolls the whole booking back.
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            self.sync_seat_allocations()
+
+    def seat_list(self):
+        return split_seats(self.seat_number)
+
+    def sync_seat_allocations(self):
+        """Make the SeatAllocation rows match seat_number / status / bus / date."""
+        wanted = set(self.seat_list()) if self.status in self.ACTIVE_STATUSES else set()
+
+        SeatAllocation.objects.filter(booking=self).exclude(
+            bus_id=self.bus_id, booking_date=self.booking_date, seat_label__in=wanted
+        ).delete()
+
+        held = set(SeatAllocation.objects.filter(booking=self).values_list("seat_label", flat=True))
+        SeatAllocation.objects.bulk_create([
+            SeatAllocation(booking=self, bus_id=self.bus_id, booking_date=self.booking_date, seat_label=seat)
+            for seat in sorted(wanted - held)
+        ])
 
     def is_expired(self):
         """Check if reservation has expired"""
@@ -193,6 +275,29 @@ class Booking(models.Model):
 
 
 
+class SeatAllocation(models.Model):
+    """One row per seat held by an active booking on a bus for a given date."""
+    booking = models.ForeignKey(Booking, on_delete=models.CASCADE, related_name="seats")
+    bus = models.ForeignKey(Bus, on_delete=models.CASCADE, related_name="seat_allocations")
+    booking_date = models.DateField()
+    seat_label = models.CharField(max_length=10)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = "seat_allocation"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["bus", "booking_date", "seat_label"],
+                name="uniq_seat_per_bus_date",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.seat_label} on bus {self.bus_id} ({self.booking_date})"
+
+
+
 class RefundRequest(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     booking = models.ForeignKey(Booking, on_delete=models.CASCADE)
@@ -221,6 +326,10 @@ class RefundRequest(models.Model):
 
     class Meta:
         db_table = "refund_request"
+        indexes = [
+            # Keyset pagination (home/pagination.py)
+            models.Index(fields=["created_at", "id"], name="refund_created_id_idx"),
+        ]
 
     def __str__(self):
         return f"Refund #{self.id} - {self.user.name} - {self.status}"
@@ -268,6 +377,12 @@ class Payment(models.Model):
 
     class Meta:
         db_table = "payments"
+        indexes = [
+            # Keyset pagination (home/pagination.py)
+            models.Index(fields=["created_at", "id"], name="payment_created_id_idx"),
+            # Latest payment of a booking (admin bookings tab, booking success page)
+            models.Index(fields=["booking", "created_at"], name="payment_booking_created_idx"),
+        ]
 
     def save(self, *args, **kwargs):
         if self.status == "completed" and not self.paid_at:
@@ -276,3 +391,89 @@ class Payment(models.Model):
 
     def __str__(self):
         return f"Payment {self.id} - {self.booking.booking_number} - {self.status}"
+
+
+
+class OutboxEmail(models.Model):
+    """An email waiting to be sent by the `send_outbox` worker (see home/mail.py)."""
+    STATUS_CHOICES = [
+        ("pending", "Pending"),
+        ("sent", "Sent"),
+        ("dead", "Dead"),  # gave up after too many failed attempts
+    ]
+
+    to = models.EmailField()
+    subject = models.CharField(max_length=255)
+    html_body = models.TextField()
+
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default="pending")
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True, default="")
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "email_outbox"
+        indexes = [
+            models.Index(fields=["status", "next_attempt_at"], name="outbox_status_due_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} → {self.to} ({self.status})"
+
+
+
+# ----------------------------
+# Dashboard summary tables (kept up to date by home/stats.py)
+# ----------------------------
+class DashboardCounter(models.Model):
+    """A single running total, e.g. "users:customer" or "bookings"."""
+    key = models.CharField(max_length=50, unique=True)
+    value = models.BigIntegerField(default=0)
+
+    class Meta:
+        db_table = "dashboard_counter"
+
+    def __str__(self):
+        return f"{self.key} = {self.value}"
+
+
+class BookingDailyStat(models.Model):
+    """Bookings and seats per travel date and booking status."""
+    booking_date = models.DateField()
+    status = models.CharField(max_length=20)
+    bookings = models.IntegerField(default=0)
+    seats = models.IntegerField(default=0)
+
+    class Meta:
+        db_table = "booking_daily_stat"
+        constraints = [
+            models.UniqueConstraint(fields=["booking_date", "status"], name="uniq_daily_stat"),
+        ]
+
+    def __str__(self):
+        return f"{self.booking_date} {self.status}: {self.bookings}"
+
+
+class CustomerBookingStat(models.Model):
+    """Per-customer booking totals for the customer dashboard.
+
+    ``kind`` is "total", "date" (key = travel date), "route" (key = route id)
+    or "bus_type" (key = bus type).
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="booking_stats")
+    kind = models.CharField(max_length=10)
+    key = models.CharField(max_length=50, blank=True, default="")
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        db_table = "customer_booking_stat"
+        constraints = [
+            models.UniqueConstraint(fields=["user", "kind", "key"], name="uniq_customer_stat"),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} {self.kind}:{self.key} = {self.count}"
@@ -0,0 +1,87 @@
+# home/page_cache.py
+"""Pre-rendered responses for the static informational pages.
+
+The only dynamic part of these pages is the navbar/profile modal in base.html,
+so each page is cached once for anonymous visitors and once per logged-in user.
+Responses carry a strong ETag and a matching If-None-Match gets a 304. Cache
+keys include PAGE_CACHE_VERSION (default: a digest of home/templates and the
+collected static manifest), so a deploy that changes a template or an asset
+starts from a fresh cache.
+"""
+import hashlib
+from functools import lru_cache, wraps
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import parse_etags
+
+CACHE_TIMEOUT = 24 * 3600
+TEMPLATE_DIR = Path(__file__).resolve().parent / "templates"
+
+
+@lru_cache(maxsize=None)
+def _build_digest():
+    """Digest of the templates and of collectstatic's manifest (hashed asset names)."""
+    digest = hashlib.sha256()
+    for path in sorted(TEMPLATE_DIR.rglob("*")):
+        if path.is_file():
+            digest.update(str(path.relative_to(TEMPLATE_DIR)).encode())
+            digest.update(path.read_bytes())
+    if settings.STATIC_ROOT and (Path(settings.STATIC_ROOT) / "staticfiles.json").is_file():
+        digest.update((Path(settings.STATIC_ROOT) / "staticfiles.json").read_bytes())
+    return digest.hexdigest()[:16]
+
+
+def deploy_version():
+    return getattr(settings, "PAGE_CACHE_VERSION", None) or _build_digest()
+
+
+def _variant(request):
+    """Which rendering of the page this request gets, or None to skip the cache.
+
+    Visitors without a session cookie are served without loading a session.
+    A logged-in page embeds the user's profile and CSRF token, so it is keyed
+    on the user (and when they last changed) and on the CSRF cookie.
+    """
+    if settings.SESSION_COOKIE_NAME not in request.COOKIES or not request.session.get("user_id"):
+        return "anon"
+    user = request.current_user
+    csrf_cookie = request.COOKIES.get(settings.CSRF_COOKIE_NAME)
+    if not user or not csrf_cookie:
+        return None
+    csrf_digest = hashlib.sha256(csrf_cookie.encode()).hexdigest()[:16]
+    return f"user:{user.pk}:{user.updated_at.timestamp()}:{csrf_digest}"
+
+
+def cached_page(view):
+    """Serve ``view`` from the page cache, with ETag/If-None-Match handling."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        variant = _variant(request) if request.method in ("GET", "HEAD") and not request.GET else None
+        if variant is None:
+            return view(request, *args, **kwargs)
+
+        key = f"home:page:{deploy_version()}:{request.path}:{variant}"
+        cached = cache.get(key)
+        if cached is None:
+            response = view(request, *args, **kwargs)
+            if response.status_code != 200 or response.streaming:
+                return response
+            etag = f'"{hashlib.sha256(response.content).hexdigest()}"'
+            cached = (response.content, response["Content-Type"], etag)
+            cache.set(key, cached, CACHE_TIMEOUT)
+
+        content, content_type, etag = cached
+        if_none_match = parse_etags(request.headers.get("If-None-Match", ""))
+        if etag in if_none_match or "*" in if_none_match:
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(content, content_type=content_type)
+        response["ETag"] = etag
+        patch_vary_headers(response, ("Cookie",))
+        patch_cache_control(response, no_cache=True, **{"private" if variant != "anon" else "public": True})
+        return response
+    return wrapper
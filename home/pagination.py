@@ -0,0 +1,89 @@
+# home/pagination.py
+"""Keyset ("cursor") pagination for long, newest-first listings.
+
+OFFSET pagination has to skip every earlier row, so page 4,000 of the bookings
+table is much slower than page 1. Here each page is fetched with
+``WHERE (created_at, id) < (cursor)`` on a (created_at, id) index, which costs
+the same on any page. Cursors are opaque strings passed as ``?after=`` /
+``?before=`` query parameters.
+"""
+import base64
+from datetime import datetime
+
+from django.db.models import Q
+from django.utils.http import urlencode
+
+
+def encode_cursor(created_at, pk):
+    raw = f"{created_at.isoformat()}|{pk}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """Return ``(created_at, pk)`` or None for a missing or malformed cursor."""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, pk = raw.split("|")
+        return datetime.fromisoformat(created_at), int(pk)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+class KeysetPage:
+    def __init__(self, object_list, has_next, has_previous, field):
+        self.object_list = object_list
+        self.field = field
+        self.has_next = has_next
+        self.has_previous = has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+    def _cursor(self, obj):
+        return encode_cursor(getattr(obj, self.field), obj.pk)
+
+    @property
+    def next_query(self):
+        if self.has_next:
+            return urlencode({"after": self._cursor(self.object_list[-1])})
+        return ""
+
+    @property
+    def previous_query(self):
+        if self.has_previous:
+            return urlencode({"before": self._cursor(self.object_list[0])})
+        return ""
+
+
+def keyset_page(queryset, request, per_page=25, field="created_at"):
+    """One newest-first page of ``queryset`` for the ?after= / ?before= cursor in ``request``.
+
+    The queryset is ordered by ``(-field, -id)`` here; any ordering on it is replaced.
+    """
+    after = decode_cursor(request.GET.get("after"))
+    before = decode_cursor(request.GET.get("before")) if not after else None
+
+    if before:
+        # Walk backwards from the cursor, then flip the rows into display order
+        value, pk = before
+        rows = list(
+            queryset.filter(Q(**{f"{field}__gt": value}) | Q(**{field: value, "pk__gt": pk}))
+            .order_by(field, "pk")[:per_page + 1]
+        )
+        has_previous = len(rows) > per_page
+        return KeysetPage(rows[:per_page][::-1], has_next=True, has_previous=has_previous, field=field)
+
+    if after:
+        value, pk = after
+        queryset = queryset.filter(Q(**{f"{field}__lt": value}) | Q(**{field: value, "pk__lt": pk}))
+
+    rows = list(queryset.order_by(f"-{field}", "-pk")[:per_page + 1])
+    return KeysetPage(rows[:per_page], has_next=len(rows) > per_page, has_previous=bool(after), field=field)
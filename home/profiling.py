@@ -0,0 +1,148 @@
+# home/profiling.py
+"""On-demand profiles of single requests, for admins (see ProfilerMiddleware).
+
+An admin session adds ``?_profile=1`` to a URL or sends ``X-Profile: 1`` and
+that one request runs under cProfile with every SQL query timed. The result is
+written to PROFILE_DIR as two files sharing a name: ``<name>.prof`` (pstats
+data, e.g. for snakeviz) and ``<name>.json`` (request details, the query log
+and a text summary). Only the newest PROFILE_KEEP profiles are kept. They are
+browsed at /profiles/.
+"""
+import cProfile
+import io
+import json
+import pstats
+import re
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.crypto import get_random_string
+
+from .metrics import QueryTimer
+
+QUERY_FLAG = "_profile"
+HEADER = "X-Profile"
+NAME_RE = re.compile(r"^[\w.-]+$")
+SUMMARY_LINES = 60
+
+
+def profile_dir():
+    return Path(settings.PROFILE_DIR)
+
+
+def flagged(request):
+    """True when the request asks to be profiled (checked without loading the session)."""
+    return (request.GET.get(QUERY_FLAG) or request.headers.get(HEADER)) in ("1", "true")
+
+
+def is_admin(request):
+    return request.session.get("role") == "admin"
+
+
+class Recorder:
+    """Run cProfile and log every SQL query inside a ``with`` block.
+
+    cProfile only allows one active profiler at a time, so when another
+    request is already being profiled this one is served without a profile
+    (``save()`` returns None). cProfile sees only its own thread; under ASGI
+    ProfilerMiddleware enters the recorder on the worker thread that runs the
+    sync views, so the coroutine code of async views is not in the profile
+    (their queries still are).
+    """
+
+    def __init__(self):
+        self.profiler = cProfile.Profile()
+        self.queries = QueryTimer(log=True)
+        self.active = False
+        self.elapsed = 0.0
+
+    def __enter__(self):
+        self.queries.__enter__()
+        try:
+            self.profiler.enable()
+            self.active = True
+        except ValueError:
+            pass
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.elapsed = time.perf_counter() - self.started
+        if self.active:
+            self.profiler.disable()
+        self.queries.__exit__(*exc_info)
+
+    def save(self, request, response):
+        if not self.active:
+            return None
+        return save(request, response, self.profiler, self.queries.queries, self.elapsed)
+
+
+def save(request, response, profiler, queries, elapsed):
+    """Write the .prof and .json files for one request and prune old ones."""
+    match = request.resolver_match
+    view = (match.view_name if match else None) or "unresolved"
+    now = timezone.now()
+    slug = re.sub(r"[^\w-]", "_", view)
+    name = f"{now:%Y%m%d-%H%M%S}-{slug}-{get_random_string(6)}"
+
+    summary = io.StringIO()
+    pstats.Stats(profiler, stream=summary).sort_stats("cumulative").print_stats(SUMMARY_LINES)
+
+    directory = profile_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    profiler.dump_stats(directory / f"{name}.prof")
+    (directory / f"{name}.json").write_text(json.dumps({
+        "name": name,
+        "created_at": now.isoformat(),
+        "method": request.method,
+        "path": request.get_full_path(),
+        "view": view,
+        "status": response.status_code,
+        "ms": round(elapsed * 1000, 1),
+        "query_count": len(queries),
+        "query_ms": round(sum(query["ms"] for query in queries), 1),
+        "queries": queries,
+        "summary": summary.getvalue(),
+    }))
+    prune(getattr(settings, "PROFILE_KEEP", 50))
+    return name
+
+
+def prune(keep):
+    for path in sorted(profile_dir().glob("*.json"), reverse=True)[keep:]:
+        path.unlink(missing_ok=True)
+        path.with_suffix(".prof").unlink(missing_ok=True)
+
+
+def recent(limit=50):
+    """Metadata of the newest profiles (without the query log and summary)."""
+    if not profile_dir().is_dir():
+        return []
+    profiles = []
+    for path in sorted(profile_dir().glob("*.json"), reverse=True)[:limit]:
+        try:
+            data = json.loads(path.read_text())
+        except (OSError, ValueError):
+            continue
+        data.pop("queries", None)
+        data.pop("summary", None)
+        profiles.append(data)
+    return profiles
+
+
+def load(name):
+    """The full record of one profile, or None."""
+    if not NAME_RE.match(name):
+        return None
+    try:
+        return json.loads((profile_dir() / f"{name}.json").read_text())
+    except (OSError, ValueError):
+        return None
+
+
+def prof_path(name):
+    path = profile_dir() / f"{name}.prof"
+    return path if NAME_RE.match(name) and path.is_file() else None
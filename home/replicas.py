@@ -0,0 +1,105 @@
+# home/replicas.py
+"""Read-replica routing (see ReplicaRouter, ReplicaMiddleware and reads_from_replica).
+
+With DATABASE_REPLICA naming an alias in DATABASES, GET requests to views
+marked @reads_from_replica run their reads against that replica. Every other
+read, and every write, goes to the primary ("default"). Replicas lag behind
+the primary, so:
+- once a request writes anything, the rest of it reads from the primary, and
+- that response sets a cookie that sends the same client's reads to the
+  primary for the next REPLICA_STICKY_SECONDS (read-your-writes, e.g. the
+  ticket pages right after confirm_booking).
+Sessions are always read from the primary. Code that fills a shared cache
+wraps its queries in ``primary()`` so a lagging replica cannot pin stale data
+there. Management commands and background threads never use the replica.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+
+PRIMARY = "default"
+PIN_COOKIE = "primary_reads"
+READ_METHODS = ("GET", "HEAD")
+
+# Routing state of the current request; a dict, so writes made inside
+# sync_to_async threads are seen by the middleware
+_state = ContextVar("replica_state", default=None)
+
+
+def replica_alias():
+    return getattr(settings, "DATABASE_REPLICA", None)
+
+
+class ReplicaRouter:
+    """Send reads to the replica only while a @reads_from_replica view runs unpinned."""
+
+    def db_for_read(self, model, **hints):
+        alias = replica_alias()
+        state = _state.get()
+        if alias is None or state is None:
+            return None
+        if state["replica_reads"] and not (state["pinned"] or state["wrote"]) and model._meta.app_label != "sessions":
+            return alias
+        return PRIMARY
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state["wrote"] = True
+        # Objects loaded from the replica are still saved to the primary
+        return PRIMARY if replica_alias() else None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        alias = replica_alias()
+        if alias and {obj1._state.db, obj2._state.db} <= {PRIMARY, alias}:
+            return True
+        return None
+
+
+@contextmanager
+def routing(request):
+    """Routing state for one request; reads start on the primary."""
+    state = {"replica_reads": False, "wrote": False, "pinned": PIN_COOKIE in request.COOKIES}
+    token = _state.set(state)
+    try:
+        yield state
+    finally:
+        _state.reset(token)
+
+
+def pin(response):
+    """Keep this client's reads on the primary until the replica has caught up."""
+    response.set_cookie(
+        PIN_COOKIE, "1", max_age=getattr(settings, "REPLICA_STICKY_SECONDS", 15), httponly=True, samesite="Lax"
+    )
+
+
+@contextmanager
+def primary():
+    """Read from the primary inside the block, even in a @reads_from_replica view."""
+    state = _state.get()
+    if state is None:
+        yield
+        return
+    replica_reads, state["replica_reads"] = state["replica_reads"], False
+    try:
+        yield
+    finally:
+        state["replica_reads"] = replica_reads
+
+
+def reads_from_replica(view):
+    """Let a read-only view's GET requests read from DATABASE_REPLICA."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        state = _state.get()
+        if state is None or request.method not in READ_METHODS:
+            return view(request, *args, **kwargs)
+        state["replica_reads"] = True
+        try:
+            return view(request, *args, **kwargs)
+        finally:
+            state["replica_reads"] = False
+    return wrapper
@@ -0,0 +1,51 @@
+# home/route_catalog.py
+"""Cached origin/destination catalog for the booking search.
+
+Routes change a few times a month but every search needs the origin and
+destination pickers, so the catalog is built once and kept in the default
+cache until a Route is saved or deleted (see home/signals.py). With a shared
+cache backend (Memcached/Redis) one rebuild serves every worker; with the
+default per-process LocMemCache each worker builds its own copy and
+CACHE_TIMEOUT bounds how stale another worker's copy can get.
+"""
+from django.core.cache import cache
+
+from .models import Route
+from .replicas import primary
+
+CACHE_KEY = "home:route_catalog"
+CACHE_TIMEOUT = 60 * 60
+
+
+def build_route_catalog():
+    # Read from the primary: a stale catalog would stay cached until the next Route change
+    with primary():
+        routes = list(Route.objects.order_by("id"))
+    adjacency = {}
+    route_ids = {}
+    for route in routes:
+        adjacency.setdefault(route.origin, set()).add(route.destination)
+        route_ids.setdefault((route.origin, route.destination), []).append(route.id)
+
+    return {
+        "origins": sorted(adjacency),
+        "destinations": sorted({route.destination for route in routes}),
+        # origin -> destinations reachable directly from it
+        "adjacency": {origin: sorted(destinations) for origin, destinations in adjacency.items()},
+        # (origin, destination) -> route ids
+        "route_ids": route_ids,
+        # id -> Route, so search results can attach routes without a join
+        "routes": {route.id: route for route in routes},
+    }
+
+
+def get_route_catalog():
+    catalog = cache.get(CACHE_KEY)
+    if catalog is None:
+        catalog = build_route_catalog()
+        cache.set(CACHE_KEY, catalog, CACHE_TIMEOUT)
+    return catalog
+
+
+def invalidate_route_catalog():
+    cache.delete(CACHE_KEY)
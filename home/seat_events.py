@@ -0,0 +1,175 @@
+# home/seat_events.py
+"""Live seat-map updates over server-sent events (see views.seat_events).
+
+Viewers of one bus on one date share a channel in the process's hub. A
+channel reads the held seats once per change, not once per viewer, and fans
+the difference out as "taken" / "released" events to every viewer's queue.
+
+A channel refreshes when:
+- notify() is called after a booking's seats change (home/signals.py and
+  expire_reservations call it once the transaction commits), or
+- SEAT_EVENTS_POLL_SECONDS pass, which picks up bookings made by other
+  worker processes.
+Idle viewers cost no queries.
+
+Streams are only served under ASGI (core/asgi.py), see stream_available().
+Under WSGI Django has to consume an async streaming body completely before
+sending any of it, so a stream would deliver nothing until it closed, tie up a
+worker for SEAT_EVENTS_MAX_SECONDS, and run its channel on a throwaway event
+loop. There the view answers 501 and the seat picker polls instead.
+"""
+import asyncio
+import contextvars
+import json
+import logging
+from datetime import date
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db import close_old_connections
+
+from . import seats
+
+logger = logging.getLogger(__name__)
+
+QUEUE_SIZE = 100
+SUBSCRIBE_TIMEOUT = 10
+
+
+def _load(bus_id, booking_date):
+    # Runs in a worker thread outside any request, so close the connection
+    # the way request_finished would
+    try:
+        return seats.seat_availability(bus_id, booking_date)
+    finally:
+        close_old_connections()
+
+
+def stream_available(request):
+    """True when SEAT_EVENTS_ENABLED is on and the request is served over ASGI."""
+    return getattr(settings, "SEAT_EVENTS_ENABLED", True) and isinstance(request, ASGIRequest)
+
+
+def format_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+class Channel:
+    """Subscribers and the last known held seats of one (bus id, date)."""
+
+    def __init__(self, key, loop):
+        self.key = key
+        self.loop = loop
+        self.queues = set()
+        self.capacity = None
+        self.taken = None
+        self.wake = asyncio.Event()
+        self.refreshed = asyncio.Event()
+        # A fresh context, so the task does not borrow the first viewer's
+        # request-scoped database connection or thread
+        self.task = contextvars.Context().run(loop.create_task, self.run())
+
+    async def run(self):
+        poll = getattr(settings, "SEAT_EVENTS_POLL_SECONDS", 5) or None
+        while True:
+            try:
+                await self.refresh()
+            except Exception:
+                logger.exception("Could not load seats for bus %s on %s", *self.key)
+            try:
+                await asyncio.wait_for(self.wake.wait(), timeout=poll)
+            except asyncio.TimeoutError:
+                pass
+            self.wake.clear()
+
+    async def refresh(self):
+        state = await sync_to_async(_load, thread_sensitive=False)(*self.key)
+        taken = set(state["taken"]) if state else set()
+        if self.taken is not None:
+            added, removed = sorted(taken - self.taken), sorted(self.taken - taken)
+            if added:
+                self.broadcast("taken", {"seats": added})
+            if removed:
+                self.broadcast("released", {"seats": removed})
+        self.capacity = state["capacity"] if state else None
+        self.taken = taken
+        self.refreshed.set()
+
+    def snapshot(self):
+        return {"capacity": self.capacity, "taken": sorted(self.taken)}
+
+    def broadcast(self, event, data):
+        for queue in self.queues:
+            try:
+                queue.put_nowait((event, data))
+            except asyncio.QueueFull:
+                # A viewer that fell behind gets one full snapshot instead
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(("snapshot", self.snapshot()))
+
+
+class SeatEventHub:
+    def __init__(self):
+        self.channels = {}
+
+    async def subscribe(self, bus_id, booking_date):
+        """Join the channel; returns (channel, queue) once its seats are loaded.
+
+        Raises asyncio.TimeoutError if they cannot be loaded in SUBSCRIBE_TIMEOUT.
+        """
+        key = (bus_id, booking_date)
+        loop = asyncio.get_running_loop()
+        channel = self.channels.get(key)
+        if channel is None or channel.loop is not loop:
+            channel = self.channels[key] = Channel(key, loop)
+        queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        channel.queues.add(queue)
+        try:
+            await asyncio.wait_for(channel.refreshed.wait(), timeout=SUBSCRIBE_TIMEOUT)
+        except asyncio.TimeoutError:
+            self.unsubscribe(channel, queue)
+            raise
+        return channel, queue
+
+    def unsubscribe(self, channel, queue):
+        channel.queues.discard(queue)
+        if not channel.queues:
+            channel.task.cancel()
+            if self.channels.get(channel.key) is channel:
+                del self.channels[channel.key]
+
+    def notify(self, bus_id, booking_date):
+        """Seats of this departure changed; safe to call from any thread."""
+        if isinstance(booking_date, str):
+            booking_date = date.fromisoformat(booking_date)
+        channel = self.channels.get((bus_id, booking_date))
+        if channel is not None and not channel.loop.is_closed():
+            channel.loop.call_soon_threadsafe(channel.wake.set)
+
+
+hub = SeatEventHub()
+
+
+async def event_stream(channel, queue):
+    """SSE body: a snapshot, then taken/released events, with keep-alive comments.
+
+    Ends after SEAT_EVENTS_MAX_SECONDS so clients reconnect (EventSource does
+    this by itself) and long streams do not pin a process across deploys.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + getattr(settings, "SEAT_EVENTS_MAX_SECONDS", 300)
+    heartbeat = getattr(settings, "SEAT_EVENTS_HEARTBEAT_SECONDS", 15)
+    try:
+        yield "retry: 3000\n\n"
+        yield format_event("snapshot", channel.snapshot())
+        while (remaining := deadline - loop.time()) > 0:
+            try:
+                event, data = await asyncio.wait_for(queue.get(), timeout=min(heartbeat, remaining))
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            yield format_event(event, data)
+    finally:
+        hub.unsubscribe(channel, queue)
@@ -0,0 +1,179 @@
+# home/seats.py
+import logging
+import threading
+import time
+from functools import partial
+
+from django.db import IntegrityError, close_old_connections, transaction
+from django.utils import timezone
+
+from .models import Bus, Booking, SeatAllocation
+from . import seat_events
+from .stats import record_bookings_expired
+
+logger = logging.getLogger(__name__)
+
+SEAT_COLUMNS = "ABCD"
+
+
+class SeatsUnavailable(Exception):
+    """Raised by reserve_seats() when some of the requested seats are already held."""
+
+    def __init__(self, seats):
+        self.seats = seats
+        super().__init__(f"Seats already booked: {', '.join(seats)}")
+
+
+class InvalidSeats(ValueError):
+    """Raised by reserve_seats() for an empty selection or labels that are not seats on the bus."""
+
+    def __init__(self, seats):
+        self.seats = seats
+        super().__init__(f"Not seats on this bus: {', '.join(seats)}" if seats else "No seats selected")
+
+
+def seat_labels(capacity):
+    """The seat labels of a bus with ``capacity`` seats, four across: 1A, 1B, 1C, 1D, 2A, ..."""
+    return [f"{row}{column}" for row in range(1, capacity // len(SEAT_COLUMNS) + 2) for column in SEAT_COLUMNS][:capacity]
+
+
+def taken_seats(bus, booking_date, seats):
+    """Return which of ``seats`` are already held on this bus/date (one indexed query)."""
+    return sorted(
+        SeatAllocation.objects.filter(
+            bus=bus, booking_date=booking_date, seat_label__in=seats
+        ).values_list("seat_label", flat=True)
+    )
+
+
+def seat_occupancy(buses, booking_date):
+    """Booked seats and available seat counts for many buses on one date.
+
+    All buses are read with a single query, so a search results page costs the
+    same number of queries whether the route has one departure or fifty.
+    Returns ``(booked_seats, available)`` keyed by bus id, where
+    ``booked_seats[bus_id]`` maps seat label -> {"user_name": ...}.
+    """
+    booked_seats = {bus.id: {} for bus in buses}
+    if booked_seats:
+        allocations = SeatAllocation.objects.filter(
+            bus_id__in=list(booked_seats), booking_date=booking_date
+        ).values_list("bus_id", "seat_label", "booking__user__name")
+        for bus_id, seat, user_name in allocations:
+            booked_seats[bus_id][seat] = {"user_name": user_name}
+
+    available = {bus.id: bus.capacity - len(booked_seats[bus.id]) for bus in buses}
+    return booked_seats, available
+
+
+def seat_availability(bus_id, booking_date):
+    """Capacity and held seat labels of one bus on one date, or None for an unknown bus.
+
+    Two indexed queries; used by the JSON endpoint the seat picker polls.
+    """
+    capacity = Bus.objects.filter(pk=bus_id).values_list("capacity", flat=True).first()
+    if capacity is None:
+        return None
+    taken = sorted(
+        SeatAllocation.objects.filter(bus_id=bus_id, booking_date=booking_date).values_list("seat_label", flat=True)
+    )
+    return {"capacity": capacity, "taken": taken, "available": capacity - len(taken)}
+
+
+def reserve_seats(user, bus, booking_date, seat_list):
+    """Atomically create a 'reserved' booking for the seat labels on bus/date.
+
+    The bus row is locked with SELECT ... FOR UPDATE so concurrent reservations
+    for the same departure are checked and written one after another; the
+    unique (bus, date, seat) constraint on SeatAllocation is the final guard.
+    Raises SeatsUnavailable with the conflicting labels when the race is lost,
+    and InvalidSeats for an empty list or labels outside the bus's layout.
+    """
+    if not seat_list:
+        raise InvalidSeats([])
+    unknown = sorted(set(seat_list) - set(seat_labels(bus.capacity)))
+    if unknown:
+        raise InvalidSeats(unknown)
+
+    with transaction.atomic():
+        Bus.objects.select_for_update().only("id").get(pk=bus.pk)
+
+        already_booked = taken_seats(bus, booking_date, seat_list)
+        if already_booked:
+            raise SeatsUnavailable(already_booked)
+
+        try:
+            with transaction.atomic():
+                return Booking.objects.create(
+                    user=user,
+                    route_id=bus.route_id,
+                    bus=bus,
+                    booking_date=booking_date,
+                    seat_number=", ".join(seat_list),
+                    status="reserved",
+                    created_by=user,
+                    updated_by=user,
+                )
+        except IntegrityError:
+            raise SeatsUnavailable(taken_seats(bus, booking_date, seat_list) or seat_list)
+
+
+# -----------------------------
+# Reservation expiry
+# -----------------------------
+def expire_reservations(now=None, batch_size=500):
+    """Mark overdue 'reserved' bookings as expired and free their seats.
+
+    Each batch is found through the (status, reserved_until) index, locked, and
+    closed with one UPDATE plus one DELETE of its seat rows, so a sweep only touches
+    rows that are actually overdue. Returns the number of bookings expired.
+    """
+    now = now or timezone.now()
+    overdue = Booking.objects.filter(status="reserved", reserved_until__lt=now)
+    total = 0
+
+    while True:
+        ids = list(overdue.order_by("reserved_until").values_list("id", flat=True)[:batch_size])
+        if not ids:
+            return total
+
+        with transaction.atomic():
+            # Lock and re-check so a booking paid in the meantime keeps its seats
+            rows = list(overdue.filter(id__in=ids).select_for_update().values_list("id", "bus_id", "booking_date"))
+            ids = [row[0] for row in rows]
+            Booking.objects.filter(id__in=ids).update(status="expired", updated_at=now)
+            SeatAllocation.objects.filter(booking_id__in=ids).delete()
+            # The bulk UPDATE sends no signals, so adjust the dashboard stats
+            # and tell live seat-map viewers here
+            record_bookings_expired(ids)
+            for bus_id, booking_date in {row[1:] for row in rows}:
+                transaction.on_commit(partial(seat_events.hub.notify, bus_id, booking_date))
+        total += len(ids)
+
+
+_sweeper = None
+
+
+def start_expiry_sweeper(interval):
+    """Run expire_reservations() every ``interval`` seconds in a daemon thread.
+
+    Safe to call more than once per process; only one sweeper thread is started.
+    """
+    global _sweeper
+    if _sweeper is not None or not interval:
+        return _sweeper
+
+    def sweep_forever():
+        while True:
+            time.sleep(interval)
+            close_old_connections()
+            try:
+                expired = expire_reservations()
+                if expired:
+                    logger.info("Expired %s overdue reservations", expired)
+            except Exception:
+                logger.exception("Reservation expiry sweep failed")
+
+    _sweeper = threading.Thread(target=sweep_forever, name="reservation-expiry", daemon=True)
+    _sweeper.start()
+    return _sweeper
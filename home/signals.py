@@ -0,0 +1,169 @@
+# home/signals.py
+from functools import partial
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from . import stats
+from .middleware import current_user_cache_key
+from .route_catalog import invalidate_route_catalog
+from .seat_events import hub as seat_event_hub
+from .trips import sync_bus_trips
+from .models import User, Route, Bus, Booking, Payment, RefundRequest, ComplaintSuggestion
+
+
+# -----------------------------
+# Dashboard counters (home/stats.py)
+# -----------------------------
+SIMPLE_COUNTERS = {
+    Route: "routes",
+    Bus: "buses",
+    ComplaintSuggestion: "complaints",
+    RefundRequest: "refunds",
+}
+
+
+def _counted_on_create_and_delete(sender, key):
+    def created(sender, instance, created, **kwargs):
+        if created:
+            stats.bump_counter(key)
+
+    def deleted(sender, instance, **kwargs):
+        stats.bump_counter(key, -1)
+
+    post_save.connect(created, sender=sender, weak=False, dispatch_uid=f"stats-{key}-save")
+    post_delete.connect(deleted, sender=sender, weak=False, dispatch_uid=f"stats-{key}-delete")
+
+
+for model, key in SIMPLE_COUNTERS.items():
+    _counted_on_create_and_delete(model, key)
+
+
+def _remember(instance, field):
+    # Value as last loaded from / saved to the database (None if deferred)
+    instance._stats_original = instance.__dict__.get(field)
+
+
+@receiver(post_init, sender=User)
+def remember_user_role(sender, instance, **kwargs):
+    _remember(instance, "role")
+
+
+@receiver(post_save, sender=User)
+def count_user(sender, instance, created, **kwargs):
+    if created:
+        stats.bump_counter(f"users:{instance.role}")
+    elif instance._stats_original is not None and instance._stats_original != instance.role:
+        stats.bump_counter(f"users:{instance._stats_original}", -1)
+        stats.bump_counter(f"users:{instance.role}")
+    _remember(instance, "role")
+
+
+@receiver(post_delete, sender=User)
+def uncount_user(sender, instance, **kwargs):
+    stats.bump_counter(f"users:{instance._stats_original or instance.role}", -1)
+
+
+@receiver(post_init, sender=Payment)
+def remember_payment_status(sender, instance, **kwargs):
+    _remember(instance, "status")
+
+
+@receiver(post_save, sender=Payment)
+def count_payment(sender, instance, created, **kwargs):
+    if created:
+        stats.bump_counter(f"payments:{instance.status}")
+    elif instance._stats_original is not None and instance._stats_original != instance.status:
+        stats.bump_counter(f"payments:{instance._stats_original}", -1)
+        stats.bump_counter(f"payments:{instance.status}")
+    _remember(instance, "status")
+
+
+@receiver(post_delete, sender=Payment)
+def uncount_payment(sender, instance, **kwargs):
+    stats.bump_counter(f"payments:{instance._stats_original or instance.status}", -1)
+
+
+@receiver(post_init, sender=Bus)
+def remember_bus_type(sender, instance, **kwargs):
+    _remember(instance, "bus_type")
+
+
+@receiver(post_save, sender=Bus)
+def move_bus_type_counts(sender, instance, created, raw=False, **kwargs):
+    if not (created or raw) and instance._stats_original is not None:
+        stats.record_bus_type_change(instance.pk, instance._stats_original, instance.bus_type)
+    _remember(instance, "bus_type")
+
+
+@receiver(post_init, sender=Booking)
+def remember_booking(sender, instance, **kwargs):
+    instance._stats_snapshot = stats.booking_snapshot(instance)
+
+
+@receiver(post_save, sender=Booking)
+def count_booking(sender, instance, created, **kwargs):
+    new = stats.booking_snapshot(instance)
+    if created:
+        old = None
+    elif instance._stats_snapshot is not None:
+        old = instance._stats_snapshot
+    else:
+        # Loaded with deferred fields; we can't tell what changed, so skip it
+        # (rebuild_dashboard_stats repairs any drift).
+        old = new
+    stats.record_booking_change(old, new)
+    instance._stats_snapshot = new
+
+
+@receiver(post_delete, sender=Booking)
+def uncount_booking(sender, instance, **kwargs):
+    stats.record_booking_change(instance._stats_snapshot or stats.booking_snapshot(instance), None)
+
+
+# -----------------------------
+# Route catalog cache (home/route_catalog.py)
+# -----------------------------
+@receiver(post_save, sender=Route)
+@receiver(post_delete, sender=Route)
+def refresh_route_catalog(sender, **kwargs):
+    # After commit: a search that rebuilt the catalog before then would cache the old routes
+    transaction.on_commit(invalidate_route_catalog)
+
+
+# -----------------------------
+# Dated trips (home/trips.py)
+# -----------------------------
+@receiver(post_save, sender=Bus)
+def sync_trips(sender, instance, raw=False, **kwargs):
+    if not raw:
+        sync_bus_trips(instance)
+
+
+# -----------------------------
+# Cached current user (home/middleware.py)
+# -----------------------------
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def forget_cached_user(sender, instance, **kwargs):
+    cache.delete(current_user_cache_key(instance.pk))
+
+
+# -----------------------------
+# Live seat-map events (home/seat_events.py)
+# -----------------------------
+@receiver(post_init, sender=Booking)
+def remember_seat_channel(sender, instance, **kwargs):
+    instance._seat_channel = (instance.__dict__.get("bus_id"), instance.__dict__.get("booking_date"))
+
+
+@receiver(post_save, sender=Booking)
+@receiver(post_delete, sender=Booking)
+def notify_seat_viewers(sender, instance, **kwargs):
+    # The old departure too, when a booking was moved to another bus or date
+    for bus_id, booking_date in {instance._seat_channel, (instance.bus_id, instance.booking_date)}:
+        if bus_id and booking_date:
+            transaction.on_commit(partial(seat_event_hub.notify, bus_id, booking_date))
+    instance._seat_channel = (instance.bus_id, instance.booking_date)
@@ -0,0 +1,266 @@
+# home/stats.py
+"""Incrementally maintained dashboard counters.
+
+Signal receivers in home/signals.py call into this module whenever a User,
+Route, Bus, Booking, Payment, RefundRequest or ComplaintSuggestion is saved or
+deleted, so the admin and customer dashboards read a handful of summary rows
+instead of counting whole tables. `manage.py rebuild_dashboard_stats` rebuilds
+everything from scratch if the numbers ever drift.
+"""
+from collections import Counter
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+
+from .models import (
+    User, Route, Bus, Booking, Payment, RefundRequest, ComplaintSuggestion,
+    DashboardCounter, BookingDailyStat, CustomerBookingStat, split_seats,
+)
+from .trips import service_today
+
+
+def _bump(model, lookup, **deltas):
+    """Add ``deltas`` to the row matching ``lookup``, creating it if needed."""
+    deltas = {field: amount for field, amount in deltas.items() if amount}
+    if not deltas:
+        return
+    increments = {field: F(field) + amount for field, amount in deltas.items()}
+    if model.objects.filter(**lookup).update(**increments):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**lookup, **deltas)
+    except IntegrityError:
+        # Another request created the row in the meantime
+        model.objects.filter(**lookup).update(**increments)
+
+
+def bump_counter(key, delta=1):
+    _bump(DashboardCounter, {"key": key}, value=delta)
+
+
+# -----------------------------
+# Bookings
+# -----------------------------
+SNAPSHOT_FIELDS = ("status", "booking_date", "seat_number", "user_id", "route_id", "bus_id")
+
+
+def booking_snapshot(booking):
+    """The values of ``booking`` that feed the counters, or None if not all loaded.
+
+    Reads instance.__dict__ directly so deferred fields are never fetched.
+    """
+    values = booking.__dict__
+    if any(field not in values for field in SNAPSHOT_FIELDS):
+        return None
+    return (
+        values["status"],
+        str(values["booking_date"]) if values["booking_date"] else None,
+        len(split_seats(values["seat_number"])),
+        values["user_id"],
+        values["route_id"],
+        values["bus_id"],
+    )
+
+
+def _booking_rows(snapshot, sign):
+    status, booking_date, seats, user_id, route_id, bus_id = snapshot
+    daily = (BookingDailyStat, (("booking_date", booking_date), ("status", status)))
+
+    def customer(kind, key):
+        return (CustomerBookingStat, (("user_id", user_id), ("kind", kind), ("key", key)))
+
+    return [
+        ((DashboardCounter, (("key", "bookings"),)), "value", sign),
+        (daily, "bookings", sign),
+        (daily, "seats", sign * seats),
+        (customer("total", ""), "count", sign),
+        (customer("date", booking_date), "count", sign),
+        (customer("route", str(route_id)), "count", sign),
+        # Resolved to the bus type below, only if this row actually changes
+        (customer("bus_type", ("bus", bus_id)), "count", sign),
+    ]
+
+
+def record_booking_change(old, new):
+    """Apply the difference between two booking snapshots (None = no booking)."""
+    if old == new:
+        return
+    changes = Counter()
+    for snapshot, sign in ((old, -1), (new, 1)):
+        if snapshot is not None:
+            for target, field, amount in _booking_rows(snapshot, sign):
+                changes[target, field] += amount
+
+    for ((model, lookup), field), amount in changes.items():
+        if not amount:
+            continue
+        lookup = dict(lookup)
+        if isinstance(lookup.get("key"), tuple):
+            bus_type = Bus.objects.filter(pk=lookup["key"][1]).values_list("bus_type", flat=True).first()
+            lookup["key"] = bus_type or ""
+        _bump(model, lookup, **{field: amount})
+
+
+def record_bus_type_change(bus_id, old_type, new_type):
+    """Move the bookings of one bus from ``old_type`` to ``new_type`` in the customers' bus type counts.
+
+    Bookings are counted under their bus's type, so without this an edited
+    Bus.bus_type would leave the old counts behind and later changes would
+    decrement the new type.
+    """
+    if (old_type or "") == (new_type or ""):
+        return
+    per_user = Booking.objects.filter(bus_id=bus_id).values_list("user_id").annotate(count=Count("id")).order_by()
+    for user_id, count in per_user:
+        _bump(CustomerBookingStat, {"user_id": user_id, "kind": "bus_type", "key": old_type or ""}, count=-count)
+        _bump(CustomerBookingStat, {"user_id": user_id, "kind": "bus_type", "key": new_type or ""}, count=count)
+
+
+def record_bookings_expired(booking_ids):
+    """Move just-expired bookings from 'reserved' to 'expired' in the daily stats.
+
+    Used by seats.expire_reservations(), whose bulk UPDATE sends no signals.
+    """
+    per_day = Counter()
+    for booking_date, seat_number in Booking.objects.filter(id__in=booking_ids).values_list(
+        "booking_date", "seat_number"
+    ):
+        per_day[booking_date, "bookings"] += 1
+        per_day[booking_date, "seats"] += len(split_seats(seat_number))
+
+    for booking_date in {day for day, _ in per_day}:
+        bookings, seats = per_day[booking_date, "bookings"], per_day[booking_date, "seats"]
+        _bump(BookingDailyStat, {"booking_date": booking_date, "status": "reserved"}, bookings=-bookings, seats=-seats)
+        _bump(BookingDailyStat, {"booking_date": booking_date, "status": "expired"}, bookings=bookings, seats=seats)
+
+
+# -----------------------------
+# Reading
+# -----------------------------
+ADMIN_COUNTERS = {
+    "customers_count": "users:customer",
+    "routes_count": "routes",
+    "buses_count": "buses",
+    "complaints_count": "complaints",
+    "bookings_count": "bookings",
+    "refunds_count": "refunds",
+}
+
+
+def admin_dashboard_counts():
+    """The admin dashboard totals, read from one query on dashboard_counter."""
+    values = dict(DashboardCounter.objects.filter(key__in=ADMIN_COUNTERS.values()).values_list("key", "value"))
+    return {name: values.get(key, 0) for name, key in ADMIN_COUNTERS.items()}
+
+
+def seats_booked_per_day(limit=30):
+    """Seats held by reserved/confirmed bookings for the most recent travel dates."""
+    return (
+        BookingDailyStat.objects.filter(status__in=Booking.ACTIVE_STATUSES)
+        .values("booking_date")
+        .annotate(total_seats=Sum("seats"))
+        .filter(total_seats__gt=0)
+        .order_by("-booking_date")[:limit]
+    )
+
+
+def customer_dashboard_stats(user):
+    """Totals, favourite routes and bus types for one customer in two small queries."""
+    today = service_today().isoformat()
+    rows = CustomerBookingStat.objects.filter(user=user, count__gt=0).filter(
+        Q(kind__in=("total", "route", "bus_type")) | Q(kind="date", key__gte=today)
+    ).values_list("kind", "key", "count")
+
+    total = upcoming = 0
+    routes, bus_types = [], []
+    for kind, key, count in rows:
+        if kind == "total":
+            total = count
+        elif kind == "date":
+            upcoming += count
+        elif kind == "route":
+            routes.append((count, key))
+        else:
+            bus_types.append((count, key))
+
+    top_routes = sorted(routes, key=lambda row: (-row[0], row[1]))[:3]
+    names = Route.objects.in_bulk([int(route_id) for _, route_id in top_routes])
+    favorite_routes = [
+        {
+            "bus__route__origin": names[int(route_id)].origin,
+            "bus__route__destination": names[int(route_id)].destination,
+            "count": count,
+        }
+        for count, route_id in top_routes if int(route_id) in names
+    ]
+    preferred_bus_types = [
+        {"bus__bus_type": bus_type, "count": count}
+        for count, bus_type in sorted(bus_types, key=lambda row: (-row[0], row[1]))[:3]
+    ]
+
+    return {
+        "total_bookings": total,
+        "upcoming_bookings": upcoming,
+        "completed_bookings": total - upcoming,
+        "favorite_routes": favorite_routes,
+        "preferred_bus_types": preferred_bus_types,
+    }
+
+
+# -----------------------------
+# Rebuild
+# -----------------------------
+def rebuild_all(batch_size=1000):
+    """Recompute every summary table from the source tables."""
+    counters = Counter()
+    for role, count in User.objects.values_list("role").annotate(count=Count("id")).order_by():
+        counters[f"users:{role}"] += count
+    counters["routes"] = Route.objects.count()
+    counters["buses"] = Bus.objects.count()
+    counters["complaints"] = ComplaintSuggestion.objects.count()
+    counters["refunds"] = RefundRequest.objects.count()
+    for status, count in Payment.objects.values_list("status").annotate(count=Count("id")).order_by():
+        counters[f"payments:{status}"] += count
+
+    daily = Counter()
+    customer = Counter()
+    bookings = Booking.objects.values_list(
+        "status", "booking_date", "seat_number", "user_id", "route_id", "bus__bus_type"
+    ).order_by()
+    for status, booking_date, seat_number, user_id, route_id, bus_type in bookings.iterator(chunk_size=batch_size):
+        counters["bookings"] += 1
+        daily[booking_date, status, "bookings"] += 1
+        daily[booking_date, status, "seats"] += len(split_seats(seat_number))
+        customer[user_id, "total", ""] += 1
+        customer[user_id, "date", str(booking_date)] += 1
+        customer[user_id, "route", str(route_id)] += 1
+        customer[user_id, "bus_type", bus_type or ""] += 1
+
+    with transaction.atomic():
+        DashboardCounter.objects.all().delete()
+        BookingDailyStat.objects.all().delete()
+        CustomerBookingStat.objects.all().delete()
+
+        DashboardCounter.objects.bulk_create(
+            [DashboardCounter(key=key, value=value) for key, value in counters.items()],
+            batch_size=batch_size,
+        )
+        BookingDailyStat.objects.bulk_create(
+            [
+                BookingDailyStat(
+                    booking_date=booking_date, status=status, bookings=count,
+                    seats=daily[booking_date, status, "seats"],
+                )
+                for (booking_date, status, field), count in daily.items() if field == "bookings"
+            ],
+            batch_size=batch_size,
+        )
+        CustomerBookingStat.objects.bulk_create(
+            [
+                CustomerBookingStat(user_id=user_id, kind=kind, key=key, count=count)
+                for (user_id, kind, key), count in customer.items()
+            ],
+            batch_size=batch_size,
+        )
+    return counters
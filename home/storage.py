@@ -0,0 +1,18 @@
+# home/storage.py
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+
+
+class HashedStaticStorage(ManifestStaticFilesStorage):
+    """Content-hashed static file names (lahore.3f2a9c1b7e0d.jpg) after collectstatic.
+
+    Until collectstatic has written a manifest (tests, a fresh checkout run
+    with DEBUG off) the plain file names are used instead of failing.
+    """
+
+    manifest_strict = False
+
+    def stored_name(self, name):
+        try:
+            return super().stored_name(name)
+        except ValueError:
+            return name
@@ -0,0 +1,204 @@
+# home/synthetic.py
+"""Deterministic synthetic datasets for benchmarks (`manage.py generate_dataset`).
+
+Everything is drawn from one random.Random(seed), so the same seed and scale
+always produce the same rows. Rows are written with bulk_create in batches and
+explicit primary keys (MySQL does not return ids from bulk inserts). Because
+bulk_create skips save() and signals, the derived data that save() would
+normally maintain is filled in here: Route.duration_minutes, Bus.arrival_time,
+Booking.booking_number and the SeatAllocation rows. Trips and the dashboard
+summary tables are rebuilt at the end.
+"""
+import random
+from collections import Counter
+from datetime import time, timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from . import stats, trips
+from .seats import seat_labels
+from .models import (
+    User, Route, Bus, Booking, SeatAllocation, Payment, RefundRequest, add_minutes, parse_duration_minutes,
+)
+
+CITIES = [
+    "Lahore", "Karachi", "Islamabad", "Rawalpindi", "Multan", "Faisalabad", "Peshawar", "Sargodha",
+    "Abbottabad", "Sialkot", "Bahawalpur", "Hyderabad", "Sahiwal", "Sukkur", "Swat", "DI Khan",
+    "DG Khan", "Gujranwala", "Gujrat", "Jhang", "Sadiqabad", "Okara", "Jhelum", "Murree", "Khanewal",
+    "Daska", "Moro", "Khanpur", "Bhakkar", "Batkhela", "Muzaffargarh", "Bhalwal", "Kohat", "Barikot",
+]
+BUS_TYPES = [("Express", 48, 2200), ("Metro", 40, 1500), ("Cargo", 32, 1200)]
+SEAT_LABELS = seat_labels(max(capacity for _, capacity, _ in BUS_TYPES))
+SEATS_PER_BOOKING = ([1, 2, 3, 4], [55, 25, 10, 10])
+PAST_STATUSES = (["confirmed", "cancelled", "expired"], [78, 10, 12])
+FUTURE_STATUSES = (["confirmed", "reserved", "cancelled", "expired"], [80, 8, 7, 5])
+PAYMENT_METHODS = (["card", "cash", "wallet", "bank_transfer"], [50, 25, 15, 10])
+
+# Row counts at scale=1
+BASE_CUSTOMERS = 50_000
+BASE_ROUTES = 300
+BUSES_PER_ROUTE = 10
+BASE_BOOKINGS = 1_000_000
+
+# Unique fields embed the whole seed and a row number, sized to their columns:
+# phone "+SSSSNNNNNNNNNN" (15 of 15), CNIC "SSSS-NNNNNNNNNN" (15 of 20) and
+# booking number "BK-S<seed>-XXXXXXXX" (at most 17 of 20)
+MAX_SEED = 9999
+MAX_CUSTOMERS = 10 ** 10 - 1
+MAX_BOOKINGS = 16 ** 8
+
+
+class DatasetError(ValueError):
+    """The requested dataset cannot be generated (seed already loaded, too many seats)."""
+
+
+def _next_id(model):
+    return (model.objects.aggregate(top=Max("pk"))["top"] or 0) + 1
+
+
+def _bulk(model, rows, batch_size):
+    model.objects.bulk_create(rows, batch_size=batch_size)
+    return len(rows)
+
+
+def generate(seed=1, scale=1.0, bookings=None, days_back=180, days_ahead=30, batch_size=5000, log=None):
+    """Create users, routes, buses, bookings, payments and refunds; returns row counts."""
+    rng = random.Random(seed)
+    log = log or (lambda message: None)
+    today = trips.service_today()
+    now = timezone.now()
+    counts = Counter()
+
+    n_customers = max(1, int(BASE_CUSTOMERS * scale))
+    n_routes = max(1, int(BASE_ROUTES * scale))
+    n_bookings = int(BASE_BOOKINGS * scale) if bookings is None else bookings
+    if not 0 <= seed <= MAX_SEED:
+        raise DatasetError(f"--seed must be between 0 and {MAX_SEED}.")
+    if n_customers > MAX_CUSTOMERS or n_bookings > MAX_BOOKINGS:
+        raise DatasetError("Too many rows for the synthetic phone and booking number formats; lower --scale.")
+    tag = f"s{seed}"
+    if User.objects.filter(email=f"admin-{tag}@example.test").exists():
+        raise DatasetError(f"A dataset with seed {seed} is already loaded; use another --seed.")
+
+    # Users: one admin plus customers. Unique fields carry the seed so
+    # datasets with different seeds can share a database.
+    user_id = _next_id(User)
+    users = [User(
+        id=user_id, name=f"Admin {tag}", email=f"admin-{tag}@example.test",
+        phone=f"+{seed:04d}{0:010d}", password="secret", role="admin",
+    )]
+    for n in range(1, n_customers + 1):
+        users.append(User(
+            id=user_id + n, name=f"Customer {n}", email=f"customer{n}-{tag}@example.test",
+            phone=f"+{seed:04d}{n:010d}", cnic_passport=f"{seed:04d}-{n:010d}",
+            city=rng.choice(CITIES), password="secret", role="customer",
+        ))
+    customer_ids = [user.id for user in users[1:]]
+
+    # Routes and buses
+    route_id, bus_id = _next_id(Route), _next_id(Bus)
+    routes, buses = [], []
+    for n in range(n_routes):
+        origin, destination = rng.sample(CITIES, 2)
+        hours, minutes = rng.randint(1, 14), rng.choice([0, 15, 30, 45])
+        duration = f"{hours:02d}:{minutes:02d}"
+        route = Route(
+            id=route_id + n, origin=origin, destination=destination, duration=duration,
+            duration_minutes=parse_duration_minutes(duration), distance=round(hours * 75 + minutes * 1.2, 1),
+        )
+        routes.append(route)
+        for k in range(BUSES_PER_ROUTE):
+            bus_type, capacity, base_price = rng.choice(BUS_TYPES)
+            departure = time(5 + (k * 37 + n) % 19, rng.choice([0, 30]))
+            buses.append(Bus(
+                id=bus_id + len(buses), route_id=route.id, bus_number=f"{bus_type[:2].upper()}-{len(buses):05d}",
+                bus_type=bus_type, capacity=capacity, departure_time=departure,
+                arrival_time=add_minutes(departure, route.duration_minutes),
+                price=Decimal(base_price + hours * 100),
+            ))
+
+    days = days_back + days_ahead
+    capacity = sum(bus.capacity for bus in buses) * days
+    if n_bookings * 2 > capacity * 0.9:
+        raise DatasetError(
+            f"{n_bookings} bookings need about {n_bookings * 2} seats but {len(buses)} buses "
+            f"over {days} days only have {capacity}; lower --bookings or raise --scale."
+        )
+    with transaction.atomic():
+        counts["users"] = _bulk(User, users, batch_size)
+        counts["routes"] = _bulk(Route, routes, batch_size)
+        counts["buses"] = _bulk(Bus, buses, batch_size)
+    log(f"{counts['users']} users, {counts['routes']} routes, {counts['buses']} buses")
+
+    # Bookings, with their seats, payments and refunds, one batch at a time
+    booking_id, payment_id, refund_id = _next_id(Booking), _next_id(Payment), _next_id(RefundRequest)
+    seats_used = Counter()  # (bus index, day offset) -> seats handed out so far
+    made = 0
+    while made < n_bookings:
+        batch = {"bookings": [], "seats": [], "payments": [], "refunds": []}
+        while made < n_bookings and len(batch["bookings"]) < batch_size:
+            bus_index = rng.randrange(len(buses))
+            offset = rng.randrange(-days_back, days_ahead)
+            bus = buses[bus_index]
+            seat_count = rng.choices(*SEATS_PER_BOOKING)[0]
+            start = seats_used[bus_index, offset]
+            if start + seat_count > bus.capacity:
+                continue  # departure is full; draw again
+            seats_used[bus_index, offset] += seat_count
+            labels = SEAT_LABELS[start:start + seat_count]
+
+            booking_date = today + timedelta(days=offset)
+            status = rng.choices(*(PAST_STATUSES if offset < 0 else FUTURE_STATUSES))[0]
+            reserved_until = None
+            if status == "reserved":
+                reserved_until = now + timedelta(minutes=rng.randint(1, 30))
+            elif status == "expired":
+                reserved_until = now - timedelta(days=rng.randint(1, 30))
+
+            user = rng.choice(customer_ids)
+            booking = Booking(
+                id=booking_id + made, user_id=user, route_id=bus.route_id, bus_id=bus.id,
+                booking_date=booking_date, seat_number=", ".join(labels),
+                booking_number=f"BK-{tag.upper()}-{made:08X}", status=status, reserved_until=reserved_until,
+            )
+            batch["bookings"].append(booking)
+            if status in Booking.ACTIVE_STATUSES:
+                batch["seats"] += [
+                    SeatAllocation(booking_id=booking.id, bus_id=bus.id, booking_date=booking_date, seat_label=label)
+                    for label in labels
+                ]
+
+            amount = bus.price * seat_count
+            payment_status = {
+                "confirmed": "completed",
+                "reserved": "pending" if rng.random() < 0.3 else None,
+                "expired": "failed" if rng.random() < 0.3 else None,
+                "cancelled": "refunded" if rng.random() < 0.6 else None,
+            }[status]
+            if payment_status:
+                batch["payments"].append(Payment(
+                    id=payment_id + counts["payments"] + len(batch["payments"]), booking_id=booking.id,
+                    user_id=user, amount=amount, method=rng.choices(*PAYMENT_METHODS)[0], status=payment_status,
+                    paid_at=now if payment_status in ("completed", "refunded") else None,
+                ))
+            if payment_status == "refunded":
+                batch["refunds"].append(RefundRequest(
+                    id=refund_id + counts["refunds"] + len(batch["refunds"]), user_id=user,
+                    booking_id=booking.id, refund_as=rng.choice(["cash", "card", "wallet"]),
+                    booking_amount=amount, status=rng.choice(["Approved", "Approved", "Pending", "Rejected"]),
+                ))
+            made += 1
+
+        with transaction.atomic():
+            counts["bookings"] += _bulk(Booking, batch["bookings"], batch_size)
+            counts["seat_allocations"] += _bulk(SeatAllocation, batch["seats"], batch_size)
+            counts["payments"] += _bulk(Payment, batch["payments"], batch_size)
+            counts["refunds"] += _bulk(RefundRequest, batch["refunds"], batch_size)
+        log(f"{counts['bookings']}/{n_bookings} bookings")
+
+    counts["trips"] = trips.extend_trips(batch_size=batch_size)
+    stats.rebuild_all(batch_size=batch_size)
+    return counts
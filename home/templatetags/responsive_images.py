@@ -0,0 +1,37 @@
+from django import template
+from django.templatetags.static import static
+from django.utils.html import format_html, format_html_join
+
+from home.images import load_manifest
+
+register = template.Library()
+
+
+def _srcset(variants):
+    return ", ".join(f"{static(path)} {width}w" for width, path in variants)
+
+
+@register.simple_tag
+def responsive_img(src, alt="", sizes="100vw", **attrs):
+    """``<img>`` for a static image, with WebP and resized variants when built.
+
+    {% responsive_img 'home/lahore.jpg' alt="Lahore" class="card-img" %}
+
+    Extra keyword arguments become attributes of the <img>. Images are lazy
+    loaded unless ``loading="eager"`` is passed.
+    """
+    attrs.setdefault("loading", "lazy")
+    attrs.setdefault("decoding", "async")
+    extra = format_html_join("", ' {}="{}"', attrs.items())
+
+    entry = load_manifest().get(src)
+    if not entry:
+        return format_html('<img src="{}" alt="{}"{}>', static(src), alt, extra)
+
+    fallback = entry.get("jpg") or entry.get("png")
+    return format_html(
+        '<picture><source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" alt="{}"{}></picture>',
+        _srcset(entry["webp"]), sizes,
+        static(fallback[-1][1]), _srcset(fallback), sizes, alt, extra,
+    )
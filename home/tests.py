@@ -1,3 +1,1592 @@
-from django.test import TestCase
+import json
+import os
+import random
+import shutil
+import socketserver
+import sqlite3
+import tempfile
+import threading
+import time as clock
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+from io import StringIO
+from pathlib import Path
+from typing import NamedTuple
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from asgiref.testing import ApplicationCommunicator
+from django.conf import settings
+from django.core.cache import cache
+from django.core.handlers.asgi import ASGIHandler
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, OperationalError, connection, connections
+from django.template import Context, Template
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, get_resolver, reverse
+from django.utils import timezone
+
+from .images import build_variants, load_manifest
+from .loadtest import customer_logins, double_bookings, hot_targets, local_server, percentile, report, run
+from .mail import LEASE_SECONDS, MAX_ATTEMPTS, claim_batch, queue_email, send_pending
+from .pagination import decode_cursor, encode_cursor, keyset_page
+from .models import (
+    User, Route, Bus, Trip, Booking, SeatAllocation, ComplaintSuggestion, OutboxEmail, Payment, RefundRequest,
+    DashboardCounter, BookingDailyStat, CustomerBookingStat, parse_duration_minutes,
+)
+from . import metrics, profiling, replicas, seat_events, stats
+from .seats import InvalidSeats, SeatsUnavailable, expire_reservations, reserve_seats, seat_occupancy, taken_seats
+from .trips import departures, has_departed, is_bookable_date, service_now, service_today
+
+
+def make_customer(name="Ali", email="ali@example.com", phone="03000000000"):
+    return User.objects.create(name=name, email=email, phone=phone, password="secret", role="customer")
+
+
+def make_bus(route=None, departure=time(10, 0), capacity=48):
+    route = route or Route.objects.create(origin="Lahore", destination="Multan", duration="05:00")
+    return Bus.objects.create(
+        bus_number="LHR-1", capacity=capacity, route=route, bus_type="Express",
+        departure_time=departure, price=1500,
+    )
+
+
+def login(client, user):
+    session = client.session
+    session["user_id"] = user.id
+    session["role"] = user.role
+    session["_saved_at"] = int(clock.time())  # as SessionRefreshMiddleware would
+    session.save()
+
+
+# The fixtures travel on 2030-01-01, past the default search horizon
+FAR_HORIZON = override_settings(TRIP_SEARCH_HORIZON_DAYS=10 * 365)
+
+def make_booking(user, bus, seats, booking_date=date(2030, 1, 1), **extra):
+    return Booking.objects.create(
+        user=user, route=bus.route, bus=bus, booking_date=booking_date, seat_number=seats, **extra
+    )
+
+
+class SeatAllocationTests(TestCase):
+    def setUp(self):
+        self.user = make_customer()
+        self.bus = make_bus()
+
+    def test_booking_creates_one_row_per_seat(self):
+        booking = make_booking(self.user, self.bus, "1A, 1B")
+        self.assertEqual(sorted(booking.seats.values_list("seat_label", flat=True)), ["1A", "1B"])
+
+    def test_same_seat_cannot_be_booked_twice(self):
+        make_booking(self.user, self.bus, "1A,1B")
+        with self.assertRaises(IntegrityError):
+            make_booking(self.user, self.bus, "1B,1C")
+        # The losing booking is rolled back together with its seats
+        self.assertEqual(Booking.objects.count(), 1)
+        self.assertEqual(taken_seats(self.bus, date(2030, 1, 1), ["1B", "1C"]), ["1B"])
+
+    def test_editing_and_cancelling_release_seats(self):
+        booking = make_booking(self.user, self.bus, "1A,1B")
+        booking.seat_number = "1B,2A"
+        booking.save()
+        self.assertEqual(sorted(booking.seats.values_list("seat_label", flat=True)), ["1B", "2A"])
+
+        booking.status = "cancelled"
+        booking.save()
+        self.assertFalse(SeatAllocation.objects.exists())
+
+
+class SeatOccupancyTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = make_customer()
+        self.route = Route.objects.create(origin="Lahore", destination="Multan", duration="05:00")
+
+    def test_occupancy_for_many_buses(self):
+        first, second = make_bus(self.route), make_bus(self.route, capacity=40)
+        make_booking(self.user, first, "1A,1B")
+        make_booking(self.user, first, "2C")
+
+        booked, available = seat_occupancy([first, second], date(2030, 1, 1))
+        self.assertEqual(set(booked[first.id]), {"1A", "1B", "2C"})
+        self.assertEqual(booked[first.id]["2C"], {"user_name": "Ali"})
+        self.assertEqual(booked[second.id], {})
+        self.assertEqual(available, {first.id: 45, second.id: 40})
+
+    def _search_queries(self):
+        login(self.client, self.user)
+        params = {"origin": "Lahore", "destination": "Multan", "booking_date": "2030-01-01"}
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse("booking"), params)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def test_search_query_count_does_not_grow_with_buses(self):
+        bus = make_bus(self.route)
+        make_booking(self.user, bus, "1A")
+        self._search_queries()  # warm the route catalog cache
+        baseline = self._search_queries()
+
+        for hour in range(11, 20):
+            extra = make_bus(self.route, departure=time(hour, 0))
+            make_booking(self.user, extra, "3B,3C")
+        self.assertEqual(self._search_queries(), baseline)
+
+
+class ArrivalTimeTests(TestCase):
+    def test_parse_duration_minutes(self):
+        for value, minutes in [("05:30", 330), ("02:00:00", 120), ("5h 30", 330), ("5", 300), ("", None), ("soon", None)]:
+            self.assertEqual(parse_duration_minutes(value), minutes, value)
+
+    def test_arrival_time_is_stored_and_follows_route_changes(self):
+        bus = make_bus(departure=time(22, 30))
+        self.assertEqual(bus.route.duration_minutes, 300)
+        self.assertEqual(Bus.objects.get(pk=bus.pk).arrival_time, time(3, 30))
+
+        bus.route.duration = "01:15"
+        bus.route.save()
+        self.assertEqual(Bus.objects.get(pk=bus.pk).arrival_time, time(23, 45))
+
+    def test_ticket_list_needs_no_route_query_per_row(self):
+        user = make_customer()
+        login(self.client, user)
+        for hour in range(8, 12):
+            make_booking(user, make_bus(departure=time(hour, 0)), "1A")
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse("upcoming_tickets"))
+        self.assertContains(response, "1:00 PM")
+        self.assertFalse([q for q in ctx.captured_queries if 'FROM "routes"' in q["sql"]])
+
+
+class TripTests(TestCase):
+    def setUp(self):
+        self.today = service_today()
+        self.route = Route.objects.create(origin="Lahore", destination="Multan", duration="05:00")
+        self.early = make_bus(self.route, departure=time(8, 0))
+        self.late = make_bus(self.route, departure=time(18, 0))
+
+    def test_new_bus_gets_trips_for_the_window(self):
+        dates = set(self.early.trips.values_list("trip_date", flat=True))
+        self.assertEqual(dates, {self.today + timedelta(days=n) for n in range(settings.TRIP_WINDOW_DAYS)})
+
+    def test_departures_skip_buses_that_have_left(self):
+        trips = departures([self.route.id], self.today, after=time(12, 0))
+        self.assertEqual([trip.bus for trip in trips], [self.late])
+        self.assertTrue(has_departed(self.early, self.today, time(12, 0)))
+        self.assertFalse(has_departed(self.late, self.today, time(12, 0)))
+
+    def test_schedule_change_moves_future_trips(self):
+        self.early.departure_time = time(20, 0)
+        self.early.save()
+        trips = departures([self.route.id], self.today + timedelta(days=1))
+        self.assertEqual([trip.bus for trip in trips], [self.late, self.early])
+
+    def test_dates_without_trips_are_materialized_on_search(self):
+        far = self.today + timedelta(days=100)
+        self.assertEqual(len(departures([self.route.id], far)), 2)
+        self.assertEqual(len(departures([self.route.id], far)), 2)
+
+        # Inside the window too, e.g. when materialize_trips has not run
+        tomorrow = self.today + timedelta(days=1)
+        Trip.objects.filter(trip_date=tomorrow).delete()
+        self.assertEqual([trip.bus for trip in departures([self.route.id], tomorrow, after=time(12, 0))], [self.late])
+
+    def test_new_bus_joins_dates_already_materialized(self):
+        far = self.today + timedelta(days=settings.TRIP_WINDOW_DAYS + 20)
+        self.assertEqual(len(departures([self.route.id], far)), 2)
+        added = make_bus(self.route, departure=time(10, 0))
+        self.assertEqual([trip.bus for trip in departures([self.route.id], far)], [self.early, added, self.late])
+
+    def test_searches_stop_at_the_horizon(self):
+        beyond = self.today + timedelta(days=settings.TRIP_SEARCH_HORIZON_DAYS)
+        self.assertEqual(departures([self.route.id], beyond), [])
+        self.assertFalse(Trip.objects.filter(trip_date=beyond).exists())
+        self.assertFalse(is_bookable_date(beyond))
+
+    def test_missing_trip_falls_back_to_the_bus_schedule(self):
+        Trip.objects.filter(trip_date=self.today).delete()
+        self.assertFalse(has_departed(self.late, self.today, time(12, 0)))
+        self.assertTrue(has_departed(self.early, self.today, time(12, 0)))
+
+    def test_today_is_the_service_time_zone_date(self):
+        # 21:30 UTC on Jan 1 is already Jan 2 in Karachi (UTC+5)
+        late_evening = datetime(2030, 1, 1, 21, 30, tzinfo=dt_timezone.utc)
+        self.assertEqual(service_now(late_evening).date(), date(2030, 1, 2))
+
+    def test_ticket_pages_use_the_service_date(self):
+        user = make_customer()
+        # 21:30 UTC is already the next day in Karachi
+        evening = datetime.combine(timezone.now().date(), time(21, 30), tzinfo=dt_timezone.utc)
+        today = service_now(evening).date()
+        tonight = make_booking(user, self.late, "1A", booking_date=today)
+        yesterday = make_booking(user, self.late, "2A", booking_date=today - timedelta(days=1))
+        with mock.patch("django.utils.timezone.now", return_value=evening):
+            login(self.client, user)
+            upcoming = self.client.get(reverse("upcoming_tickets")).context["tickets"]
+            past = self.client.get(reverse("past_tickets")).context["tickets"]
+        self.assertEqual(list(upcoming), [tonight])
+        self.assertEqual(list(past), [yesterday])
+
+    def test_command_extends_and_prunes_the_window(self):
+        Trip.objects.create(bus=self.early, route=self.route, trip_date=self.today - timedelta(days=30), departure_time=time(8, 0))
+        call_command("materialize_trips", days=45, keep_days=7, stdout=StringIO())
+        dates = set(self.late.trips.values_list("trip_date", flat=True))
+        self.assertEqual(dates, {self.today + timedelta(days=n) for n in range(45)})
+        self.assertFalse(Trip.objects.filter(trip_date__lt=self.today).exists())
+
+
+@FAR_HORIZON
+class RouteCatalogTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = make_customer()
+        self.bus = make_bus()
+        Route.objects.create(origin="Lahore", destination="Islamabad")
+        login(self.client, self.user)
+
+    def _search(self):
+        params = {"origin": "Lahore", "destination": "Multan", "booking_date": "2030-01-01"}
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse("booking"), params)
+        return response, [q["sql"] for q in ctx.captured_queries]
+
+    def test_steady_state_search_does_not_touch_routes(self):
+        self._search()
+        response, queries = self._search()
+        self.assertEqual(list(response.context["origins"]), ["Lahore"])
+        self.assertEqual(list(response.context["destinations"]), ["Islamabad", "Multan"])
+        self.assertEqual([bus.id for bus in response.context["buses"]], [self.bus.id])
+        self.assertContains(response, "Lahore")
+        self.assertFalse([sql for sql in queries if '"routes"' in sql])
+
+    def test_route_changes_invalidate_the_catalog_on_commit(self):
+        self._search()
+        with self.captureOnCommitCallbacks(execute=True):
+            route = Route.objects.create(origin="Karachi", destination="Multan")
+            # Still cached until the transaction commits
+            self.assertIsNotNone(cache.get("home:route_catalog"))
+        response, _ = self._search()
+        self.assertEqual(list(response.context["origins"]), ["Karachi", "Lahore"])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            route.delete()
+        response, _ = self._search()
+        self.assertEqual(list(response.context["origins"]), ["Lahore"])
+
+
+class ReservationExpiryTests(TestCase):
+    def setUp(self):
+        self.user = make_customer()
+        self.bus = make_bus()
+
+    def test_overdue_reservations_expire_and_release_seats(self):
+        past = timezone.now() - timedelta(minutes=1)
+        overdue = [make_booking(self.user, self.bus, f"{row}A", reserved_until=past) for row in range(1, 6)]
+        fresh = make_booking(self.user, self.bus, "7A")
+        paid = make_booking(self.user, self.bus, "8A", status="confirmed")
+
+        self.assertEqual(expire_reservations(batch_size=2), 5)
+
+        self.assertEqual(Booking.objects.filter(status="expired").count(), len(overdue))
+        self.assertEqual(
+            sorted(SeatAllocation.objects.values_list("booking_id", flat=True)), [fresh.id, paid.id]
+        )
+        self.assertEqual(expire_reservations(), 0)
+
+    def test_expired_seat_can_be_booked_again(self):
+        make_booking(self.user, self.bus, "1A", reserved_until=timezone.now() - timedelta(minutes=1))
+        expire_reservations()
+        reserve_seats(self.user, self.bus, date(2030, 1, 1), ["1A"])
+        self.assertEqual(taken_seats(self.bus, date(2030, 1, 1), ["1A"]), ["1A"])
+
+
+class SeatReservationContentionTests(TransactionTestCase):
+    THREADS = 8
+    ATTEMPTS_PER_THREAD = 15
+
+    def setUp(self):
+        self.bus = make_bus()
+        self.users = [
+            make_customer(name=f"Customer {i}", email=f"c{i}@example.com", phone=f"0300000000{i}")
+            for i in range(self.THREADS)
+        ]
+
+    def test_losing_request_gets_seats_unavailable(self):
+        reserve_seats(self.users[0], self.bus, date(2030, 1, 1), ["1A", "1B"])
+        with self.assertRaises(SeatsUnavailable) as ctx:
+            reserve_seats(self.users[1], self.bus, date(2030, 1, 1), ["1B", "1C"])
+        self.assertEqual(ctx.exception.seats, ["1B"])
+        self.assertEqual(Booking.objects.count(), 1)
+
+    def test_empty_and_unknown_seats_are_rejected(self):
+        small = make_bus(capacity=10)
+        for wanted, invalid in [([], []), (["3C"], ["3C"]), (["1A", "0A", "1A" * 6], ["0A", "1A" * 6])]:
+            with self.assertRaises(InvalidSeats) as ctx:
+                reserve_seats(self.users[0], small, date(2030, 1, 1), wanted)
+            self.assertEqual(ctx.exception.seats, invalid)
+        reserve_seats(self.users[0], small, date(2030, 1, 1), ["3B"])  # the 10th seat
+
+        login(self.client, self.users[1])
+        day = (service_today() + timedelta(days=1)).isoformat()
+        for seats in [" , ", "1A, 99Z"]:
+            response = self.client.post(
+                reverse("confirm_booking", args=[small.id]), {"booking_date": day, "selected_seats": seats}
+            )
+            self.assertEqual(response.status_code, 302)
+        self.assertEqual(Booking.objects.count(), 1)
+
+    def test_concurrent_reservations_never_double_sell(self):
+        seats = [f"{row}{col}" for row in range(1, 7) for col in "ABCD"]
+        start = threading.Barrier(self.THREADS)
+        won, lost, errors = [], [], []
+
+        def customer(user, rng):
+            try:
+                start.wait()
+                for _ in range(self.ATTEMPTS_PER_THREAD):
+                    wanted = rng.sample(seats, 2)
+                    while True:
+                        try:
+                            reserve_seats(user, self.bus, date(2030, 1, 1), wanted)
+                            won.append(wanted)
+                        except SeatsUnavailable:
+                            lost.append(wanted)
+                        except OperationalError:
+                            # Lock wait / deadlock: a real client would retry too
+                            clock.sleep(0.001)
+                            continue
+                        break
+            except Exception as e:  # pragma: no cover - surfaced below
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [
+            threading.Thread(target=customer, args=(user, random.Random(i)))
+            for i, user in enumerate(self.users)
+        ]
+        began = clock.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = clock.perf_counter() - began
+
+        self.assertEqual(errors, [])
+        self.assertEqual(len(won) + len(lost), self.THREADS * self.ATTEMPTS_PER_THREAD)
+
+        sold = [seat for booking in Booking.objects.all() for seat in booking.seat_list()]
+        self.assertEqual(len(sold), len(set(sold)), "a seat was sold twice")
+        self.assertEqual(len(won), Booking.objects.count())
+        self.assertEqual(SeatAllocation.objects.count(), len(sold))
+
+        print(
+            f"\n[seat contention] {self.THREADS} threads: {len(won)} bookings, "
+            f"{len(lost)} rejected, {len(won) / elapsed:.1f} bookings/s"
+        )
+
+
+class AdminDashboardTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create(
+            name="Admin", email="admin@example.com", phone="03110000000", password="secret", role="admin"
+        )
+        self.customer = make_customer()
+        self.bus = make_bus()
+        login(self.client, self.admin)
+
+    def _add_paid_bookings(self, count, start_row):
+        for row in range(start_row, start_row + count):
+            booking = make_booking(self.customer, self.bus, f"{row}A")
+            Payment.objects.create(booking=booking, user=self.customer, amount=100, method="cash")
+            Payment.objects.create(booking=booking, user=self.customer, amount=1500, method="card")
+
+    def _queries(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response, len(ctx.captured_queries)
+
+    def test_bookings_section_query_count_is_fixed(self):
+        url = reverse("admin_section", args=["bookings"])
+        self._add_paid_bookings(2, 1)
+        response, baseline = self._queries(url)
+        self.assertContains(response, "Rs 1500")
+        self.assertContains(response, "Card")
+
+        self._add_paid_bookings(8, 3)
+        self.assertEqual(self._queries(url)[1], baseline)
+
+    def test_sections_are_paginated(self):
+        self._add_paid_bookings(30, 1)
+        response, _ = self._queries(reverse("admin_section", args=["bookings"]))
+        self.assertEqual(len(response.context["page"]), 25)
+        self.assertContains(response, "?after=")
+
+        for section in ("customers", "routes", "buses", "complaints", "refunds"):
+            self._queries(reverse("admin_section", args=[section]))
+
+    def test_dashboard_only_loads_summary(self):
+        self._add_paid_bookings(5, 1)
+        response, queries = self._queries(reverse("admin_management"))
+        self.assertEqual(response.context["bookings_count"], 5)
+        self.assertEqual(response.context["customers_count"], 1)
+        self._add_paid_bookings(5, 6)
+        self.assertEqual(self._queries(reverse("admin_management"))[1], queries)
+
+    def test_sections_require_admin(self):
+        login(self.client, self.customer)
+        url = reverse("admin_section", args=["bookings"])
+        self.assertEqual(self.client.get(url, headers={"X-Requested-With": "XMLHttpRequest"}).status_code, 403)
+        self.assertRedirects(self.client.get(url), reverse("login"), fetch_redirect_response=False)
+
+
+class DashboardStatsTests(TestCase):
+    def _snapshot(self):
+        return (
+            sorted(DashboardCounter.objects.exclude(value=0).values_list("key", "value")),
+            sorted(BookingDailyStat.objects.exclude(bookings=0).values_list("booking_date", "status", "bookings", "seats")),
+            sorted(CustomerBookingStat.objects.exclude(count=0).values_list("user_id", "kind", "key", "count")),
+        )
+
+    def test_incremental_counters_match_a_full_rebuild(self):
+        user = make_customer()
+        other = make_customer(name="Sara", email="sara@example.com", phone="03000000001")
+        bus = make_bus()
+        metro = make_bus(Route.objects.create(origin="Multan", destination="Lahore"))
+        metro.bus_type = "Metro"
+        metro.save()
+
+        first = make_booking(user, bus, "1A,1B")
+        make_booking(other, metro, "2A", reserved_until=timezone.now() - timedelta(minutes=5))
+        third = make_booking(user, metro, "3A", booking_date=date(2031, 5, 1))
+        Payment.objects.create(booking=first, user=user, amount=3000, method="cash", status="completed")
+        RefundRequest.objects.create(user=user, booking=first, refund_as="cash")
+
+        first.seat_number = "1A,1B,1C"
+        first.status = "confirmed"
+        first.save()
+        third.bus = bus
+        third.save()
+        expire_reservations()
+        Booking.objects.get(pk=third.pk).delete()
+        other.role = "admin"
+        other.save()
+
+        incremental = self._snapshot()
+        stats.rebuild_all()
+        self.assertEqual(incremental, self._snapshot())
+        self.assertEqual(stats.admin_dashboard_counts()["bookings_count"], 2)
+        self.assertIn(("2030-01-01", "expired", 1, 1), [
+            (str(d), status, b, seats) for d, status, b, seats in incremental[1]
+        ])
+
+    def test_bus_type_edits_move_the_customers_counts(self):
+        user = make_customer()
+        bus = make_bus()
+        kept = make_booking(user, bus, "1A")
+        make_booking(user, bus, "2A")
+
+        bus.bus_type = "Metro"
+        bus.save()
+        Booking.objects.get(pk=kept.pk).delete()
+
+        self.assertEqual(
+            sorted(CustomerBookingStat.objects.filter(kind="bus_type").values_list("key", "count")),
+            [("Express", 0), ("Metro", 1)],
+        )
+        incremental = self._snapshot()
+        stats.rebuild_all()
+        self.assertEqual(incremental, self._snapshot())
+
+    def test_customer_dashboard_reads_summary_rows(self):
+        user = make_customer()
+        bus = make_bus()
+        make_booking(user, bus, "1A")
+        make_booking(user, bus, "2A", booking_date=date(2020, 1, 1))
+
+        summary = stats.customer_dashboard_stats(user)
+        self.assertEqual((summary["total_bookings"], summary["upcoming_bookings"], summary["completed_bookings"]), (2, 1, 1))
+        self.assertEqual(summary["favorite_routes"], [
+            {"bus__route__origin": "Lahore", "bus__route__destination": "Multan", "count": 2}
+        ])
+        self.assertEqual(summary["preferred_bus_types"], [{"bus__bus_type": "Express", "count": 2}])
+
+        login(self.client, user)
+        response = self.client.get(reverse("customer_dashboard"))
+        self.assertEqual(response.context["total_bookings"], 2)
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        user = make_customer()
+        bus = make_bus()
+        # Several rows share a timestamp so the id tie-breaker matters
+        stamp = timezone.now()
+        self.bookings = [make_booking(user, bus, f"{row}A") for row in range(1, 12)]
+        Booking.objects.filter(pk__in=[b.pk for b in self.bookings[3:7]]).update(created_at=stamp)
+        self.expected = list(Booking.objects.order_by("-created_at", "-id").values_list("id", flat=True))
+
+    def _page(self, query=""):
+        return keyset_page(Booking.objects.all(), RequestFactory().get(f"/?{query}"), per_page=4)
+
+    def test_walks_forward_and_back_over_every_row(self):
+        seen, pages, page = [], [], self._page()
+        while True:
+            pages.append([b.id for b in page])
+            seen += pages[-1]
+            if not page.has_next:
+                break
+            page = self._page(page.next_query)
+        self.assertEqual(seen, self.expected)
+        self.assertEqual(len(pages), 3)
+
+        back = self._page(page.previous_query)
+        self.assertEqual([b.id for b in back], pages[1])
+        back = self._page(back.previous_query)
+        self.assertEqual([b.id for b in back], pages[0])
+        self.assertFalse(back.has_previous)
+
+    def test_deep_page_query_does_not_use_offset(self):
+        last = Booking.objects.order_by("created_at", "id").first()
+        query = f"after={encode_cursor(last.created_at, last.pk)}"
+        with CaptureQueriesContext(connection) as ctx:
+            list(self._page(query))
+        self.assertNotIn("OFFSET", ctx.captured_queries[0]["sql"].upper())
+
+    def test_bad_cursor_falls_back_to_first_page(self):
+        self.assertIsNone(decode_cursor("not-a-cursor"))
+        self.assertEqual([b.id for b in self._page("after=garbage")], self.expected[:4])
+
+
+class SessionWriteTests(TestCase):
+    def setUp(self):
+        self.user = make_customer()
+        login(self.client, self.user)
+
+    def _session_writes(self, pages=20):
+        with CaptureQueriesContext(connection) as ctx:
+            for _ in range(pages):
+                self.assertEqual(self.client.get(reverse("news")).status_code, 200)
+        return sum(
+            1 for q in ctx.captured_queries
+            if q["sql"].startswith(("INSERT", "UPDATE")) and "django_session" in q["sql"]
+        )
+
+    def test_page_views_do_not_write_the_session(self):
+        with override_settings(SESSION_SAVE_EVERY_REQUEST=True):
+            before = self._session_writes()
+        after = self._session_writes()
+        print(f"\n[session writes] 20 page views: {before} before, {after} after")
+        self.assertEqual(before, 20)
+        self.assertEqual(after, 0)
+
+    def test_session_is_refreshed_once_the_interval_passes(self):
+        session = self.client.session
+        session["_saved_at"] -= settings.SESSION_REFRESH_AFTER
+        session.save()
+        self.assertEqual(self._session_writes(3), 1)
+
+    def test_profile_comes_from_the_user_row(self):
+        response = self.client.post(reverse("login"), {"email": self.user.email, "password": "secret"})
+        self.assertRedirects(response, reverse("customer_dashboard"), fetch_redirect_response=False)
+        self.assertEqual(set(self.client.session.keys()) - {"_saved_at"}, {"user_id", "role"})
+
+        User.objects.filter(pk=self.user.pk).update(name="Ali Raza")
+        self.assertContains(self.client.get(reverse("news")), 'value="Ali Raza"')
+
+
+class CurrentUserTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = make_customer()
+        login(self.client, self.user)
+
+    def _user_queries(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response, [q for q in ctx.captured_queries if 'FROM "users"' in q["sql"]]
+
+    def test_user_is_loaded_once_per_request(self):
+        # The dashboard view and the navbar profile modal share one lookup
+        response, queries = self._user_queries(reverse("customer_dashboard"))
+        self.assertEqual(len(queries), 1)
+        self.assertContains(response, 'value="ali@example.com"')
+
+    @override_settings(CURRENT_USER_CACHE_TIMEOUT=60)
+    def test_cached_user_is_dropped_when_the_user_changes(self):
+        self._user_queries(reverse("customer_dashboard"))
+        self.assertEqual(self._user_queries(reverse("customer_dashboard"))[1], [])
+
+        self.user.name = "Ali Raza"
+        self.user.save()
+        response, queries = self._user_queries(reverse("news"))
+        self.assertEqual(len(queries), 1)
+        self.assertContains(response, 'value="Ali Raza"')
+
+    def test_role_decorators(self):
+        self.assertRedirects(self.client.get(reverse("admin_management")), reverse("login"), fetch_redirect_response=False)
+        self.assertEqual(self.client.get(reverse("booking")).status_code, 200)
+
+        self.client.get(reverse("logout"))
+        self.assertRedirects(self.client.get(reverse("booking")), reverse("login"), fetch_redirect_response=False)
+        self.assertRedirects(self.client.get(reverse("customer_dashboard")), reverse("login"), fetch_redirect_response=False)
+
+
+class PageCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_anonymous_page_is_rendered_once(self):
+        first = self.client.get(reverse("news"))
+        self.assertTrue(first.templates)
+        self.assertContains(first, "Sign In")
+
+        with CaptureQueriesContext(connection) as ctx:
+            second = self.client.get(reverse("news"))
+        self.assertEqual(second.templates, [])
+        self.assertEqual(len(ctx.captured_queries), 0)
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second["ETag"], first["ETag"])
+        self.assertIn("Cookie", second["Vary"])
+
+    def test_matching_etag_gets_304(self):
+        etag = self.client.get(reverse("blog"))["ETag"]
+        self.assertTrue(etag.startswith('"'))
+        response = self.client.get(reverse("blog"), headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+        self.assertEqual(self.client.get(reverse("blog"), headers={"If-None-Match": '"stale"'}).status_code, 200)
+
+    def test_logged_in_navbar_is_not_shared(self):
+        anonymous = self.client.get(reverse("about_us"))
+        user = make_customer()
+        login(self.client, user)
+        for _ in range(3):
+            response = self.client.get(reverse("about_us"))
+            self.assertContains(response, "Logout")
+            self.assertContains(response, 'value="Ali"')
+        self.assertEqual(response.templates, [])
+        self.assertNotEqual(response["ETag"], anonymous["ETag"])
+        self.assertIn("private", response["Cache-Control"])
+
+        user.name = "Ali Raza"
+        user.save()
+        self.assertContains(self.client.get(reverse("about_us")), 'value="Ali Raza"')
+
+    def test_new_deploy_starts_a_fresh_cache(self):
+        self.client.get(reverse("home"))
+        with override_settings(PAGE_CACHE_VERSION="next-release"):
+            self.assertTrue(self.client.get(reverse("home")).templates)
+
+
+class ResponsiveImageTests(TestCase):
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.tmp)
+        self.addCleanup(load_manifest.cache_clear)
+        override = override_settings(IMAGE_VARIANTS_DIR=self.tmp / "build")
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def _source(self, name, size):
+        from PIL import Image
+
+        path = self.tmp / "src" / "home" / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        Image.new("RGB", size, "navy").save(path)
+
+    def test_variants_are_resized_and_never_upscaled(self):
+        self._source("wide.jpg", (2000, 1000))
+        self._source("small.png", (300, 100))
+        self.assertEqual(build_variants(source_dir=self.tmp / "src"), (2, 8))
+        self.assertEqual(build_variants(source_dir=self.tmp / "src"), (2, 0))
+
+        manifest = load_manifest()
+        self.assertEqual([w for w, _ in manifest["home/wide.jpg"]["webp"]], [480, 960, 1440])
+        self.assertEqual(manifest["home/small.png"]["png"], [[300, "home/variants/small-300.png"]])
+        self.assertTrue((self.tmp / "build" / "home" / "variants" / "wide-960.webp").exists())
+
+    def test_tag_emits_srcset_when_variants_exist(self):
+        template = Template("{% load responsive_images %}{% responsive_img 'home/wide.jpg' alt='Wide' class='hero' %}")
+        self.assertIn('src="/static/home/wide.jpg"', template.render(Context()))
+
+        self._source("wide.jpg", (1000, 500))
+        build_variants(widths=[480, 960], source_dir=self.tmp / "src")
+        html = template.render(Context())
+        self.assertIn('<source type="image/webp" srcset="/static/home/variants/wide-480.webp 480w, '
+                      '/static/home/variants/wide-960.webp 960w"', html)
+        self.assertIn('src="/static/home/variants/wide-960.jpg"', html)
+        self.assertIn('class="hero" loading="lazy"', html)
+
+    def test_hashed_static_files_are_cached_for_a_year(self):
+        (self.tmp / "home").mkdir()
+        (self.tmp / "home" / "site.3f2a9c1b7e0d.css").write_text("body {}")
+        (self.tmp / "home" / "site.css").write_text("body {}")
+        with override_settings(STATIC_ROOT=self.tmp):
+            hashed = self.client.get("/static/home/site.3f2a9c1b7e0d.css")
+            plain = self.client.get("/static/home/site.css")
+        self.assertEqual(hashed["Cache-Control"], "public, max-age=31536000, immutable")
+        self.assertEqual(plain["Cache-Control"], "public, max-age=3600")
+
+
+HOT_TABLES = {"booking", "payments", "complaint_suggestion", "seat_allocation", "trips"}
+
+
+def full_scans(sql):
+    """Hot tables that the database plans to read in full for ``sql``."""
+    with connection.cursor() as cursor:
+        if connection.vendor == "sqlite":
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}")
+            return [
+                detail for *_, detail in cursor.fetchall()
+                if detail.startswith("SCAN ") and "USING" not in detail and detail.split()[1] in HOT_TABLES
+            ]
+        cursor.execute(f"EXPLAIN {sql}")  # MySQL
+        columns = [column[0] for column in cursor.description]
+        rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+        return [row["table"] for row in rows if row["type"] == "ALL" and row["table"] in HOT_TABLES]
+
+
+class QueryPlanTests(TestCase):
+    """The hot pages must reach booking/payment rows through an index."""
+
+    def setUp(self):
+        cache.clear()
+        self.customer = make_customer()
+        self.admin = User.objects.create(
+            name="Admin", email="admin@example.com", phone="03110000000", password="secret", role="admin"
+        )
+        route = Route.objects.create(origin="Lahore", destination="Multan", duration="05:00")
+        buses = [make_bus(route, departure=time(hour, 0)) for hour in (8, 12, 16)]
+        for day in range(1, 6):
+            for row, bus in enumerate(buses, start=1):
+                booking = make_booking(self.customer, bus, f"{row}A,{row}B", booking_date=date(2030, 1, day))
+                Payment.objects.create(booking=booking, user=self.customer, amount=3000, method="card")
+
+    def _assert_indexed(self, url, user, params=None):
+        login(self.client, user)
+        self.client.get(url, params)  # warm caches
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self.client.get(url, params).status_code, 200)
+        selects = [q["sql"] for q in ctx.captured_queries if q["sql"].startswith("SELECT")]
+        self.assertTrue(selects)
+        for sql in selects:
+            self.assertEqual(full_scans(sql), [], sql)
+
+    def test_booking_search(self):
+        self._assert_indexed(reverse("booking"), self.customer, {
+            "origin": "Lahore", "destination": "Multan", "booking_date": "2030-01-03",
+        })
+
+    def test_upcoming_tickets(self):
+        self._assert_indexed(reverse("upcoming_tickets"), self.customer)
+
+    def test_admin_dashboard(self):
+        self._assert_indexed(reverse("admin_management"), self.admin)
+
+    def test_bookings_tab_payment_lookup(self):
+        self._assert_indexed(reverse("admin_section", args=["bookings"]), self.admin)
+
+
+# -----------------------------
+# Per-view query and latency budgets
+# -----------------------------
+class Budget(NamedTuple):
+    queries: int
+    ms: int = 300
+    login: str = ""  # "", "customer" or "admin"
+    skip: str = ""  # reason the URL cannot be driven yet
+
+
+MISSING_TEMPLATE = "template is missing from home/templates"
+
+# Every named URL in core/urls.py needs an entry; steady-state GET, seeded data
+VIEW_BUDGETS = {
+    "home": Budget(0), "terminal": Budget(0), "lahore_feeder": Budget(0), "multan_metro": Budget(0),
+    "workshop": Budget(0), "in_journey_attractions": Budget(0), "safety_security": Budget(0),
+    "trained_crew": Budget(0), "terms_conditions": Budget(0), "news": Budget(0), "about_us": Budget(0),
+    "blog": Budget(0), "health_policy": Budget(0), "gender_policy": Budget(0),
+    "login": Budget(0), "register": Budget(0), "logout": Budget(0, login="customer"),
+    "admin_management": Budget(6, login="admin"), "admin_dashboard": Budget(6, login="admin"),
+    "admin_section": Budget(2, login="admin"),
+    "customer_dashboard": Budget(5, login="customer"),
+    "route_list": Budget(0), "add_route": Budget(0), "bus_list": Budget(0), "add_bus": Budget(1),
+    "complaint_suggestion": Budget(2, login="customer"),
+    "complaint_success": Budget(0, skip="core/urls.py calls render() without importing it"),
+    "complaint_list": Budget(1, login="admin"),
+    "booking": Budget(6, login="customer"),
+    "confirm_booking": Budget(4, login="customer"),
+    "online_refund": Budget(3, login="customer"),
+    "upcoming_tickets": Budget(4, login="customer"), "past_tickets": Budget(3, login="customer"),
+    "cancel_ticket": Budget(2, login="customer"),
+    "booking_success": Budget(4, login="customer"),
+    "ticket_detail": Budget(0, skip=MISSING_TEMPLATE),
+    "add_customer": Budget(1, login="admin"),
+    "edit_customer": Budget(3, login="admin"), "delete_customer": Budget(2, login="admin"),
+    "add_booking": Budget(0, skip=MISSING_TEMPLATE), "admin_booking": Budget(0, skip=MISSING_TEMPLATE),
+    "edit_booking": Budget(5, login="admin"),
+    "delete_booking": Budget(0, skip=MISSING_TEMPLATE),
+    "booking_success_admin": Budget(0, skip=MISSING_TEMPLATE),
+    "edit_profile": Budget(1, login="customer"), "update_admin_profile": Budget(1, login="admin"),
+    "payment_list": Budget(2, login="admin"),
+    "payment": Budget(4, login="customer"), "add_payment": Budget(4, login="customer"),
+    "create_payment": Budget(4, login="admin"),
+    "seat_availability": Budget(3, login="customer"),
+    "seat_events": Budget(0, skip="long-lived event stream; see SeatEventTests"),
+    "admin_export": Budget(2, login="admin"),
+    "metrics": Budget(1, login="admin"), "readiness": Budget(1),
+    "profile_list": Budget(1, login="admin"), "profile_detail": Budget(1, login="admin"),
+}
+
+
+def seed_dataset(customers=20, routes=5, buses_per_route=3, bookings_per_customer=4):
+    """Enough rows that a per-row query in any listing shows up in the counts."""
+    admin = User.objects.create(name="Admin", email="admin@example.com", phone="03110000000", password="secret", role="admin")
+    people = [
+        User.objects.create(name=f"Customer {n}", email=f"c{n}@example.com", phone=f"0300{n:07d}", password="secret")
+        for n in range(customers)
+    ]
+    buses = []
+    for n in range(routes):
+        route = Route.objects.create(origin="Lahore", destination=f"City {n}", duration="04:00")
+        buses += [make_bus(route, departure=time(6 + 4 * k, 0)) for k in range(buses_per_route)]
+
+    bookings = []
+    for n, person in enumerate(people):
+        for k in range(bookings_per_customer):
+            bus = buses[(n + k) % len(buses)]
+            booking = make_booking(person, bus, f"{n + 1}A", booking_date=date(2030, 1, 1 + k))
+            Payment.objects.create(booking=booking, user=person, amount=bus.price, method="card", status="completed")
+            bookings.append(booking)
+        ComplaintSuggestion.objects.create(
+            user=person, suggestion_type="complaint", title="Late", first_name=person.name,
+            email=person.email, mobile_number=person.phone, message="Bus was late",
+        )
+        RefundRequest.objects.create(user=person, booking=bookings[-1], refund_as="cash")
+    return admin, people, buses, bookings
+
+
+@FAR_HORIZON
+class ViewBudgetTests(TestCase):
+    """Drive every named URL in core/urls.py and hold it to its VIEW_BUDGETS entry."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin, people, buses, bookings = seed_dataset()
+        cls.customer = people[0]
+        booking = next(b for b in bookings if b.user_id == cls.customer.id)
+        cls.url_kwargs = {
+            "bus_id": buses[0].id, "booking_id": booking.id, "ticket_id": booking.id,
+            "customer_id": people[1].id, "section": "bookings",
+        }
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.enterContext(override_settings(PROFILE_DIR=directory))
+        login(self.client, self.admin)
+        profile = self.client.get(reverse("home"), {"_profile": "1"})["X-Profile-Id"]
+        self.url_kwargs = {**self.url_kwargs, "name": profile}
+
+    def _named_patterns(self):
+        seen = {}
+        for pattern in get_resolver().url_patterns:
+            if isinstance(pattern, URLPattern) and pattern.name and pattern.name not in seen:
+                seen[pattern.name] = pattern
+        return seen
+
+    def _measure(self, name, pattern, budget):
+        cache.clear()
+        kwargs = {key: self.url_kwargs[key] for key in pattern.pattern.converters}
+        if name == "admin_export":
+            kwargs["name"] = "bookings"
+        url = reverse(name, kwargs=kwargs)
+        params = {"booking_date": "2030-01-01"} if name == "confirm_booking" else None
+        if name == "booking":
+            params = {"origin": "Lahore", "destination": "City 0", "booking_date": "2030-01-01"}
+        if name == "seat_availability":
+            params = {"date": "2030-01-01"}
+
+        self.client.cookies.clear()
+        if budget.login:
+            login(self.client, self.admin if budget.login == "admin" else self.customer)
+        self.client.get(url, params)  # warm caches, as on a running server
+        if budget.login:
+            login(self.client, self.admin if budget.login == "admin" else self.customer)
+
+        with CaptureQueriesContext(connection) as ctx:
+            started = clock.perf_counter()
+            response = self.client.get(url, params)
+            if response.streaming:
+                b"".join(response.streaming_content)
+            elapsed_ms = (clock.perf_counter() - started) * 1000
+        self.assertLess(response.status_code, 400, f"{name}: {url} returned {response.status_code}")
+        return len(ctx.captured_queries), elapsed_ms
+
+    def test_every_view_stays_within_budget(self):
+        patterns = self._named_patterns()
+        self.assertEqual(sorted(set(patterns) - set(VIEW_BUDGETS)), [], "URLs without a budget in VIEW_BUDGETS")
+
+        report, over = [], []
+        for name, pattern in sorted(patterns.items()):
+            budget = VIEW_BUDGETS[name]
+            if budget.skip:
+                report.append(f"  {name:<24} skipped: {budget.skip}")
+                continue
+            queries, elapsed_ms = self._measure(name, pattern, budget)
+            report.append(f"  {name:<24} {queries:>3}/{budget.queries:<3} queries {elapsed_ms:>7.1f}/{budget.ms} ms")
+            if queries > budget.queries or elapsed_ms > budget.ms:
+                over.append(report[-1].strip())
+        print("\n[view budgets]\n" + "\n".join(report))
+        self.assertEqual(over, [], "views over budget")
+
+
+class SyntheticDatasetTests(TestCase):
+    def _generate(self, seed):
+        out = StringIO()
+        call_command("generate_dataset", seed=seed, scale=0.001, bookings=400, batch_size=64, stdout=out)
+        return out.getvalue()
+
+    def _fingerprint(self, tag):
+        bookings = Booking.objects.filter(booking_number__startswith=f"BK-{tag}-").order_by("id")
+        return [
+            (b.booking_number, b.user.email, b.bus.bus_number, b.booking_date - service_today(), b.seat_number, b.status)
+            for b in bookings.select_related("user", "bus")
+        ]
+
+    def test_dataset_is_deterministic_and_consistent(self):
+        self.assertIn("bookings: 400", self._generate(seed=7))
+        self.assertEqual(Booking.objects.count(), 400)
+        self.assertFalse(Bus.objects.filter(arrival_time__isnull=True).exists())
+        self.assertFalse(Route.objects.filter(duration_minutes__isnull=True).exists())
+
+        # Every active seat has its allocation row, so no seat is sold twice
+        active = Booking.objects.filter(status__in=Booking.ACTIVE_STATUSES)
+        self.assertEqual(SeatAllocation.objects.count(), sum(len(b.seat_list()) for b in active))
+        self.assertFalse(SeatAllocation.objects.exclude(booking__status__in=Booking.ACTIVE_STATUSES).exists())
+        self.assertEqual(
+            Payment.objects.filter(status="completed").count(), Booking.objects.filter(status="confirmed").count()
+        )
+        self.assertEqual(RefundRequest.objects.count(), Payment.objects.filter(status="refunded").count())
+        self.assertEqual(stats.admin_dashboard_counts()["bookings_count"], 400)
+
+        # Another seed lands alongside, even one that shares the last digits;
+        # reloading the same seed is refused
+        self._generate(seed=1007)
+        self.assertEqual(Booking.objects.count(), 800)
+        with self.assertRaisesMessage(CommandError, "seed 1007 is already loaded"):
+            self._generate(seed=1007)
+        with self.assertRaisesMessage(CommandError, "--seed must be between 0 and 9999"):
+            self._generate(seed=10_000)
+
+    def test_same_seed_reproduces_the_same_rows(self):
+        self._generate(seed=3)
+        first = self._fingerprint("S3")
+        Booking.objects.all().delete()
+        User.objects.all().delete()
+        Route.objects.all().delete()
+        self._generate(seed=3)
+        self.assertEqual(self._fingerprint("S3"), first)
+
+
+class LoadTestTests(TransactionTestCase):
+    def test_percentile_is_nearest_rank(self):
+        values = list(range(1, 101))
+        self.assertEqual([percentile(values, p) for p in (50, 95, 99)], [50, 95, 99])
+        self.assertEqual(percentile([7.0], 99), 7.0)
+        self.assertIsNone(percentile([], 50))
+
+    def test_double_bookings_counts_seats_sold_twice(self):
+        user = make_customer()
+        bus = make_bus()
+        make_booking(user, bus, "1A,1B")
+        target = [(bus.id, "Lahore", "Multan", "2030-01-01")]
+        self.assertEqual(double_bookings(target), 0)
+        # Bypass save() so no SeatAllocation guards the second sale
+        Booking.objects.bulk_create([Booking(
+            user=user, route=bus.route, bus=bus, booking_date=date(2030, 1, 1),
+            seat_number="1B, 1C", booking_number="BK-DUP", status="confirmed",
+        )])
+        self.assertEqual(double_bookings(target), 1)
+
+    def test_flow_runs_end_to_end_against_a_local_server(self):
+        make_customer()
+        bus = make_bus()
+        targets, capacities = hot_targets(buses=1, days=1)
+        with local_server() as base_url:
+            results = run(base_url, customer_logins(1), targets, capacities, concurrency=1, iterations=3)
+
+        self.assertEqual(sum(results.errors.values()), 0, results.error_samples)
+        self.assertEqual(results.flows + results.conflicts, 3)
+        self.assertEqual(len(results.latencies["reserve"]), 3)
+        self.assertEqual(Booking.objects.filter(bus=bus, status="confirmed").count(), results.flows)
+        self.assertEqual(double_bookings(targets), 0)
+        self.assertIn("double-booked seats: 0", report(results, 0))
+
+
+class RequestMetricsTests(TestCase):
+    BOOKING_GET = ("http_requests_total", (("view", "booking"), ("method", "GET"), ("status", "200")))
+
+    def test_requests_are_recorded_per_view(self):
+        login(self.client, make_customer())
+        before = metrics.registry.counters[self.BOOKING_GET]
+        queries_before = metrics.registry.histograms.get(("http_request_db_queries", (("view", "booking"),)), [0])[:-1]
+
+        self.client.get(reverse("booking"))
+
+        self.assertEqual(metrics.registry.counters[self.BOOKING_GET], before + 1)
+        queries = metrics.registry.histograms[("http_request_db_queries", (("view", "booking"),))][:-1]
+        self.assertEqual(sum(queries) - sum(queries_before), 1)
+        text = metrics.render()
+        self.assertIn('http_request_duration_seconds_bucket{view="booking",le="+Inf"}', text)
+        self.assertIn("# TYPE http_response_size_bytes histogram", text)
+
+    async def test_queries_are_counted_under_asgi(self):
+        # The ORM runs in sync_to_async threads here, not on the event loop
+        user = await sync_to_async(make_customer)()
+        bus = await sync_to_async(make_bus)()
+        await sync_to_async(login)(self.client, user)
+        self.async_client.cookies = self.client.cookies
+
+        for view, url, params in [
+            ("booking", reverse("booking"), None),
+            ("seat_availability", reverse("seat_availability", args=[bus.id]), {"date": "2030-01-01"}),
+        ]:
+            key = ("http_request_db_queries", (("view", view),))
+            before = metrics.registry.histograms.get(key, [0])[-1]
+            response = await self.async_client.get(url, params)
+            self.assertEqual(response.status_code, 200)
+            self.assertGreater(metrics.registry.histograms[key][-1] - before, 0, view)
+
+    def test_endpoint_is_admin_only(self):
+        self.assertEqual(self.client.get(reverse("metrics")).status_code, 403)
+        login(self.client, make_customer())
+        self.assertEqual(self.client.get(reverse("metrics")).status_code, 403)
+
+        admin = User.objects.create(name="Admin", email="a@example.com", phone="03110000000", password="x", role="admin")
+        login(self.client, admin)
+        response = self.client.get(reverse("metrics"))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Content-Type"].startswith("text/plain; version=0.0.4"))
+
+        self.client.logout()
+        with override_settings(METRICS_TOKEN="scrape-me"):
+            response = self.client.get(reverse("metrics"), HTTP_AUTHORIZATION="Bearer scrape-me")
+            self.assertEqual(response.status_code, 200)
+            response = self.client.get(reverse("metrics"), HTTP_AUTHORIZATION="Bearer wrong")
+            self.assertEqual(response.status_code, 403)
+
+    def test_worker_snapshots_are_summed(self):
+        directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, directory)
+        other = metrics.Registry()
+        other.inc(*self.BOOKING_GET, value=5)
+        other.observe("http_request_duration_seconds", (("view", "booking"),), 0.2)
+        (directory / "worker-1.json").write_text(json.dumps(other.snapshot()))
+
+        login(self.client, make_customer())
+        with override_settings(METRICS_DIR=str(directory)):
+            own = metrics.registry.counters[self.BOOKING_GET]
+            self.client.get(reverse("booking"))
+            total = metrics.collect()
+
+        self.assertTrue((directory / f"worker-{os.getpid()}.json").exists())
+        self.assertEqual(total.counters[self.BOOKING_GET], own + 1 + 5)
+        self.assertIn('http_request_duration_seconds_bucket{view="booking",le="0.25"}', metrics.render(total))
+
+    def test_idle_workers_still_publish_their_counts(self):
+        directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, directory)
+        worker = metrics.Registry()
+        snapshot = directory / f"worker-{os.getpid()}.json"
+
+        def published():
+            counters = json.loads(snapshot.read_text())["counters"]
+            return {(name, metrics._labels(labels)): value for name, labels, value in counters}
+
+        with override_settings(METRICS_DIR=str(directory), METRICS_FLUSH_INTERVAL=0.2):
+            worker.inc(*self.BOOKING_GET)
+            worker.flush()
+            worker.inc(*self.BOOKING_GET, value=2)
+            worker.flush()  # too soon after the last snapshot
+            self.assertEqual(published()[self.BOOKING_GET], 1)
+            deadline = clock.monotonic() + 5
+            while published()[self.BOOKING_GET] != 3 and clock.monotonic() < deadline:
+                clock.sleep(0.01)
+            self.assertEqual(published()[self.BOOKING_GET], 3)
+
+            worker.inc(*self.BOOKING_GET)
+            worker.flush_at_exit(os.getpid())
+            self.assertEqual(published()[self.BOOKING_GET], 4)
+
+    def test_readiness_probe_checks_database_latency(self):
+        response = self.client.get(reverse("readiness"))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()["databases"]["default"]["ok"])
+        with override_settings(READINESS_DB_LATENCY_MS=-1):
+            response = self.client.get(reverse("readiness"))
+        self.assertEqual((response.status_code, response.json()["ready"]), (503, False))
+
+
+class ProfilerTests(TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.enterContext(override_settings(PROFILE_DIR=directory, PROFILE_KEEP=2))
+        self.directory = Path(directory)
+        self.admin = User.objects.create(name="Admin", email="a@example.com", phone="03110000000", password="x", role="admin")
+
+    def test_only_admins_can_turn_profiling_on(self):
+        response = self.client.get(reverse("route_list"), {"_profile": "1"})
+        self.assertNotIn("X-Profile-Id", response)
+        login(self.client, make_customer())
+        response = self.client.get(reverse("route_list"), HTTP_X_PROFILE="1")
+        self.assertNotIn("X-Profile-Id", response)
+        self.assertFalse(self.directory.exists() and any(self.directory.iterdir()))
+
+        login(self.client, self.admin)
+        self.assertNotIn("X-Profile-Id", self.client.get(reverse("route_list")))
+
+    def test_admin_profile_is_saved_and_browsable(self):
+        login(self.client, self.admin)
+        name = self.client.get(reverse("payment_list"), HTTP_X_PROFILE="1")["X-Profile-Id"]
+
+        self.assertTrue((self.directory / f"{name}.prof").is_file())
+        record = profiling.load(name)
+        self.assertEqual((record["view"], record["status"]), ("payment_list", 200))
+        self.assertTrue(any("payment" in query["sql"].lower() for query in record["queries"]))
+        self.assertIn("cumulative", record["summary"])
+
+        response = self.client.get(reverse("profile_list"))
+        self.assertContains(response, reverse("profile_detail", args=[name]))
+        self.assertContains(self.client.get(reverse("profile_detail", args=[name])), "payment_list")
+        download = self.client.get(reverse("profile_detail", args=[name]), {"download": "1"})
+        self.assertEqual(download["Content-Disposition"], f'attachment; filename="{name}.prof"')
+        self.assertEqual(self.client.get(reverse("profile_detail", args=["..settings"])).status_code, 404)
+
+    async def test_async_chain_profiles_the_view_and_its_queries(self):
+        await sync_to_async(login)(self.client, self.admin)
+        self.async_client.cookies = self.client.cookies
+        name = (await self.async_client.get(reverse("payment_list"), headers={"X-Profile": "1"}))["X-Profile-Id"]
+
+        record = await sync_to_async(profiling.load)(name)
+        self.assertEqual((record["view"], record["status"]), ("payment_list", 200))
+        self.assertTrue(any("payment" in query["sql"].lower() for query in record["queries"]))
+        self.assertIn("(payment_list)", record["summary"])
+
+    def test_only_the_newest_profiles_are_kept(self):
+        login(self.client, self.admin)
+        names = [self.client.get(reverse("route_list"), {"_profile": "1"})["X-Profile-Id"] for _ in range(3)]
+        self.assertEqual(sorted(p["name"] for p in profiling.recent()), sorted(names)[1:])
+        self.assertEqual(len(list(self.directory.glob("*.prof"))), 2)
+
+
+class SeatAvailabilityTests(TestCase):
+    def setUp(self):
+        self.user = make_customer()
+        self.bus = make_bus()
+        make_booking(self.user, self.bus, "2B,1A")
+        self.url = reverse("seat_availability", args=[self.bus.id])
+
+    def test_middleware_chain_stays_async(self):
+        # With DEBUG on, Django logs whenever it has to adapt a middleware to the other mode
+        with override_settings(DEBUG=True), self.assertNoLogs("django.request", "DEBUG"):
+            ASGIHandler()
+
+    async def test_returns_held_seats_with_an_etag(self):
+        response = await self.async_client.get(self.url, {"date": "2030-01-01"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {
+            "bus": self.bus.id, "date": "2030-01-01", "capacity": 48, "taken": ["1A", "2B"], "available": 46,
+        })
+        etag = response["ETag"]
+        self.assertEqual(response["Cache-Control"], "no-cache")
+
+        response = await self.async_client.get(self.url, {"date": "2030-01-01"}, headers={"If-None-Match": etag})
+        self.assertEqual((response.status_code, response.content), (304, b""))
+
+        await sync_to_async(make_booking)(self.user, self.bus, "3C")
+        response = await self.async_client.get(self.url, {"date": "2030-01-01"}, headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertIn("3C", response.json()["taken"])
+
+    async def test_bad_requests(self):
+        response = await self.async_client.get(self.url, {"date": "tomorrow"})
+        self.assertEqual(response.status_code, 400)
+        response = await self.async_client.get(reverse("seat_availability", args=[999]), {"date": "2030-01-01"})
+        self.assertEqual(response.status_code, 404)
+        response = await self.async_client.post(self.url)
+        self.assertEqual(response.status_code, 405)
+
+    async def test_logged_in_session_is_refreshed_off_the_event_loop(self):
+        await sync_to_async(login)(self.client, self.user)
+        self.async_client.cookies = self.client.cookies
+        session = await sync_to_async(lambda: self.client.session)()
+        await session.aset("_saved_at", 0)
+        await session.asave()
+
+        response = await self.async_client.get(self.url, {"date": "2030-01-01"})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(settings.SESSION_COOKIE_NAME, response.cookies)
+
+
+class SeatEventTests(TransactionTestCase):
+    """Drive the SSE stream through core/asgi.py with an in-process ASGI harness."""
+
+    def setUp(self):
+        self.user = make_customer()
+        self.bus = make_bus()
+        self.enterContext(override_settings(SEAT_EVENTS_POLL_SECONDS=0))
+
+    async def _open(self, date="2030-01-01"):
+        from core.asgi import application
+
+        path = reverse("seat_events", args=[self.bus.id])
+        communicator = ApplicationCommunicator(application, {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+            "path": path, "raw_path": path.encode(), "query_string": f"date={date}".encode(),
+            "headers": [(b"host", b"testserver")], "server": ("testserver", 80), "client": ("127.0.0.1", 50000),
+        })
+        await communicator.send_input({"type": "http.request", "body": b"", "more_body": False})
+        start = await communicator.receive_output(timeout=5)
+        return communicator, start
+
+    async def _next_event(self, communicator):
+        """The next (event, data) pair, skipping retry hints and keep-alive comments."""
+        while True:
+            chunk = (await communicator.receive_output(timeout=5))["body"].decode()
+            if chunk.startswith("event: "):
+                event, data = chunk.strip().split("\n")
+                return event[len("event: "):], json.loads(data[len("data: "):])
+
+    async def _close(self, communicator):
+        await communicator.send_input({"type": "http.disconnect"})
+        await communicator.wait(timeout=5)
+
+    async def test_viewers_see_seats_taken_and_released(self):
+        first, start = await self._open()
+        self.assertEqual(start["status"], 200)
+        self.assertIn((b"Content-Type", b"text/event-stream"), start["headers"])
+        self.assertEqual(await self._next_event(first), ("snapshot", {"capacity": 48, "taken": []}))
+        second, _ = await self._open()
+        await self._next_event(second)
+        self.assertEqual(len(seat_events.hub.channels), 1)  # one channel (one query per change) for both
+
+        booking = await sync_to_async(make_booking)(self.user, self.bus, "2A,1A")
+        for viewer in (first, second):
+            self.assertEqual(await self._next_event(viewer), ("taken", {"seats": ["1A", "2A"]}))
+
+        booking.status = "cancelled"
+        await sync_to_async(booking.save)()
+        self.assertEqual(await self._next_event(first), ("released", {"seats": ["1A", "2A"]}))
+
+        await sync_to_async(make_booking)(
+            self.user, self.bus, "3C", reserved_until=timezone.now() - timedelta(minutes=1)
+        )
+        self.assertEqual(await self._next_event(first), ("taken", {"seats": ["3C"]}))
+        await sync_to_async(expire_reservations)()
+        self.assertEqual(await self._next_event(first), ("released", {"seats": ["3C"]}))
+
+        await self._close(first)
+        await self._close(second)
+        self.assertEqual(seat_events.hub.channels, {})
+
+    async def test_polling_catches_changes_made_elsewhere(self):
+        await sync_to_async(make_booking)(self.user, self.bus, "5D")
+        with override_settings(SEAT_EVENTS_POLL_SECONDS=0.05):
+            viewer, _ = await self._open()
+            self.assertEqual((await self._next_event(viewer))[1]["taken"], ["5D"])
+            # A queryset delete sends no Booking signals, like a change made by another worker
+            await sync_to_async(SeatAllocation.objects.filter(bus=self.bus).delete)()
+            self.assertEqual(await self._next_event(viewer), ("released", {"seats": ["5D"]}))
+            await self._close(viewer)
+
+    def test_wsgi_requests_get_a_fast_501(self):
+        response = self.client.get(reverse("seat_events", args=[self.bus.id]), {"date": "2030-01-01"})
+        self.assertEqual(response.status_code, 501)
+        self.assertFalse(response.streaming)
+        self.assertEqual(seat_events.hub.channels, {})
+
+    async def test_stream_is_advertised_only_under_asgi(self):
+        await sync_to_async(login)(self.client, self.user)
+        self.async_client.cookies = self.client.cookies
+        response = await sync_to_async(self.client.get)(reverse("booking"))
+        self.assertContains(response, "const seatStreamAvailable = false;")
+        response = await self.async_client.get(reverse("booking"))
+        self.assertContains(response, "const seatStreamAvailable = true;")
+
+        with override_settings(SEAT_EVENTS_ENABLED=False):
+            response = await self.async_client.get(reverse("booking"))
+            self.assertContains(response, "const seatStreamAvailable = false;")
+            communicator, start = await self._open()
+            self.assertEqual(start["status"], 501)
+            await communicator.receive_output(timeout=5)
+
+    async def test_bad_date_and_unknown_bus(self):
+        communicator, start = await self._open(date="soon")
+        self.assertEqual(start["status"], 400)
+        await communicator.receive_output(timeout=5)
+        self.bus.id += 1000
+        communicator, start = await self._open()
+        self.assertEqual(start["status"], 404)
+        await communicator.receive_output(timeout=5)
+        self.assertEqual(seat_events.hub.channels, {})
+
+
+@FAR_HORIZON
+class ReplicaRoutingTests(TransactionTestCase):
+    """Route reads to a second SQLite file that only catches up when replicate() runs."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # Added after the test runner has set up its databases, so it does not
+        # try to create a test database for the replica file
+        cls.replica_dir = tempfile.mkdtemp()
+        connections.settings["replica"] = connections.configure_settings({
+            "default": connections.settings["default"],
+            "replica": {"ENGINE": "django.db.backends.sqlite3", "NAME": os.path.join(cls.replica_dir, "replica.sqlite3")},
+        })["replica"]
+        cls.databases |= {"replica"}
+        cls.enterClassContext(override_settings(DATABASE_REPLICA="replica"))
+
+    @classmethod
+    def tearDownClass(cls):
+        connections["replica"].close()
+        del connections["replica"]
+        del connections.settings["replica"]
+        shutil.rmtree(cls.replica_dir)
+        super().tearDownClass()
+
+    def replicate(self):
+        connections["replica"].close()
+        connections["default"].ensure_connection()
+        target = sqlite3.connect(connections.settings["replica"]["NAME"])
+        connections["default"].connection.backup(target)
+        target.close()
+
+    def setUp(self):
+        cache.clear()
+        self.user = make_customer()
+        self.bus = make_bus()
+        self.replicate()
+        login(self.client, self.user)  # the session exists only on the primary
+
+    def test_reads_follow_the_clients_own_writes(self):
+        url = reverse("upcoming_tickets")
+        make_booking(self.user, self.bus, "1A")
+        with CaptureQueriesContext(connections["replica"]) as replica_queries:
+            response = self.client.get(url)
+        self.assertEqual(len(response.context["tickets"]), 0)  # not replicated yet
+        self.assertTrue(replica_queries)
+
+        response = self.client.post(reverse("confirm_booking", args=[self.bus.id]), {
+            "booking_date": "2030-01-01", "selected_seats": "2A",
+        })
+        self.assertIn(replicas.PIN_COOKIE, response.cookies)
+        with CaptureQueriesContext(connections["replica"]) as replica_queries:
+            response = self.client.get(url)
+        self.assertEqual(len(response.context["tickets"]), 2)
+        self.assertFalse(replica_queries)
+
+        self.replicate()
+        del self.client.cookies[replicas.PIN_COOKIE]  # as when it expires
+        with CaptureQueriesContext(connections["replica"]) as replica_queries:
+            response = self.client.get(url)
+        self.assertEqual(len(response.context["tickets"]), 2)
+        self.assertTrue(replica_queries)
+
+    def test_other_views_and_cache_fills_read_the_primary(self):
+        Route.objects.create(origin="Karachi", destination="Sukkur", duration="06:00")
+        with CaptureQueriesContext(connections["replica"]) as replica_queries:
+            self.client.get(reverse("customer_dashboard"))
+        self.assertFalse(replica_queries)
+
+        response = self.client.get(reverse("booking"))
+        self.assertIn("Karachi", response.context["origins"])
+        self.assertNotIn(replicas.PIN_COOKIE, response.cookies)
+
+        with override_settings(DATABASE_REPLICA=None), CaptureQueriesContext(connections["replica"]) as replica_queries:
+            self.client.get(reverse("upcoming_tickets"))
+        self.assertFalse(replica_queries)
+
+
+class AdminExportTests(TestCase):
+    def setUp(self):
+        self.user = make_customer()
+        self.bus = make_bus()
+        other = make_bus(Route.objects.create(origin="Karachi", destination="Sukkur", duration="06:00"))
+        self.bookings = [make_booking(self.user, self.bus, f"{n}A") for n in range(1, 6)]
+        self.other = make_booking(self.user, other, "1A", status="confirmed")
+        Booking.objects.filter(pk=self.bookings[0].pk).update(created_at=timezone.now() - timedelta(days=10))
+        for booking in self.bookings[:2]:
+            Payment.objects.create(booking=booking, user=self.user, amount=1500, method="card", status="completed")
+        RefundRequest.objects.create(user=self.user, booking=self.bookings[1], refund_as="cash", status="Approved")
+        admin = User.objects.create(name="Admin", email="admin@example.com", phone="03110000000", password="secret", role="admin")
+        login(self.client, admin)
+
+    def _export(self, name, **params):
+        response = self.client.get(reverse("admin_export", args=[name]), params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return response, b"".join(response.streaming_content).decode()
+
+    def test_csv_streams_every_row_in_batches(self):
+        with self.settings(EXPORT_CHUNK_SIZE=2), CaptureQueriesContext(connection) as ctx:
+            response, body = self._export("bookings")
+        self.assertEqual(response["Content-Type"], "text/csv")
+        self.assertIn('attachment; filename="bookings-', response["Content-Disposition"])
+        lines = body.splitlines()
+        self.assertEqual(lines[0].split(",")[:3], ["id", "booking_number", "status"])
+        self.assertEqual([int(line.split(",")[0]) for line in lines[1:]], [b.id for b in self.bookings + [self.other]])
+        # The session, then ceil(6 / 2) full batches and the empty one that ends the export
+        self.assertEqual(len(ctx.captured_queries), 1 + 4)
+
+    async def test_asgi_streams_each_batch_as_it_is_read(self):
+        self.async_client.cookies = self.client.cookies
+        with self.settings(EXPORT_CHUNK_SIZE=2):
+            response = await self.async_client.get(reverse("admin_export", args=["bookings"]), {"format": "jsonl"})
+            self.assertTrue(response.is_async)
+            chunks = [chunk async for chunk in response.streaming_content]
+        self.assertEqual(len(chunks), 3)
+        rows = [json.loads(line) for chunk in chunks for line in chunk.decode().splitlines()]
+        self.assertEqual([row["id"] for row in rows], [b.id for b in self.bookings + [self.other]])
+
+    def test_filters(self):
+        _, body = self._export("bookings", format="jsonl", route=self.bus.route_id, status="reserved",
+                               start=str(service_today() - timedelta(days=1)), end=str(service_today()))
+        rows = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual([row["id"] for row in rows], [b.id for b in self.bookings[1:]])
+        self.assertEqual((rows[0]["origin"], rows[0]["seat_price"]), ("Lahore", "1500.00"))
+
+        _, body = self._export("payments", format="jsonl", status="completed")
+        self.assertEqual([json.loads(line)["booking_id"] for line in body.splitlines()], [b.id for b in self.bookings[:2]])
+        _, body = self._export("refunds", status="Approved")
+        self.assertEqual(len(body.splitlines()), 2)
+        self.assertNotIn("card_number", body)
+
+    def test_dates_are_days_in_the_service_time_zone(self):
+        # 20:00 UTC on Jan 1 is 01:00 on Jan 2 in Karachi
+        Booking.objects.filter(pk=self.other.pk).update(created_at=datetime(2030, 1, 1, 20, 0, tzinfo=dt_timezone.utc))
+        _, body = self._export("bookings", format="jsonl", start="2030-01-02", end="2030-01-02")
+        rows = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual([(row["id"], row["created_at"]) for row in rows], [(self.other.id, "2030-01-02T01:00:00+05:00")])
+        _, body = self._export("bookings", start="2030-01-01", end="2030-01-01")
+        self.assertEqual(len(body.splitlines()), 1)
+
+    def test_rejects_bad_filters_and_non_admins(self):
+        url = reverse("admin_export", args=["bookings"])
+        for params in ({"start": "last week"}, {"route": "x"}, {"route": "²"}, {"status": "lost"}, {"format": "xlsx"}):
+            self.assertEqual(self.client.get(url, params).status_code, 400, params)
+        self.assertEqual(self.client.get(reverse("admin_export", args=["users"])).status_code, 404)
+        login(self.client, self.user)
+        self.assertEqual(self.client.get(url).status_code, 302)
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    """Just enough of SMTP for smtplib to deliver messages to a list."""
+
+    def handle(self):
+        self.server.connections += 1
+        self.wfile.write(b"220 localhost ESMTP test\r\n")
+        in_data, lines = False, []
+        for raw in self.rfile:
+            line = raw.decode().rstrip("\r\n")
+            if in_data:
+                if line == ".":
+                    self.server.messages.append("\n".join(lines))
+                    in_data, lines = False, []
+                    self.wfile.write(b"250 OK\r\n")
+                else:
+                    lines.append(line)
+                continue
+            command = line[:4].upper()
+            if command == "DATA":
+                in_data = True
+                self.wfile.write(b"354 End data with <CR><LF>.<CR><LF>\r\n")
+            elif command == "QUIT":
+                self.wfile.write(b"221 Bye\r\n")
+                return
+            else:
+                self.wfile.write(b"250 OK\r\n")
+
+
+class LocalSMTPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), _SMTPHandler)
+        self.messages, self.connections = [], 0
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    def settings(self, port=None):
+        return override_settings(
+            EMAIL_BACKEND="django.core.mail.backends.smtp.EmailBackend", EMAIL_TIMEOUT=1,
+            EMAIL_HOST="127.0.0.1", EMAIL_PORT=port or self.server_address[1],
+            EMAIL_USE_SSL=False, EMAIL_USE_TLS=False, EMAIL_HOST_USER="", EMAIL_HOST_PASSWORD="",
+        )
+
+
+class EmailOutboxTests(TestCase):
+    def setUp(self):
+        self.smtp = LocalSMTPServer()
+        self.addCleanup(self.smtp.server_close)
+        self.addCleanup(self.smtp.shutdown)
+
+    def test_batch_is_sent_over_one_connection(self):
+        for i in range(3):
+            queue_email(f"c{i}@example.com", f"Ticket {i}", f"<p>Booking {i}</p>")
+
+        with self.smtp.settings():
+            self.assertEqual(send_pending(), (3, 0))
+            self.assertEqual(send_pending(), (0, 0))
+
+        self.assertEqual(self.smtp.connections, 1)
+        self.assertEqual(len(self.smtp.messages), 3)
+        self.assertIn("Subject: Ticket 0", self.smtp.messages[0])
+        self.assertEqual(OutboxEmail.objects.filter(status="sent").count(), 3)
+
+    def test_failures_back_off_then_go_dead(self):
+        email = queue_email("c@example.com", "Ticket", "<p>Hi</p>")
+        port = self.smtp.server_address[1]
+        self.smtp.shutdown()
+        self.smtp.server_close()
+
+        now = timezone.now()
+        with self.smtp.settings(port):
+            self.assertEqual(send_pending(now=now), (0, 1))
+            email.refresh_from_db()
+            self.assertEqual((email.status, email.attempts), ("pending", 1))
+            self.assertGreater(email.next_attempt_at, now)
+            # Not due yet, so nothing is retried
+            self.assertEqual(send_pending(now=now), (0, 0))
+
+            with self.assertLogs("home.mail", "ERROR"):
+                for day in range(1, MAX_ATTEMPTS):
+                    send_pending(now=now + timedelta(days=day))
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts), ("dead", MAX_ATTEMPTS))
+
+    def test_claimed_emails_wait_for_the_lease_to_run_out(self):
+        queue_email("c@example.com", "Ticket", "<p>Hi</p>")
+        now = timezone.now()
+        self.assertEqual(len(claim_batch(now=now)), 1)  # a worker that then dies
+
+        with self.smtp.settings():
+            self.assertEqual(send_pending(now=now), (0, 0))
+            self.assertEqual(send_pending(now=now + timedelta(seconds=LEASE_SECONDS)), (1, 0))
+
+    def test_payment_queues_email_instead_of_sending(self):
+        user = make_customer()
+        booking = make_booking(user, make_bus(), "1A")
+        login(self.client, user)
+
+        response = self.client.post(reverse("payment", args=[booking.id]), {"action_type": "pay", "method": "cash"})
+
+        self.assertRedirects(response, reverse("booking_success", args=[booking.id]), fetch_redirect_response=False)
+        self.assertEqual(OutboxEmail.objects.get().to, user.email)
+        self.assertEqual(self.smtp.messages, [])
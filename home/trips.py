@@ -0,0 +1,123 @@
+# home/trips.py
+"""Dated trips: each bus's daily departure expanded into one Trip row per day.
+
+Rows exist for a rolling window of settings.TRIP_WINDOW_DAYS days from today,
+so "which buses leave this route on this date after this time" is one range
+query on the (route, trip_date, departure_time) index instead of loading every
+bus and filtering in Python. `manage.py materialize_trips` extends the window
+and prunes old rows (run it daily from cron); Bus saves keep future trips in
+sync, out to the last date their route has trips on; a date that has no trips
+yet (past the window, or the command has not run) is materialized on first
+search, up to TRIP_SEARCH_HORIZON_DAYS ahead.
+
+"Today" is always the date in SERVICE_TIME_ZONE, the zone departure times are
+given in; the booking views use the same service_now().
+"""
+from datetime import timedelta
+from zoneinfo import ZoneInfo
+
+from django.conf import settings
+from django.db.models import Max
+from django.utils import timezone
+
+from .models import Bus, Trip
+
+
+def window_days():
+    return getattr(settings, "TRIP_WINDOW_DAYS", 30)
+
+
+def horizon_days():
+    return getattr(settings, "TRIP_SEARCH_HORIZON_DAYS", 180)
+
+
+def service_zone():
+    return ZoneInfo(getattr(settings, "SERVICE_TIME_ZONE", "Asia/Karachi"))
+
+
+def service_now(now=None):
+    """``now`` (default: the current time) in SERVICE_TIME_ZONE."""
+    return timezone.localtime(now, timezone=service_zone())
+
+
+def service_today():
+    return service_now().date()
+
+
+def is_bookable_date(day):
+    """True for today through the last day of the search horizon."""
+    today = service_today()
+    return today <= day < today + timedelta(days=horizon_days())
+
+
+def _materialize(buses, dates, batch_size=1000):
+    """Insert the missing trips for every (bus, date) pair; returns rows attempted."""
+    trips = [
+        Trip(bus_id=bus_id, route_id=route_id, trip_date=day, departure_time=departure_time)
+        for bus_id, route_id, departure_time in buses
+        for day in dates
+    ]
+    # Existing (bus, trip_date) rows are left alone by the unique constraint
+    Trip.objects.bulk_create(trips, batch_size=batch_size, ignore_conflicts=True)
+    return len(trips)
+
+
+def extend_trips(start=None, days=None, batch_size=1000):
+    """Make sure every bus has a trip on each day of [start, start + days)."""
+    start = start or service_today()
+    days = window_days() if days is None else days
+    dates = [start + timedelta(days=offset) for offset in range(days)]
+    buses = Bus.objects.values_list("id", "route_id", "departure_time")
+    return _materialize(buses.iterator(chunk_size=batch_size), dates, batch_size)
+
+
+def prune_trips(before):
+    """Delete trips dated before ``before``; returns the number removed."""
+    deleted, _ = Trip.objects.filter(trip_date__lt=before).delete()
+    return deleted
+
+
+def sync_bus_trips(bus):
+    """Bring the future trips of one bus in line with its route and departure time.
+
+    Trips are added for the window and for every later date its route already
+    has trips on (departures() only fills dates with none), up to the horizon.
+    """
+    today = service_today()
+    Trip.objects.filter(bus=bus, trip_date__gte=today).exclude(
+        route_id=bus.route_id, departure_time=bus.departure_time
+    ).update(route_id=bus.route_id, departure_time=bus.departure_time)
+    last = Trip.objects.filter(route_id=bus.route_id, trip_date__gte=today).aggregate(last=Max("trip_date"))["last"]
+    days = max(window_days(), (last - today).days + 1 if last else 0)
+    dates = [today + timedelta(days=offset) for offset in range(min(days, horizon_days()))]
+    _materialize([(bus.id, bus.route_id, bus.departure_time)], dates)
+
+
+def departures(route_ids, trip_date, after=None):
+    """Trips on ``route_ids`` for ``trip_date`` leaving after ``after``, earliest first.
+
+    A bookable date (see is_bookable_date) with no trips on these routes is
+    materialized for them first; dates past the horizon have no departures.
+    """
+    if trip_date >= service_today() + timedelta(days=horizon_days()):
+        return []
+
+    on_date = Trip.objects.filter(route_id__in=route_ids, trip_date=trip_date)
+    trips = on_date if after is None else on_date.filter(departure_time__gt=after)
+    trips = trips.select_related("bus").order_by("departure_time", "bus_id")
+    found = list(trips)
+    # Only an empty result costs the extra checks
+    if not found and is_bookable_date(trip_date) and not on_date.exists():
+        buses = Bus.objects.filter(route_id__in=route_ids).values_list("id", "route_id", "departure_time")
+        if _materialize(buses, [trip_date]):
+            found = list(trips.all())
+    return found
+
+
+def has_departed(bus, trip_date, now):
+    """True if the trip of ``bus`` on ``trip_date`` left at or before ``now`` (a time).
+
+    Without a Trip row for the date the bus's regular departure time is used.
+    """
+    departure = Trip.objects.filter(bus=bus, trip_date=trip_date).values_list("departure_time", flat=True).first()
+    return (bus.departure_time if departure is None else departure) <= now
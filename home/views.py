@@ -1,9 +1,37 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
-from django.contrib.auth.decorators import login_required
 from datetime import timedelta
-from django.db.models import Sum
-from .models import User, Route, Bus, ComplaintSuggestion, Booking, RefundRequest
+from django.db import IntegrityError
+from django.db.models import OuterRef, Prefetch, Subquery, Sum
+from django.core.paginator import Paginator
+import re
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import (
+    FileResponse, Http404, HttpResponse, HttpResponseBadRequest, HttpResponseForbidden, HttpResponseNotModified,
+    JsonResponse, StreamingHttpResponse,
+)
+from django.utils.crypto import constant_time_compare
+from django.utils.http import parse_etags
+from asgiref.sync import sync_to_async
+import asyncio
+import hashlib
+from django.views.decorators.cache import never_cache
+from django.views.static import serve
+from .models import User, Route, Bus, ComplaintSuggestion, Booking, RefundRequest, Payment, split_seats
+from .seats import InvalidSeats, SeatsUnavailable, reserve_seats, seat_availability as seat_state, seat_occupancy
+from .decorators import admin_required, customer_required, login_required
+from .mail import queue_email
+from .metrics import check_databases, render as render_metrics
+from . import exports, profiling
+from .replicas import reads_from_replica
+from .seat_events import event_stream, hub as seat_event_hub, stream_available
+from .page_cache import cached_page
+from .pagination import keyset_page
+from .route_catalog import get_route_catalog
+from .trips import departures, has_departed, is_bookable_date, service_now, service_today
+from .stats import admin_dashboard_counts, customer_dashboard_stats, seats_booked_per_day
 from .forms import CustomerRegisterForm, UserLoginForm, AdminForm, RouteForm, BusForm, ComplaintSuggestionForm, BookingForm
 from django.contrib import admin
 from django.utils import timezone
@@ -14,45 +42,60 @@ from decimal import Decimal
 # ----------------------------
 # Home / Index Page
 # ----------------------------
+# Static informational pages are served pre-rendered (home/page_cache.py)
+@cached_page
 def index(request):
     return render(request, "home/index.html") 
 
+@cached_page
 def terminal_view(request):
     return render(request, 'home/terminal.html')
 
+@cached_page
 def lahore_feeder(request):
     return render(request, 'home/lahore_feeder.html')
 
+@cached_page
 def multan_metro(request):
     return render(request, 'home/multan_metro.html')
 
+@cached_page
 def workshop(request):
     return render(request, 'home/workshop.html')
 
+@cached_page
 def in_journey_attractions(request):
     return render(request, "home/in_journey_attractions.html")
 
+@cached_page
 def safety_security(request):
     return render(request, "home/safety_security.html")
 
+@cached_page
 def trained_crew(request):
     return render(request, "home/trained_crew.html")
 
+@cached_page
 def terms_conditions(request):
     return render(request, "home/terms_conditions.html")
 
+@cached_page
 def news(request):
     return render(request, "home/news.html")
 
+@cached_page
 def about_us(request):
     return render(request, "home/about_us.html")
 
+@cached_page
 def blog(request):
     return render(request, "home/blog.html")
 
+@cached_page
 def health_policy(request):
     return render(request, "home/health_policy.html")
 
+@cached_page
 def gender_policy(request):
     return render(request, "home/gender_policy.html")
 
@@ -88,14 +131,7 @@ def login_view(request):
                 # ✅ Save user details in session
                 request.session["user_id"] = user.id
                 request.session["role"] = user.role.lower().strip()  # normalize role
-                request.session["user_name"] = getattr(user, "name", "")
-                request.session["user_phone"] = getattr(user, "phone", "")
-                request.session["user_email"] = user.email
-                request.session["user_address"] = getattr(user, "address", "")
-                request.session["user_cnic"] = getattr(user, "cnic_passport", "")
-
-                # ✅ Force save session
-                request.session.modified = True
+                # Profile fields are read from the User row (session_user), not stored here
 
                 # ✅ Redirect based on role
                 if request.session["role"] == "admin":
@@ -112,10 +148,11 @@ def login_view(request):
 
 
 
+@login_required
 def edit_profile(request):
-    if request.method == "POST" and "user_id" in request.session:
-        try:
-            user = User.objects.get(id=request.session["user_id"])
+    if request.method == "POST":
+        user = request.current_user
+        if user:
             user.name = request.POST.get("name")
             user.phone = request.POST.get("phone")
             user.email = request.POST.get("email")
@@ -123,27 +160,17 @@ def edit_profile(request):
             user.address = request.POST.get("address")
             user.save()
 
-            # update session so modal shows fresh values
-            request.session["user_name"] = user.name
-            request.session["user_phone"] = user.phone
-            request.session["user_email"] = user.email
-            request.session["user_cnic"] = user.cnic_passport
-            request.session["user_address"] = user.address
-
             messages.success(request, "Profile updated successfully!")
-        except User.DoesNotExist:
+        else:
             messages.error(request, "User not found.")
         return redirect("customer_dashboard")
     else:
         return redirect("login")
 
 
+@login_required
 def complaint_suggestion_view(request):
-    # ✅ Ensure only logged-in users can submit complaints/suggestions
-    user_id = request.session.get("user_id")
-    if not user_id:
-        messages.warning(request, "Please login first to submit a complaint or suggestion.")
-        return redirect("login")
+    user_id = request.session["user_id"]
 
     if request.method == "POST":
         form = ComplaintSuggestionForm(request.POST)
@@ -160,29 +187,17 @@ def complaint_suggestion_view(request):
 
 
 
+@admin_required
 def complaint_list_view(request):
-    # Only admins can view
-    user_id = request.session.get("user_id")
-    role = request.session.get("role")
-    if not user_id or role != "admin":
-        return redirect("login")
-
-    complaints = ComplaintSuggestion.objects.all().order_by("-created_at")
+    complaints = keyset_page(ComplaintSuggestion.objects.select_related("user"), request)
     return render(request, "home/complaint_list.html", {"complaints": complaints})
 
 
 
 
 
+@admin_required
 def admin_management(request):
-    user_id = request.session.get("user_id")
-    role = request.session.get("role")
-
-    # ✅ Only allow admins
-    if not user_id or role != "admin":
-        messages.error(request, "Access denied. Admin privileges required.")
-        return redirect("login")
-
     # ✅ Handle Add Admin form
     form = AdminForm()
     active_section = "dashboard"
@@ -198,74 +213,16 @@ def admin_management(request):
             messages.error(request, "Please correct the errors in the form.")
             active_section = "add-admin"
 
-    # ✅ Fetch data with proper error handling
-    try:
-        customers = User.objects.filter(role="customer").order_by("-created_at")
-        routes = Route.objects.all().order_by("id")
-        buses = Bus.objects.select_related("route").all().order_by("id")
-        complaints = ComplaintSuggestion.objects.select_related("user").all().order_by("-created_at")
-        bookings = Booking.objects.select_related("user", "bus", "route").all().order_by("-created_at")
-        refunds = RefundRequest.objects.select_related(
-            "user", "booking", "booking__bus", "booking__route"
-        ).all().order_by("-submitted_at")
-
-        # ✅ Attach latest payment to each booking
-        for booking in bookings:
-            booking.payment = Payment.objects.filter(
-                booking=booking
-            ).order_by("-created_at").first()
-
-        # ✅ Enhanced Debug information
-        print("=== ADMIN MANAGEMENT DEBUG ===")
-        print(f"Total Users in DB: {User.objects.count()}")
-        print(f"Total Routes in DB: {Route.objects.count()}")
-
-        if Route.objects.exists():
-            first_route = Route.objects.first()
-            print(f"First route: {first_route}")
-            print(f"Route fields: {[field.name for field in Route._meta.fields]}")
-            print(f"Route values: {first_route.__dict__}")
-        else:
-            print("No routes exist in database")
-
-        print(f"Route model: {Route}")
-        print(f"Routes queryset: {routes}")
-        print(f"Routes count: {routes.count()}")
-
-        for route in routes:
-            print(f"Route {route.id}: {route}")
-
-    except Exception as e:
-        print(f"❌ Error fetching data: {str(e)}")
-        import traceback
-        traceback.print_exc()
-
-        # Initialize empty querysets on error
-        customers = User.objects.none()
-        routes = Route.objects.none()
-        buses = Bus.objects.none()
-        complaints = ComplaintSuggestion.objects.none()
-        bookings = Booking.objects.none()
-        refunds = RefundRequest.objects.none()
-
-        messages.error(request, f"Error loading data: {str(e)}")
-
-    # ✅ Prepare context
+    # ✅ Only the dashboard summary is loaded here; each tab fetches its own
+    # paginated rows from admin_section when it is opened.
     context = {
         "form": form,
-        "customers": customers,
-        "routes": routes,
-        "buses": buses,
-        "complaints": complaints,
-        "bookings": bookings,
-        "refunds": refunds,
         "active_section": active_section,
-        "customers_count": customers.count(),
-        "routes_count": routes.count(),
-        "buses_count": buses.count(),
-        "complaints_count": complaints.count(),
-        "bookings_count": bookings.count(),
-        "refunds_count": refunds.count(),
+        "recent_complaints": ComplaintSuggestion.objects.select_related("user").order_by("-created_at")[:5],
+        "recent_bookings": Booking.objects.select_related("user", "route").order_by("-created_at")[:5],
+        "bookings_by_date": seats_booked_per_day(),
+        # customers_count, routes_count, ... from the summary table
+        **admin_dashboard_counts(),
     }
 
     return render(request, "home/admin.html", context)
@@ -273,13 +230,63 @@ def admin_management(request):
 
 
 
+ADMIN_SECTION_PAGE_SIZE = 25
+
+# Large, append-only tables are paged by (created_at, id) cursor instead of OFFSET
+KEYSET_SECTIONS = {"complaints", "bookings", "refunds"}
+
+
+def _admin_section_queryset(section):
+    if section == "customers":
+        return User.objects.filter(role="customer").order_by("-created_at", "-id")
+    if section == "routes":
+        # Price of the route's first bus, without a query per row
+        first_bus_price = Bus.objects.filter(route=OuterRef("pk")).order_by("id").values("price")[:1]
+        return Route.objects.annotate(first_bus_price=Subquery(first_bus_price)).order_by("id")
+    if section == "buses":
+        return Bus.objects.select_related("route").order_by("id")
+    if section == "complaints":
+        return ComplaintSuggestion.objects.select_related("user").order_by("-created_at", "-id")
+    if section == "bookings":
+        # Latest payment per booking as two subquery columns instead of one query per booking
+        latest_payment = Payment.objects.filter(booking=OuterRef("pk")).order_by("-created_at", "-id")
+        return Booking.objects.select_related("user", "bus", "route").annotate(
+            payment_amount=Subquery(latest_payment.values("amount")[:1]),
+            payment_method=Subquery(latest_payment.values("method")[:1]),
+        ).order_by("-created_at", "-id")
+    if section == "refunds":
+        return RefundRequest.objects.select_related(
+            "user", "booking", "booking__route"
+        ).order_by("-created_at", "-id")
+    raise Http404("Unknown admin section")
+
+
+@admin_required
+def admin_section(request, section):
+    """One paginated tab of the admin dashboard, returned as an HTML fragment."""
+    queryset = _admin_section_queryset(section)
+    if section in KEYSET_SECTIONS:
+        page = keyset_page(queryset, request, ADMIN_SECTION_PAGE_SIZE)
+        next_query, previous_query = page.next_query, page.previous_query
+    else:
+        page = Paginator(queryset, ADMIN_SECTION_PAGE_SIZE).get_page(request.GET.get("page"))
+        next_query = f"page={page.next_page_number()}" if page.has_next() else ""
+        previous_query = f"page={page.previous_page_number()}" if page.has_previous() else ""
+
+    return render(request, f"home/admin_sections/{section}.html", {
+        "page": page,
+        "section": section,
+        "next_query": next_query,
+        "previous_query": previous_query,
+    })
+
+
+@admin_required
 def update_admin_profile(request):
     if request.method == "POST":
-        user_id = request.session.get("user_id")
-        if not user_id:
-            return redirect("login")  # if session expired
-
-        user = get_object_or_404(User, id=user_id)
+        user = request.current_user
+        if not user:
+            raise Http404("User not found")
 
         # update fields
         user.name = request.POST.get("name", user.name)
@@ -289,26 +296,15 @@ def update_admin_profile(request):
         user.cnic_passport = request.POST.get("cnic", user.cnic_passport)
         user.save()
 
-        # update session values
-        request.session["user_name"] = user.name
-        request.session["user_email"] = user.email
-        request.session["user_phone"] = user.phone
-        request.session["user_address"] = user.address
-        request.session["user_cnic"] = user.cnic_passport
-
         return redirect("admin_management")  # or wherever you want after save
 
     return redirect("admin_management")
 
 
 
+@admin_required
 def add_customer(request):
-    user_id = request.session.get("user_id")
-    role = request.session.get("role")
-
-    if not user_id or role != "admin":
-        messages.error(request, "Access denied. Admin privileges required.")
-        return redirect("login")
+    user_id = request.session["user_id"]
 
     if request.method == "POST":
         form = CustomerRegisterForm(request.POST)
@@ -342,12 +338,9 @@ def add_customer(request):
 
 
 
+@admin_required
 def edit_customer(request, customer_id):
-    user_id = request.session.get("user_id")
-    role = request.session.get("role")
-    if not user_id or role != "admin":
-        messages.error(request, "Access denied. Admin privileges required.")
-        return redirect("login")
+    user_id = request.session["user_id"]
 
     customer = get_object_or_404(User, id=customer_id, role="customer")
 
@@ -374,13 +367,8 @@ def edit_customer(request, customer_id):
     return render(request, "home/edit_customer.html", {"customer": customer})
 
 
+@admin_required
 def delete_customer(request, customer_id):
-    user_id = request.session.get("user_id")
-    role = request.session.get("role")
-    if not user_id or role != "admin":
-        messages.error(request, "Access denied. Admin privileges required.")
-        return redirect("login")
-
     customer = get_object_or_404(User, id=customer_id, role="customer")
 
     if request.method == "POST":
@@ -393,12 +381,9 @@ def delete_customer(request, customer_id):
 
 # ------------------- BOOKING VIEWS -------------------
 
+@admin_required
 def add_booking(request):
-    user_id = request.session.get("user_id")
-    role = request.session.get("role")
-    if not user_id or role != "admin":
-        messages.error(request, "Access denied. Admin privileges required.")
-        return redirect("login")
+    user_id = request.session["user_id"]
 
     if request.method == "POST":
         form = BookingForm(request.POST)
@@ -408,7 +393,11 @@ def add_booking(request):
             booking.updated_by_id = user_id
             booking.created_at = timezone.now()
             booking.updated_at = timezone.now()
-            booking.save()
+            try:
+                booking.save()
+            except IntegrityError:
+                messages.error(request, "One or more of these seats are already booked ❌")
+                return render(request, "home/admin_booking.html", {"form": form})
             messages.success(request, "Booking added successfully ✅")
             return redirect("admin_management")
         else:
@@ -420,6 +409,7 @@ def add_booking(request):
 
 
 
+@admin_required
 def booking_success_admin_view(request, booking_id):
     booking = get_object_or_404(Booking, id=booking_id)
     seat_count = len(booking.seat_number.split(','))
@@ -431,17 +421,13 @@ def booking_success_admin_view(request, booking_id):
     })
 
 
+@admin_required
 def edit_booking(request, booking_id):
-    booking = get_object_or_404(Booking, id=booking_id)
+    user_id = request.session["user_id"]
+    booking = get_object_or_404(Booking.objects.select_related("user", "route", "bus"), id=booking_id)
     users = User.objects.filter(role='customer')
     routes = Route.objects.all()
-    buses = Bus.objects.all()
-
-    user_id = request.session.get("user_id")
-    role = request.session.get("role")
-    if not user_id or role != "admin":
-        messages.error(request, "Access denied. Admin privileges required.")
-        return redirect("login")
+    buses = Bus.objects.select_related("route")
 
     if request.method == "POST":
         booking.user_id = request.POST.get("user")
@@ -451,7 +437,11 @@ def edit_booking(request, booking_id):
         booking.seat_number = request.POST.get("seat_number")
         booking.updated_by_id = user_id
         booking.updated_at = timezone.now()
-        booking.save()
+        try:
+            booking.save()
+        except IntegrityError:
+            messages.error(request, "One or more of these seats are already booked ❌")
+            return redirect("edit_booking", booking_id=booking.id)
 
         messages.success(request, "Booking updated successfully ✅")
         return redirect("admin_management")
@@ -464,13 +454,8 @@ def edit_booking(request, booking_id):
     })
 
 
+@admin_required
 def delete_booking(request, booking_id):
-    user_id = request.session.get("user_id")
-    role = request.session.get("role")
-    if not user_id or role != "admin":
-        messages.error(request, "Access denied. Admin privileges required.")
-        return redirect("login")
-
     booking = get_object_or_404(Booking, id=booking_id)
 
     if request.method == "POST":
@@ -485,6 +470,7 @@ def delete_booking(request, booking_id):
 # home/views.py
 
 
+@admin_required
 def create_payment_view(request, booking_id):
     booking = get_object_or_404(Booking, id=booking_id)
 
@@ -526,13 +512,11 @@ def create_payment_view(request, booking_id):
         booking.reserved_until = None
         booking.save()
 
-        # Send email
-        try:
-            yag = yagmail.SMTP("your-email@gmail.com", "your-email-password")
-            yag.send(
-                to=booking.user.email,
-                subject="Booking Confirmation ✅",
-                contents=f"""
+        # Queue the email; the send_outbox worker delivers it
+        queue_email(
+            to=booking.user.email,
+            subject="Booking Confirmation ✅",
+            html_body=f"""
 <html>
   <body style="font-family: Arial, sans-serif; color:#333;">
     <p>Dear {booking.user.name},</p>
@@ -546,10 +530,8 @@ def create_payment_view(request, booking_id):
     <p>Thank you for choosing us!</p>
   </body>
 </html>
-"""
-            )
-        except Exception as e:
-            messages.warning(request, f"Booking confirmed but email could not be sent: {e}")
+""",
+        )
 
         messages.success(request, "✅ Payment created and booking confirmed.")
         return redirect("admin_management")
@@ -575,65 +557,34 @@ def logout_view(request):
 
 
 # views.py - Update customer_dashboard function
+@customer_required
 def customer_dashboard(request):
-    user_id = request.session.get("user_id")
-    role = request.session.get("role")
-
-    if not user_id or role != "customer":
-        messages.warning(request, "You must login first to access the dashboard.")
+    customer = request.current_user
+    if not customer:
+        messages.error(request, "Invalid user. Please login again.")
         return redirect("login")
+    latest_booking = Booking.objects.filter(user=customer).select_related("bus__route").order_by('-id').first()
 
-    customer = User.objects.get(id=user_id)
-    latest_booking = Booking.objects.filter(user=customer).order_by('-id').first()
-    
-    # Calculate booking statistics
-    total_bookings = Booking.objects.filter(user=customer).count()
-    upcoming_bookings = Booking.objects.filter(
-        user=customer, 
-        booking_date__gte=timezone.now().date()
-    ).count()
-    completed_bookings = total_bookings - upcoming_bookings
-    
-    # Get favorite routes
-    from django.db.models import Count
-    favorite_routes = Booking.objects.filter(user=customer).values(
-        'bus__route__origin', 'bus__route__destination'
-    ).annotate(count=Count('id')).order_by('-count')[:3]
-    
-    # Get preferred bus types
-    preferred_bus_types = Booking.objects.filter(user=customer).values(
-        'bus__bus_type'
-    ).annotate(count=Count('id')).order_by('-count')[:3]
-
+    # Booking statistics, favorite routes and bus types come from the summary table
     return render(request, "home/customer.html", {
         "customer": customer,
         "latest_booking": latest_booking,
-        "total_bookings": total_bookings,
-        "upcoming_bookings": upcoming_bookings,
-        "completed_bookings": completed_bookings,
-        "favorite_routes": favorite_routes,
-        "preferred_bus_types": preferred_bus_types
+        **customer_dashboard_stats(customer),
     })
 
 
 
 
 
+@login_required
 def refund_home(request, booking_id):
-    user_id = request.session.get('user_id')
-    if not user_id:
-        messages.warning(request, "You must login first to submit a refund request.")
-        return redirect('login')
-
-    # Get the actual user instance
-    try:
-        user = User.objects.get(id=user_id)
-    except User.DoesNotExist:
+    user = request.current_user
+    if not user:
         messages.error(request, "Invalid user. Please login again.")
         return redirect('login')
 
     # Get the booking instance for this user
-    booking = get_object_or_404(Booking, id=booking_id, user=user)
+    booking = get_object_or_404(Booking.objects.select_related("user", "route", "bus"), id=booking_id, user=user)
 
     if request.method == "POST":
         refund_as = request.POST.get("refund_as")
@@ -668,35 +619,31 @@ import json
 
 
 import json
-import pytz
 from datetime import datetime
 from django.shortcuts import render, get_object_or_404, redirect
 from django.urls import reverse
 from django.contrib import messages
 from .models import Route, Bus, Booking, User
-import yagmail  # for sending emails
 
 # -----------------------------
 # Booking Search Page
 # -----------------------------
+@login_required
+@reads_from_replica
 def booking_view(request):
-    user_id = request.session.get("user_id")
-    if not user_id:
-        messages.warning(request, "Please login first to access booking.")
-        return redirect("login")
-
     hide_navbar = request.GET.get("hide_navbar", "0") == "1"    
     from_admin = request.GET.get("from_admin", "0") == "1"
 
-    origins = Route.objects.values_list("origin", flat=True).distinct()
-    destinations = Route.objects.values_list("destination", flat=True).distinct()
+    # Cached; rebuilt only after a Route is added, changed or deleted
+    catalog = get_route_catalog()
+    origins = catalog["origins"]
+    destinations = catalog["destinations"]
 
     buses = None
     booking_date = request.GET.get("booking_date")
 
-    # ✅ Default to today if no date is selected
-    pakistan_tz = pytz.timezone('Asia/Karachi')
-    current_datetime = datetime.now(pakistan_tz)
+    # ✅ Default to today if no date is selected (in SERVICE_TIME_ZONE, as trips are)
+    current_datetime = service_now()
     current_date = current_datetime.date()
 
     if not booking_date:
@@ -707,35 +654,26 @@ def booking_view(request):
     if request.GET.get("origin") and request.GET.get("destination") and booking_date:
         origin = request.GET["origin"]
         destination = request.GET["destination"]
-        routes = Route.objects.filter(origin=origin, destination=destination)
-        all_buses = Bus.objects.filter(route__in=routes).order_by('departure_time')
+        route_ids = catalog["route_ids"].get((origin, destination), [])
 
         current_time = current_datetime.time()
         booking_date_obj = datetime.strptime(booking_date, '%Y-%m-%d').date()
 
-        filtered_buses = []
-
-        if booking_date_obj == current_date:
-            buses_to_process = [bus for bus in all_buses if bus.departure_time > current_time]
-        elif booking_date_obj > current_date:
-            buses_to_process = list(all_buses)
+        # Departures for the date come from the dated trips table; for today,
+        # buses that have already left are filtered out in the same query
+        if route_ids and booking_date_obj >= current_date:
+            after = current_time if booking_date_obj == current_date else None
+            buses_to_process = [trip.bus for trip in departures(route_ids, booking_date_obj, after)]
         else:
             buses_to_process = []
 
+        # One query for the seats of every candidate bus
+        booked_seats, available = seat_occupancy(buses_to_process, booking_date)
         for bus in buses_to_process:
-            bookings = Booking.objects.filter(bus=bus, booking_date=booking_date).select_related('user')
-            booked_seats[bus.id] = {}
-            total_booked_count = 0
-            for booking_item in bookings:
-                seats = booking_item.seat_number.split(',')
-                for seat in seats:
-                    seat = seat.strip()
-                    booked_seats[bus.id][seat] = {'user_name': booking_item.user.name}
-                    total_booked_count += 1
-            bus.available_seats_count = bus.capacity - total_booked_count
-            filtered_buses.append(bus)
-
-        buses = filtered_buses
+            bus.route = catalog["routes"][bus.route_id]
+            bus.available_seats_count = available[bus.id]
+
+        buses = buses_to_process
     else:
         buses = []
 
@@ -753,6 +691,7 @@ def booking_view(request):
         "booking_date_obj": datetime.strptime(booking_date, '%Y-%m-%d').date() if booking_date else None,
         "hide_navbar": hide_navbar,
         "from_admin": from_admin,
+        "seat_stream": stream_available(request),
     })
 
 
@@ -763,6 +702,7 @@ def booking_view(request):
 from .models import Bus, Booking, User, Payment  # Make sure Payment model exists
 
 
+@login_required
 def confirm_booking(request, bus_id):
     bus = get_object_or_404(Bus, id=bus_id)
     booking_date = request.GET.get("booking_date") or request.POST.get("booking_date")
@@ -772,14 +712,13 @@ def confirm_booking(request, bus_id):
         messages.error(request, "Please select a journey date first.")
         return redirect("booking")
 
-    pakistan_tz = pytz.timezone('Asia/Karachi')
-    current_datetime = datetime.now(pakistan_tz)
+    current_datetime = service_now()
     current_date = current_datetime.date()
     current_time = current_datetime.time()
     booking_date_obj = datetime.strptime(booking_date, '%Y-%m-%d').date()
 
     # Prevent booking for past or departed buses
-    if booking_date_obj == current_date and bus.departure_time <= current_time:
+    if booking_date_obj == current_date and has_departed(bus, booking_date_obj, current_time):
         messages.error(
             request,
             f"⚠️ This bus has already departed at {bus.departure_time.strftime('%I:%M %p')}."
@@ -789,55 +728,35 @@ def confirm_booking(request, bus_id):
     elif booking_date_obj < current_date:
         messages.error(request, "⚠️ Cannot book for past dates.")
         return redirect("booking")
-
-    # Check login
-    user_id = request.session.get("user_id")
-    if not user_id:
-        messages.error(request, "You must be logged in to book a seat.")
-        return redirect("login")
+    elif not is_bookable_date(booking_date_obj):
+        messages.error(request, "⚠️ Bookings are not open for that date yet.")
+        return redirect("booking")
 
     if request.method == "POST":
-        seats = request.POST.get("selected_seats")
-        if not seats:
+        selected_seat_list = split_seats(request.POST.get("selected_seats"))
+        if not selected_seat_list:
             messages.error(request, "⚠️ Please select at least one seat.")
             return redirect("booking")
 
-        selected_seat_list = [seat.strip() for seat in seats.split(',')]
-        existing_bookings = Booking.objects.filter(bus=bus, booking_date=booking_date)
-
-        # Check already booked seats
-        already_booked_seats = []
-        for booking_item in existing_bookings:
-            booked_seats = [seat.strip() for seat in booking_item.seat_number.split(',')]
-            for seat in selected_seat_list:
-                if seat in booked_seats:
-                    already_booked_seats.append(seat)
+        user = request.current_user
+        if not user:
+            messages.error(request, "User not found. Please login again.")
+            return redirect("login")
 
-        if already_booked_seats:
+        # Create the booking with status 'reserved' (locked check + insert)
+        try:
+            booking = reserve_seats(user, bus, booking_date, selected_seat_list)
+        except SeatsUnavailable as e:
             messages.error(
                 request,
-                f"⚠️ The following seats are already booked: {', '.join(already_booked_seats)}."
+                f"⚠️ The following seats are already booked: {', '.join(e.seats)}."
             )
             url = f"{reverse('booking')}?booking_date={booking_date}&origin={bus.route.origin}&destination={bus.route.destination}"
             return redirect(url)
-
-        try:
-            user = User.objects.get(id=user_id)
-        except User.DoesNotExist:
-            messages.error(request, "User not found. Please login again.")
-            return redirect("login")
-
-        # Create the booking with status 'reserved'
-        booking = Booking.objects.create(
-            user=user,
-            route=bus.route,
-            bus=bus,
-            booking_date=booking_date,
-            seat_number=seats,
-            status='reserved',  # Set status to reserved
-            created_by=user,
-            updated_by=user,
-        )
+        except InvalidSeats as e:
+            messages.error(request, f"⚠️ These are not seats on this bus: {', '.join(e.seats)}.")
+            url = f"{reverse('booking')}?booking_date={booking_date}&origin={bus.route.origin}&destination={bus.route.destination}"
+            return redirect(url)
 
         # Calculate price
         seat_count = len(selected_seat_list)
@@ -859,7 +778,6 @@ from datetime import timedelta
 from django.shortcuts import get_object_or_404, redirect, render
 from django.contrib import messages
 from django.utils import timezone
-import yagmail
 
 
 
@@ -869,12 +787,12 @@ import pytz
 from django.shortcuts import get_object_or_404, redirect, render
 from django.utils import timezone
 from django.contrib import messages
-import yagmail
 from .models import Booking, Payment
 
+@login_required
 def payment_view(request, booking_id):
     booking = get_object_or_404(
-        Booking, id=booking_id, user_id=request.session.get("user_id")
+        Booking, id=booking_id, user_id=request.session["user_id"]
     )
 
     # calculate seat count & total
@@ -893,17 +811,21 @@ def payment_view(request, booking_id):
         if action_type == "reserve":
             booking.status = "reserved"
             booking.reserved_until = timezone.now() + timedelta(minutes=30)
-            booking.save()
+            try:
+                booking.save()
+            except IntegrityError:
+                # Reservation had expired and the seats were sold to someone else
+                messages.error(request, "⚠️ Your reservation expired and these seats are no longer available.")
+                return redirect("booking")
 
             # Convert reserved_until to Pakistan timezone
             reserved_local = booking.reserved_until.astimezone(local_tz)
 
-            try:
-                yag = yagmail.SMTP("hassanali.jutt576@gmail.com", "qgok oilz xyzy lhhq")
-                yag.send(
-                    to=booking.user.email,
-                    subject="Seat Reserved ✅",
-                    contents=f"""
+            # Queue the email; the send_outbox worker delivers it
+            queue_email(
+                to=booking.user.email,
+                subject="Seat Reserved ✅",
+                html_body=f"""
 <html>
   <body style="font-family: Arial, sans-serif; color:#333;">
     <p>Dear {booking.user.name},</p>
@@ -919,12 +841,8 @@ def payment_view(request, booking_id):
     <p>Please complete the payment within 30 minutes to confirm your booking.</p>
   </body>
 </html>
-"""
-                )
-            except Exception as e:
-                messages.warning(
-                    request, f"Seat reserved but email could not be sent: {e}"
-                )
+""",
+            )
 
             messages.success(
                 request,
@@ -962,20 +880,23 @@ def payment_view(request, booking_id):
                 payment.bank_name = request.POST.get("bank_name")
                 payment.transaction_ref = request.POST.get("transaction_ref")
 
-            payment.save()
-
             # Mark booking as confirmed
             booking.status = "confirmed"
             booking.reserved_until = None  # clear reservation
-            booking.save()
-
-            # Send confirmation email
             try:
-                yag = yagmail.SMTP("hassanali.jutt576@gmail.com", "qgok oilz xyzy lhhq")
-                yag.send(
-                    to=booking.user.email,
-                    subject="Booking Confirmation ✅",
-                    contents=f"""
+                with transaction.atomic():
+                    payment.save()
+                    booking.save()
+            except IntegrityError:
+                # Reservation had expired and the seats were sold to someone else
+                messages.error(request, "⚠️ Your reservation expired and these seats are no longer available.")
+                return redirect("booking")
+
+            # Queue the email; the send_outbox worker delivers it
+            queue_email(
+                to=booking.user.email,
+                subject="Booking Confirmation ✅",
+                html_body=f"""
 <html>
   <body style="font-family: Arial, sans-serif; color:#333;">
     <p>Dear {booking.user.name},</p>
@@ -990,12 +911,8 @@ def payment_view(request, booking_id):
     <p>Thank you for choosing us!</p>
   </body>
 </html>
-"""
-                )
-            except Exception as e:
-                messages.warning(
-                    request, f"Booking confirmed but email could not be sent: {e}"
-                )
+""",
+            )
 
             messages.success(request, "✅ Payment successful and booking confirmed.")
             return redirect("booking_success", booking_id=booking.id)
@@ -1011,8 +928,11 @@ def payment_view(request, booking_id):
     )
 
 
+@login_required
 def booking_success_view(request, booking_id):
-    booking = get_object_or_404(Booking, id=booking_id, user_id=request.session.get("user_id"))
+    booking = get_object_or_404(
+        Booking.objects.select_related("bus__route"), id=booking_id, user_id=request.session["user_id"]
+    )
     
     # Calculate total price
     seat_count = len(booking.seat_number.split(','))
@@ -1037,11 +957,40 @@ def booking_success_view(request, booking_id):
 
 
 
+@admin_required
 def payment_list(request):
-    payments = Payment.objects.select_related("booking").all()
+    payments = keyset_page(Payment.objects.select_related("booking"), request)
     return render(request, "home/payment_list.html", {"payments": payments})
 
 
+# ----------------------------
+# Accounting exports (streamed)
+# ----------------------------
+@admin_required
+@reads_from_replica
+def admin_export(request, name):
+    """Bookings, payments or refunds as CSV or JSON Lines, streamed in batches (home/exports.py)."""
+    if name not in exports.EXPORTS:
+        raise Http404("Unknown export.")
+    fmt = request.GET.get("format", "csv")
+    if fmt not in exports.FORMATS:
+        return HttpResponseBadRequest("format must be csv or jsonl.")
+    try:
+        queryset = exports.filtered(name, request.GET)
+    except exports.ExportError as e:
+        return HttpResponseBadRequest(str(e))
+
+    # Fix the database now: the body is read after the view (and the
+    # replica routing) has returned
+    queryset = queryset.using(queryset.db)
+    # Under ASGI a sync iterator would be read into a list before sending
+    stream = exports.astream if isinstance(request, ASGIRequest) else exports.stream
+    response = StreamingHttpResponse(stream(name, queryset, fmt), content_type=exports.FORMATS[fmt])
+    filename = f"{name}-{service_today():%Y%m%d}.{fmt}"
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
+
+
 
 
 
@@ -1049,37 +998,39 @@ def payment_list(request):
 
 
 # views.py - Update upcoming_tickets_view and past_tickets_view
+@login_required
+@reads_from_replica
 def upcoming_tickets_view(request):
-    user_id = request.session.get('user_id')
-    if not user_id:
-        messages.warning(request, "Please login first to view your tickets.")
-        return redirect('login')
+    user_id = request.session['user_id']
 
-    today = timezone.now().date()
+    today = service_today()
     tickets = Booking.objects.filter(
         user_id=user_id,
         booking_date__gte=today
-    ).select_related("bus", "route").order_by('booking_date')
+    ).select_related("bus__route", "route").prefetch_related(
+        Prefetch("payments", queryset=Payment.objects.order_by("id"), to_attr="payment_list")
+    ).order_by('booking_date')
 
     # Add total price calculation
     for ticket in tickets:
         seats = ticket.seat_number.split(",") if ticket.seat_number else []
         ticket.total_price = len(seats) * ticket.bus.price
         ticket.seat_count = len(seats)
+        ticket.latest_payment = ticket.payment_list[-1] if ticket.payment_list else None
 
     context = {"tickets": tickets}
     return render(request, "home/upcoming_tickets.html", context)
 
+@login_required
+@reads_from_replica
 def past_tickets_view(request):
-    user_id = request.session.get('user_id')
-    if not user_id:
-        return redirect('login')
+    user_id = request.session['user_id']
 
-    today = timezone.now().date()
+    today = service_today()
     tickets = Booking.objects.filter(
         user_id=user_id,
         booking_date__lt=today
-    ).select_related("bus", "route").order_by('-booking_date')
+    ).select_related("bus__route", "route").order_by('-booking_date')
 
     # Add total price calculation
     for ticket in tickets:
@@ -1092,11 +1043,10 @@ def past_tickets_view(request):
 
 
 # views.py - Add ticket_detail_view
+@login_required
+@reads_from_replica
 def ticket_detail_view(request, ticket_id):
-    user_id = request.session.get('user_id')
-    if not user_id:
-        messages.warning(request, "Please login first to view ticket details.")
-        return redirect('login')
+    user_id = request.session['user_id']
     
     ticket = get_object_or_404(Booking, id=ticket_id, user_id=user_id)
     
@@ -1110,11 +1060,9 @@ def ticket_detail_view(request, ticket_id):
     })
 
 
+@login_required
 def cancel_ticket_view(request, ticket_id):
-    
-    user_id = request.session.get('user_id')
-    if not user_id:
-        return redirect('login')
+    user_id = request.session['user_id']
 
     ticket = get_object_or_404(Booking, id=ticket_id, user_id=user_id)
 
@@ -1131,6 +1079,7 @@ def cancel_ticket_view(request, ticket_id):
 
 
 
+@reads_from_replica
 def route_list_view(request):
     routes = Route.objects.all()
     return render(request, "home/admin.html", {"routes": routes})
@@ -1146,6 +1095,7 @@ def add_route_view(request):
     return render(request, "home/add_route.html", {"form": form})
 
 
+@reads_from_replica
 def bus_list_view(request):
     buses = Bus.objects.all()
     return render(request, "home/admin.html", {"buses": buses})
@@ -1163,31 +1113,138 @@ def add_bus_view(request):
 
 from datetime import datetime, timedelta
 
+@reads_from_replica
 def available_buses(request):
     booking_date = request.GET.get("booking_date")
     route_id = request.GET.get("route_id")
 
-    buses = Bus.objects.filter(route_id=route_id)
-
-    for bus in buses:
-        # only calculate if arrival_time is empty AND duration is available
-        if not bus.arrival_time and bus.route.duration:
-            try:
-                # convert duration "HH:MM:SS" to hours/minutes
-                duration_parts = str(bus.route.duration).split(":")
-                hours = int(duration_parts[0])
-                minutes = int(duration_parts[1])
-
-                # calculate arrival time
-                departure_dt = datetime.combine(datetime.today(), bus.departure_time)
-                arrival_dt = departure_dt + timedelta(hours=hours, minutes=minutes)
-
-                # assign to bus object (not saved in DB, just for template use)
-                bus.arrival_time = arrival_dt.time()
-            except Exception as e:
-                bus.arrival_time = None
+    # arrival_time is stored on Bus, so no per-row duration parsing is needed
+    buses = Bus.objects.filter(route_id=route_id).select_related("route")
 
     return render(request, "available_buses.html", {
         "buses": buses,
         "booking_date": booking_date,
     })
+
+
+
+# ----------------------------
+# Static files without runserver (DEBUG off)
+# ----------------------------
+HASHED_NAME_RE = re.compile(r"\.[0-9a-f]{12}\.\w+$")
+
+
+def static_asset(request, path):
+    """Serve a collected static file; content-hashed names are cached for a year."""
+    response = serve(request, path, document_root=settings.STATIC_ROOT)
+    if HASHED_NAME_RE.search(path):
+        response["Cache-Control"] = "public, max-age=31536000, immutable"
+    else:
+        response["Cache-Control"] = "public, max-age=3600"
+    return response
+
+
+# ----------------------------
+# Metrics and readiness probe
+# ----------------------------
+@never_cache
+def metrics_view(request):
+    """Prometheus scrape endpoint: admin sessions, or ``Authorization: Bearer <METRICS_TOKEN>``."""
+    token = getattr(settings, "METRICS_TOKEN", None)
+    authorized = token and constant_time_compare(request.headers.get("Authorization", ""), f"Bearer {token}")
+    if not authorized and request.session.get("role") != "admin":
+        return HttpResponseForbidden("Access denied. Admin privileges required.")
+    return HttpResponse(render_metrics(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@never_cache
+def readiness_view(request):
+    """200 when every database answers SELECT 1 within READINESS_DB_LATENCY_MS, else 503."""
+    limit = getattr(settings, "READINESS_DB_LATENCY_MS", 250)
+    databases = {
+        alias: {"ok": ok and elapsed <= limit, "ms": round(elapsed, 1)}
+        for alias, (ok, elapsed) in check_databases().items()
+    }
+    ready = all(db["ok"] for db in databases.values())
+    return JsonResponse({"ready": ready, "databases": databases}, status=200 if ready else 503)
+
+
+# ----------------------------
+# Request profiles (admins)
+# ----------------------------
+@admin_required
+def profile_list(request):
+    return render(request, "home/profile_list.html", {"profiles": profiling.recent()})
+
+
+@admin_required
+def profile_detail(request, name):
+    if request.GET.get("download"):
+        path = profiling.prof_path(name)
+        if path is None:
+            raise Http404("Profile not found")
+        return FileResponse(path.open("rb"), as_attachment=True, filename=path.name)
+
+    profile = profiling.load(name)
+    if profile is None:
+        raise Http404("Profile not found")
+    return render(request, "home/profile_detail.html", {"profile": profile})
+
+
+# ----------------------------
+# Seat availability (async JSON, polled by the seat picker)
+# ----------------------------
+async def seat_availability(request, bus_id):
+    """Held seats of one bus on ``?date=YYYY-MM-DD``, with ETag/If-None-Match.
+
+    An async view: the two queries run in a worker thread via sync_to_async,
+    so under core/asgi.py polling clients never block the event loop. The
+    response has no personal data, so it needs no session.
+    """
+    if request.method not in ("GET", "HEAD"):
+        return JsonResponse({"error": "method not allowed"}, status=405)
+    try:
+        booking_date = datetime.strptime(request.GET.get("date", ""), "%Y-%m-%d").date()
+    except ValueError:
+        return JsonResponse({"error": "date must be YYYY-MM-DD"}, status=400)
+
+    state = await sync_to_async(seat_state)(bus_id, booking_date)
+    if state is None:
+        return JsonResponse({"error": "bus not found"}, status=404)
+
+    etag = '"%s"' % hashlib.sha256(f"{state['capacity']}:{','.join(state['taken'])}".encode()).hexdigest()[:32]
+    if etag in parse_etags(request.headers.get("If-None-Match", "")):
+        response = HttpResponseNotModified()
+    else:
+        response = JsonResponse({"bus": bus_id, "date": booking_date.isoformat(), **state})
+    response["ETag"] = etag
+    response["Cache-Control"] = "no-cache"
+    return response
+
+
+async def seat_events(request, bus_id):
+    """Server-sent events for one bus on ``?date=YYYY-MM-DD`` (home/seat_events.py).
+
+    Sends a "snapshot" of the held seats, then "taken" and "released" events
+    as bookings are made, expire or are cancelled. Answers 501 straight away
+    unless served over ASGI (see seat_events.stream_available).
+    """
+    if not stream_available(request):
+        return JsonResponse({"error": "live seat events need the ASGI server"}, status=501)
+    try:
+        booking_date = datetime.strptime(request.GET.get("date", ""), "%Y-%m-%d").date()
+    except ValueError:
+        return JsonResponse({"error": "date must be YYYY-MM-DD"}, status=400)
+
+    try:
+        channel, queue = await seat_event_hub.subscribe(bus_id, booking_date)
+    except asyncio.TimeoutError:
+        return JsonResponse({"error": "seat map unavailable"}, status=503)
+    if channel.capacity is None:
+        seat_event_hub.unsubscribe(channel, queue)
+        return JsonResponse({"error": "bus not found"}, status=404)
+
+    response = StreamingHttpResponse(event_stream(channel, queue), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"  # let nginx pass events straight through
+    return response